@@ -1,74 +1,67 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from utils.data_loader import load_inventory_data
+from utils.artifacts import current_artifacts, dashboard_table
+from utils.backtest import cached_backtest, summarize
+from utils.charts import line_chart
+from utils.dataset import get_dataset
+from utils.diagnostics import begin_page, diagnostics_panel, stage
+from utils.forecasting import METHOD_NAMES, reorder_points
+from utils.fulfilment import SUMMARY_KEYS
+from utils.tables import paged_table
 
 # Cấu hình trang
 st.set_page_config(page_title="Phân tích kho phụ tùng", layout="wide")
+# Ghi thời gian/bộ nhớ từng giai đoạn của lần chạy này (xem bảng chẩn đoán cuối trang)
+begin_page("Phân tích kho")
 
 # Tiêu đề ứng dụng
 st.title("Phân tích dữ liệu kho phụ tùng xe")
 st.subheader("Phân tích và so sánh hiệu quả hoạt động các kho")
 
-# 1. Load dữ liệu
-@st.cache_data
-def load_data():
-    try:
-        # Sử dụng hàm load_inventory_data từ utils
-        dmvt, ddh, px, pn, ro = load_inventory_data("data/du_lieu_phu_tung_thuc_te.xlsx")
-        
-        # Chuẩn hóa tên cột
-        px = px.rename(columns={'Mã đơn hàng': 'Mã đơn hàng'})
-        dmvt = dmvt.rename(columns={'Mã phụ tùng': 'Ma_phu_tung', 'Tên phụ tùng': 'Ten_phu_tung'})
-        pn = pn.rename(columns={'Kho nhập': 'Kho_nhap', 'Số lượng nhập': 'So_luong_nhap'})
-        px = px.rename(columns={'Kho xuất': 'Kho_xuat', 'Số lượng xuất': 'So_luong_xuat'})
-        
-        return dmvt, ddh, px, pn, ro
-    except Exception as e:
-        st.error(f"Lỗi khi tải dữ liệu: {str(e)}")
-        return None, None, None, None, None
+# 1. Load dữ liệu: ưu tiên các bảng tính trước bằng `python -m utils.artifacts` (None nếu chưa có),
+# bộ dữ liệu (Excel/snapshot) chỉ được tải khi thiếu bảng cần dùng
+try:
+    artifacts = current_artifacts()
+except Exception as e:
+    st.error(f"Lỗi khi tải dữ liệu: {str(e)}")
+    st.stop()
 
-# Load dữ liệu
-with st.spinner('Đang tải dữ liệu...'):
-    danh_muc, don_dat_hang, phieu_xuat, phieu_nhap, ro = load_data()
+def load_dataset():
+    with st.spinner('Đang tải dữ liệu...'):
+        try:
+            return get_dataset()
+        except Exception as e:
+            st.error(f"Lỗi khi tải dữ liệu: {str(e)}")
+            st.stop()
 
-if danh_muc is None:
-    st.stop()
+def bang(name):
+    # Bảng tính trước nếu có, không thì tính từ bộ dữ liệu dùng chung
+    return dashboard_table(artifacts, name, load_dataset)
+
+danh_muc = bang('danh_muc')
 
 # 2. Phân tích các kho - Phiên bản nâng cao
 st.header("Phân tích hiệu quả các kho")
 
 # Tạo tab phân tích
-tab1, tab2, tab3, tab4 = st.tabs([
+tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "Tổng quan kho", 
     "Luồng hàng kho", 
     "So sánh kho", 
-    "Cảnh báo"
+    "Cảnh báo",
+    "Đáp ứng đơn hàng"
 ])
 
-with tab1:
+with tab1, stage('Tab Tổng quan kho'):
     st.subheader("Tổng quan tình trạng các kho")
     
     # Tạo 2 cột
     col1, col2 = st.columns([3, 2])
     
     with col1:
-        # Tính toán số liệu tổng quan
-        tong_nhap = phieu_nhap.groupby('Kho_nhap')['So_luong_nhap'].sum().reset_index()
-        tong_xuat = phieu_xuat.groupby('Kho_xuat')['So_luong_xuat'].sum().reset_index()
-        
-        # Merge dữ liệu
-        tong_hop = pd.merge(
-            tong_nhap, 
-            tong_xuat, 
-            left_on='Kho_nhap', 
-            right_on='Kho_xuat', 
-            how='outer'
-        )
-        tong_hop.columns = ['Kho', 'Tong_nhap', 'Kho_xuat', 'Tong_xuat']
-        tong_hop = tong_hop[['Kho', 'Tong_nhap', 'Tong_xuat']]
-        tong_hop['Ton_kho'] = tong_hop['Tong_nhap'] - tong_hop['Tong_xuat']
-        tong_hop['Ti_le_xuat_nhap'] = tong_hop['Tong_xuat'] / tong_hop['Tong_nhap']
+        # Tổng hợp nhập/xuất/tồn theo kho (cập nhật tăng dần khi có chứng từ mới)
+        tong_hop = bang('tong_quan_kho')
         
         # Hiển thị bảng với định dạng đẹp
         st.dataframe(
@@ -106,84 +99,106 @@ with tab1:
             st.write(f"- Tồn kho: {kho_data['Ton_kho']:,.0f}")
             st.write(f"- Tỷ lệ xuất/nhập: {kho_data['Ti_le_xuat_nhap']:.2%}")
 
-with tab2:
+    # Tồn kho tại một ngày trong quá khứ (tra cứu trên lịch sử cộng dồn, không quét lại phiếu)
+    st.write("### Tồn kho tại ngày")
+    ngay_dau, ngay_cuoi = bang('khoang_ngay').iloc[0]
+    ton_ngay_cuoi = bang('ton_kho_ngay_cuoi')
+    
+    col3, col4 = st.columns([3, 2])
+    
+    with col4:
+        ngay_xem = st.date_input(
+            "Xem tồn kho tại ngày",
+            value=ngay_cuoi.date(),
+            min_value=ngay_dau.date(),
+            max_value=ngay_cuoi.date()
+        )
+        kho_xem = st.selectbox(
+            "Kho",
+            options=['Tất cả kho'] + list(ton_ngay_cuoi['Kho']),
+            key='history_warehouse'
+        )
+    
+    with col3:
+        # Ngày cuối đọc từ bảng tồn kho hiện tại; ngày khác mới cần lịch sử cộng dồn của bộ dữ liệu
+        xem_ngay_cuoi = ngay_xem == ngay_cuoi.date()
+        history = None if xem_ngay_cuoi else load_dataset().aggregates.history
+        if kho_xem == 'Tất cả kho':
+            ton_tai_ngay = ton_ngay_cuoi if xem_ngay_cuoi else history.warehouse_on_hand_at(ngay_xem)
+        else:
+            if xem_ngay_cuoi:
+                ton_kho = bang('ton_kho')
+                ton_kho_xem = ton_kho.loc[ton_kho['Kho'] == kho_xem, ['Kho', 'ma_pt', 'Ton_kho']]
+            else:
+                ton_kho_xem = history.on_hand_at(ngay_xem, kho=kho_xem)
+            ton_tai_ngay = pd.merge(
+                ton_kho_xem,
+                danh_muc[['ma_pt', 'ten_pt']],
+                on='ma_pt',
+                how='left'
+            ).sort_values('Ton_kho')
+        st.dataframe(ton_tai_ngay, hide_index=True, use_container_width=True)
+
+with tab2, stage('Tab Luồng hàng kho'):
     st.subheader("Luồng hàng qua các kho theo thời gian")
     
     # Tùy chọn phân tích theo
     analysis_option = st.radio(
         "Phân tích theo",
-        options=['Theo tháng', 'Theo quý', 'Theo năm'],
+        options=['Theo ngày', 'Theo tháng', 'Theo quý', 'Theo năm'],
+        index=1,
         horizontal=True
     )
     
-    # Chuẩn bị dữ liệu theo khoảng thời gian
-    if analysis_option == 'Theo tháng':
-        phieu_nhap['Thoi_gian'] = phieu_nhap['Ngày nhập kho'].dt.to_period('M').astype(str)
-        phieu_xuat['Thoi_gian'] = phieu_xuat['Ngày xuất hàng'].dt.to_period('M').astype(str)
-    elif analysis_option == 'Theo quý':
-        phieu_nhap['Thoi_gian'] = phieu_nhap['Ngày nhập kho'].dt.to_period('Q').astype(str)
-        phieu_xuat['Thoi_gian'] = phieu_xuat['Ngày xuất hàng'].dt.to_period('Q').astype(str)
-    else:
-        phieu_nhap['Thoi_gian'] = phieu_nhap['Ngày nhập kho'].dt.to_period('Y').astype(str)
-        phieu_xuat['Thoi_gian'] = phieu_xuat['Ngày xuất hàng'].dt.to_period('Y').astype(str)
-    
-    # Tính toán dữ liệu
-    nhap_theo_tg = phieu_nhap.groupby(['Thoi_gian', 'Kho_nhap'])['So_luong_nhap'].sum().reset_index()
-    xuat_theo_tg = phieu_xuat.groupby(['Thoi_gian', 'Kho_xuat'])['So_luong_xuat'].sum().reset_index()
+    # Lấy dữ liệu đã tổng hợp sẵn theo kỳ × kho (không sửa bảng phiếu gốc)
+    cap_thoi_gian = {'Theo ngày': 'D', 'Theo tháng': 'M', 'Theo quý': 'Q', 'Theo năm': 'Y'}[analysis_option]
+    nhap_theo_tg = bang(f'luong_nhap_{cap_thoi_gian}')
+    xuat_theo_tg = bang(f'luong_xuat_{cap_thoi_gian}')
     
-    # Vẽ biểu đồ
-    fig1 = px.line(
+    # Vẽ biểu đồ (chuỗi dài được giảm điểm bằng LTTB, vẽ bằng WebGL)
+    fig1 = line_chart(
         nhap_theo_tg, 
         x='Thoi_gian', 
-        y='So_luong_nhap', 
-        color='Kho_nhap',
+        y='sl_nhap', 
+        color='kho_nhap',
         title=f'Lượng nhập {analysis_option.lower()}',
-        labels={'So_luong_nhap': 'Số lượng nhập', 'Thoi_gian': 'Thời gian'}
+        labels={'sl_nhap': 'Số lượng nhập', 'Thoi_gian': 'Thời gian'}
     )
     
-    fig2 = px.line(
+    fig2 = line_chart(
         xuat_theo_tg, 
         x='Thoi_gian', 
-        y='So_luong_xuat', 
-        color='Kho_xuat',
+        y='sl_xuat', 
+        color='kho_xuat',
         title=f'Lượng xuất {analysis_option.lower()}',
-        labels={'So_luong_xuat': 'Số lượng xuất', 'Thoi_gian': 'Thời gian'}
+        labels={'sl_xuat': 'Số lượng xuất', 'Thoi_gian': 'Thời gian'}
     )
     
     st.plotly_chart(fig1, use_container_width=True)
     st.plotly_chart(fig2, use_container_width=True)
 
-with tab3:
+with tab3, stage('Tab So sánh kho'):
     st.subheader("So sánh hiệu quả các kho")
     
     # Phân tích mặt hàng theo kho
     st.write("### Phân bổ mặt hàng theo kho")
     
-    # Merge dữ liệu xuất với danh mục
-    xuat_chi_tiet = pd.merge(
-        phieu_xuat, 
-        danh_muc, 
-        left_on='Mã phụ tùng', 
-        right_on='Ma_phu_tung', 
-        how='left'
-    )
-    
-    # Nhóm theo kho và phụ tùng
-    kho_phu_tung = xuat_chi_tiet.groupby(['Kho_xuat', 'Ten_phu_tung'])['So_luong_xuat'].sum().reset_index()
+    # Tổng lượng xuất theo kho và phụ tùng (phiếu xuất ghép danh mục)
+    kho_phu_tung = bang('xuat_kho_phu_tung')
     
     # Chọn kho để phân tích sâu
     kho_selected = st.selectbox(
         "Chọn kho để phân tích chi tiết", 
-        options=kho_phu_tung['Kho_xuat'].unique(),
+        options=kho_phu_tung['kho_xuat'].unique(),
         key='warehouse_select'
     )
     
     if kho_selected:
      # Dữ liệu cho kho được chọn
-        kho_data = kho_phu_tung[kho_phu_tung['Kho_xuat'] == kho_selected]
+        kho_data = kho_phu_tung[kho_phu_tung['kho_xuat'] == kho_selected]
     
     # Top 10 mặt hàng xuất nhiều nhất
-        top_items = kho_data.nlargest(10, 'So_luong_xuat').sort_values('So_luong_xuat', ascending=True)
+        top_items = kho_data.nlargest(10, 'sl_xuat').sort_values('sl_xuat', ascending=True)
     
         col1, col2 = st.columns(2)
     
@@ -191,8 +206,8 @@ with tab3:
             st.write(f"#### Top 10 mặt hàng xuất nhiều nhất - {kho_selected}")
             st.dataframe(
                 top_items.style
-                    .bar(color='#5fba7d', subset=['So_luong_xuat'])
-                    .format({'So_luong_xuat': '{:,.0f}'}),
+                    .bar(color='#5fba7d', subset=['sl_xuat'])
+                    .format({'sl_xuat': '{:,.0f}'}),
                 use_container_width=True
             )
     
@@ -200,12 +215,12 @@ with tab3:
         # Tạo biểu đồ cột ngang
             fig = px.bar(
                 top_items,
-                x='So_luong_xuat',
-                y='Ten_phu_tung',
+                x='sl_xuat',
+                y='ten_pt',
                 orientation='h',
                 title=f"Top 10 mặt hàng xuất nhiều nhất - {kho_selected}",
-                labels={'So_luong_xuat': 'Số lượng xuất', 'Ten_phu_tung': 'Tên phụ tùng'},
-                color='So_luong_xuat',
+                labels={'sl_xuat': 'Số lượng xuất', 'ten_pt': 'Tên phụ tùng'},
+                color='sl_xuat',
                 color_continuous_scale='Blues'
             )
         
@@ -223,22 +238,7 @@ with tab3:
     st.write("### Chỉ số hiệu suất kho")
 
     # Tính toán các chỉ số quan trọng
-    performance_metrics = phieu_nhap.groupby('Kho_nhap').agg({
-        'So_luong_nhap': ['sum', 'mean', 'count']
-    }).reset_index()
-    performance_metrics.columns = ['Kho', 'Tong_nhap', 'Trung_binh_nhap', 'So_lan_nhap']
-
-    # Tính thêm các chỉ số từ phiếu xuất
-    xuat_metrics = phieu_xuat.groupby('Kho_xuat')['So_luong_xuat'].sum().reset_index()
-    performance_metrics = pd.merge(
-        performance_metrics,
-        xuat_metrics,
-        left_on='Kho',
-        right_on='Kho_xuat',
-        how='left'
-    )
-    performance_metrics['Ti_le_xuat_nhap'] = performance_metrics['So_luong_xuat'] / performance_metrics['Tong_nhap']
-    performance_metrics['Ton_kho'] = performance_metrics['Tong_nhap'] - performance_metrics['So_luong_xuat']
+    performance_metrics = bang('hieu_suat_kho')
 
     # Hiển thị các biểu đồ cột so sánh
     col1, col2 = st.columns(2)
@@ -248,7 +248,7 @@ with tab3:
         fig = px.bar(
             performance_metrics,
             x='Kho',
-            y=['Tong_nhap', 'So_luong_xuat'],
+            y=['Tong_nhap', 'Tong_xuat'],
             barmode='group',
             title='Tổng lượng nhập và xuất theo kho',
             labels={'value': 'Số lượng', 'variable': 'Loại'},
@@ -300,38 +300,12 @@ with tab3:
             }.get(d.name, d.name)
         st.plotly_chart(fig, use_container_width=True)
 
-with tab4:
+with tab4, stage('Tab Cảnh báo'):
     st.subheader("Cảnh báo kho")
     
     # Cảnh báo tồn kho thấp
     st.write("### Cảnh báo tồn kho thấp")
     
-    # Tính tổng nhập theo kho và mã phụ tùng
-    tong_nhap = phieu_nhap.groupby(['Kho_nhap', 'Mã phụ tùng'])['So_luong_nhap'].sum().reset_index()
-    tong_nhap.columns = ['Kho', 'Ma_phu_tung', 'Tong_nhap']
-    
-    # Tính tổng xuất theo kho và mã phụ tùng
-    tong_xuat = phieu_xuat.groupby(['Kho_xuat', 'Mã phụ tùng'])['So_luong_xuat'].sum().reset_index()
-    tong_xuat.columns = ['Kho', 'Ma_phu_tung', 'Tong_xuat']
-    
-    # Merge và tính tồn kho
-    ton_kho = pd.merge(
-        tong_nhap,
-        tong_xuat,
-        on=['Kho', 'Ma_phu_tung'],
-        how='outer'
-    ).fillna(0)
-    
-    ton_kho['Ton_kho'] = ton_kho['Tong_nhap'] - ton_kho['Tong_xuat']
-    
-    # Merge với danh mục để lấy tên phụ tùng
-    ton_kho = pd.merge(
-        ton_kho,
-        danh_muc[['Ma_phu_tung', 'Ten_phu_tung']],
-        on='Ma_phu_tung',
-        how='left'
-    )
-    
     # Lọc các mặt hàng tồn kho âm hoặc dưới ngưỡng
     ngưỡng_cảnh_báo = st.slider(
         "Ngưỡng cảnh báo tồn kho", 
@@ -340,16 +314,166 @@ with tab4:
         value=10
     )
     
-    items_canh_bao = ton_kho[ton_kho['Ton_kho'] <= ngưỡng_cảnh_báo]
+    # Bảng tồn kho kho × phụ tùng dựng sẵn: lọc ngưỡng là phép so sánh trên mảng
+    ton_kho = bang('ton_kho')
+    items_canh_bao = ton_kho[ton_kho['Ton_kho'] <= ngưỡng_cảnh_báo].reset_index(drop=True)
+    
+    # Merge với danh mục để lấy tên phụ tùng (chỉ trên các dòng cần cảnh báo)
+    items_canh_bao = pd.merge(
+        items_canh_bao,
+        danh_muc[['ma_pt', 'ten_pt']],
+        on='ma_pt',
+        how='left'
+    )
     
     if not items_canh_bao.empty:
         # Chỉ hiển thị các cột cần thiết
-        st.dataframe(
-            items_canh_bao[['Kho', 'Ma_phu_tung', 'Ten_phu_tung', 'Ton_kho']]
-                .sort_values('Ton_kho')
-                .style
-                .applymap(lambda x: 'color: red' if x <= 0 else 'color: orange', subset=['Ton_kho']),
-            use_container_width=True
+        # Phân trang phía server: chỉ tô màu các dòng của trang đang xem
+        paged_table(
+            items_canh_bao[['Kho', 'ma_pt', 'ten_pt', 'Ton_kho']],
+            key='canh_bao_ton',
+            style=lambda styler, data: styler.map(
+                lambda x: 'color: red' if x <= 0 else 'color: orange', subset=['Ton_kho']
+            ),
+            sort_column='Ton_kho',
+            hide_index=False
         )
     else:
-        st.success("Không có mặt hàng nào dưới ngưỡng cảnh báo")
\ No newline at end of file
+        st.success("Không có mặt hàng nào dưới ngưỡng cảnh báo")
+
+    # Cảnh báo theo điểm đặt hàng lại (ROP) từ dự báo nhu cầu từng phụ tùng × kho
+    st.write("### Cảnh báo theo điểm đặt hàng lại (ROP)")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        chu_ky = st.radio("Chu kỳ dự báo", ['Theo tháng', 'Theo tuần'], horizontal=True)
+    with col2:
+        thoi_gian_bo_sung = st.number_input("Thời gian bổ sung hàng (ngày)", min_value=1, max_value=180, value=30)
+    with col3:
+        muc_phuc_vu = st.select_slider(
+            "Mức phục vụ",
+            options=[0.90, 0.95, 0.98, 0.99],
+            value=0.95,
+            format_func=lambda x: f"{x:.0%}"
+        )
+
+    # Dự báo tính một lần cho mỗi phiên bản dữ liệu; đổi thời gian bổ sung/mức phục vụ chỉ tính lại ROP
+    cap_du_bao = {'Theo tháng': 'M', 'Theo tuần': 'W'}[chu_ky]
+    with st.spinner('Đang dự báo nhu cầu...'), stage('Dự báo nhu cầu'):
+        du_bao = reorder_points(bang(f'du_bao_{cap_du_bao}'), cap_du_bao, thoi_gian_bo_sung, muc_phuc_vu)
+
+    # Ghép tồn kho hiện tại, giữ các mặt hàng có nhu cầu và tồn <= ROP
+    items_rop = du_bao.merge(
+        ton_kho[['Kho', 'ma_pt', 'Ton_kho']],
+        left_on=['kho_xuat', 'ma_pt'],
+        right_on=['Kho', 'ma_pt']
+    )
+    items_rop = items_rop[(items_rop['du_bao'] > 0) & (items_rop['Ton_kho'] <= items_rop['diem_dat_hang'])]
+    items_rop = items_rop.assign(
+        mo_hinh=items_rop['mo_hinh'].map(METHOD_NAMES),
+        Can_bo_sung=items_rop['diem_dat_hang'] - items_rop['Ton_kho']
+    )
+
+    st.metric("Số mặt hàng cần đặt hàng lại", f"{len(items_rop):,}")
+    if not items_rop.empty:
+        paged_table(
+            items_rop[['Kho', 'ma_pt', 'mo_hinh', 'du_bao', 'ton_an_toan', 'diem_dat_hang', 'Ton_kho', 'Can_bo_sung']],
+            key='canh_bao_rop',
+            format={
+                'du_bao': '{:.1f}',
+                'ton_an_toan': '{:.1f}',
+                'diem_dat_hang': '{:.1f}',
+                'Ton_kho': '{:,.0f}',
+                'Can_bo_sung': '{:.1f}'
+            },
+            sort_column='Can_bo_sung',
+            ascending=False
+        )
+
+    # Kiểm định chính sách ROP trên lịch sử: phát lại phiếu xuất thực tế với các gốc dự báo lăn
+    st.write("### Kiểm định chính sách đặt hàng trên lịch sử")
+    if st.checkbox("Chạy kiểm định (backtest) với thông số ROP ở trên"):
+        so_ky_dat_them = st.slider("Đặt hàng lên mức ROP + số kỳ nhu cầu", min_value=0, max_value=6, value=1)
+        chinh_sach = {
+            'level': cap_du_bao,
+            'lead_time_days': thoi_gian_bo_sung,
+            'service_level': muc_phuc_vu,
+            'cover_periods': so_ky_dat_them
+        }
+        try:
+            with st.spinner('Đang phát lại lịch sử nhập/xuất...'), stage('Kiểm định chính sách (cached_backtest)'):
+                ket_qua = summarize(cached_backtest(load_dataset(), chinh_sach))
+        except ValueError as e:
+            st.warning(str(e))
+        else:
+            st.caption("Tồn kho TB: tổng tồn trung bình mỗi kỳ theo chính sách; Tồn thực tế TB: theo phiếu nhập/xuất thực tế")
+            st.dataframe(
+                ket_qua.rename(columns={'nhom': 'Nhóm nhu cầu'}).style.format({
+                    'Nhu_cau': '{:,.0f}',
+                    'Da_dap_ung': '{:,.0f}',
+                    'Ti_le_dap_ung': '{:.1%}',
+                    'Ti_le_ky_het_hang': '{:.1%}',
+                    'So_lan_dat': '{:,.0f}',
+                    'Ton_TB': '{:,.0f}',
+                    'Ton_thuc_te_TB': '{:,.0f}'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
+with tab5, stage('Tab Đáp ứng đơn hàng'):
+    st.subheader("Thời gian giao hàng và tỷ lệ đáp ứng đơn hàng")
+
+    # Chỉ số ghép đơn đặt hàng × phiếu xuất theo (mã đơn, mã phụ tùng), dựng một lần cho mỗi phiên bản dữ liệu
+    with st.spinner('Đang ghép đơn hàng với phiếu xuất...'):
+        tong_quan = bang('dap_ung_tong_quan').iloc[0]
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Số dòng đơn hàng", f"{tong_quan['so_dong_don']:,}")
+    col2.metric("Tỷ lệ đáp ứng (theo lượng)", f"{tong_quan['ti_le_dap_ung']:.1%}")
+    col3.metric("Tỷ lệ dòng giao đủ", f"{tong_quan['ti_le_giao_du']:.1%}")
+    col4.metric("Thời gian giao đủ (trung vị, ngày)", f"{tong_quan['tg_giao_du_trung_vi']:.1f}")
+    if tong_quan['phieu_khong_khop']:
+        st.caption(f"{tong_quan['phieu_khong_khop']:,} dòng phiếu xuất không khớp đơn đặt hàng nào (theo mã đơn và mã phụ tùng)")
+
+    tong_hop_theo = st.selectbox(
+        "Tổng hợp theo",
+        options=list(SUMMARY_KEYS),
+        format_func=SUMMARY_KEYS.get
+    )
+    bang_dap_ung = bang(f'dap_ung_{tong_hop_theo}').sort_values('So_dong_don', ascending=False)
+
+    # Biểu đồ thời gian giao đủ trung bình (các nhóm nhiều dòng đơn nhất)
+    fig = px.bar(
+        bang_dap_ung.head(30),
+        x=tong_hop_theo,
+        y='TG_giao_du_TB',
+        color='Ti_le_dap_ung',
+        title=f"Thời gian giao đủ trung bình theo {SUMMARY_KEYS[tong_hop_theo].lower()}",
+        labels={
+            tong_hop_theo: SUMMARY_KEYS[tong_hop_theo],
+            'TG_giao_du_TB': 'Số ngày',
+            'Ti_le_dap_ung': 'Tỷ lệ đáp ứng'
+        }
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    paged_table(
+        bang_dap_ung,
+        key='dap_ung',
+        format={
+            'Tong_dat': '{:,.0f}',
+            'Tong_dap_ung': '{:,.0f}',
+            'Ti_le_dap_ung': '{:.1%}',
+            'Ti_le_giao_du': '{:.1%}',
+            'So_phieu_TB': '{:.2f}',
+            'TG_xuat_dau_TB': '{:.1f}',
+            'TG_giao_du_TB': '{:.1f}',
+            'TG_giao_du_trung_vi': '{:.1f}'
+        },
+        sort_column='So_dong_don',
+        ascending=False,
+        search_columns=[tong_hop_theo]
+    )
+
+diagnostics_panel()
@@ -0,0 +1,88 @@
+# benchmarks/bench_part_features.py
+"""
+So sánh tốc độ tính đặc trưng phụ tùng: groupby + lambda (cách cũ) và utils.features
+
+Chạy từ thư mục gốc dự án:
+    python -m benchmarks.bench_part_features [số dòng ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.features import part_features
+
+
+def legacy_features(phieu_xuat):
+    """
+    Cách tính cũ của trang Phân tích phụ tùng (giữ lại để đối chiếu)
+    """
+    phieu_xuat = phieu_xuat.copy()
+    phieu_xuat['thang'] = phieu_xuat['ngay_xuat'].dt.to_period('M')
+
+    features = phieu_xuat.groupby('ma_pt', observed=True).agg({
+        'sl_xuat': ['sum', 'mean', 'std'],
+        'ngay_xuat': ['count', lambda x: (x.max() - x.min()).days]
+    }).reset_index()
+    features.columns = ['ma_pt', 'tong_xuat', 'trung_binh_xuat',
+                        'do_lech_chuan', 'so_lan_xuat', 'so_ngay_hoat_dong']
+    features['so_ngay_hoat_dong'] = features['so_ngay_hoat_dong'].replace(0, 1)
+    features['tan_suat'] = features['so_lan_xuat'] / (features['so_ngay_hoat_dong'] / 30)
+    khoang_cach = phieu_xuat.groupby('ma_pt', observed=True)['ngay_xuat'].agg(
+        lambda x: x.drop_duplicates().sort_values().diff().dt.days.mean()
+    )
+    features['khoang_cach_tb'] = features['ma_pt'].map(khoang_cach).to_numpy()
+    features['do_bien_dong'] = features['do_lech_chuan'] / features['trung_binh_xuat']
+
+    monthly_sales = phieu_xuat.groupby(['ma_pt', 'thang'], observed=True)['sl_xuat'].sum().reset_index()
+    total_months = phieu_xuat['thang'].nunique()
+    monthly_count = monthly_sales.groupby('ma_pt', observed=True)['thang'].count().reset_index()
+    monthly_count.columns = ['ma_pt', 'so_thang_co_xuat']
+    features = pd.merge(features, monthly_count, on='ma_pt')
+    features['ti_le_thang_xuat'] = features['so_thang_co_xuat'] / total_months
+
+    features.replace([np.inf, -np.inf], np.nan, inplace=True)
+    features.fillna(0, inplace=True)
+    return features
+
+
+def synthetic_slips(n_rows, n_parts=None, seed=42):
+    """
+    Phiếu xuất giả lập: mã phụ tùng phân bố lệch, ngày trong 3 năm, số lượng 1-20
+    """
+    rng = np.random.default_rng(seed)
+    n_parts = n_parts or max(n_rows // 50, 10)
+    parts = np.array([f"PT{i:06d}" for i in range(n_parts)])
+    ma_pt = parts[np.minimum(rng.zipf(1.3, n_rows) - 1, n_parts - 1)]
+    ngay = np.datetime64('2022-01-01') + rng.integers(0, 3 * 365, n_rows).astype('timedelta64[D]')
+    return pd.DataFrame({
+        'ngay_xuat': pd.to_datetime(ngay),
+        'ma_pt': pd.Categorical(ma_pt, categories=parts),
+        'sl_xuat': rng.integers(1, 21, n_rows).astype(np.int32)
+    })
+
+
+def _timed(func, data, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(sizes):
+    print(f"{'so_dong':>10} {'so_pt':>8} {'cu (s)':>10} {'moi (s)':>10} {'nhanh hon':>10}")
+    for n_rows in sizes:
+        slips = synthetic_slips(n_rows)
+        t_old, old = _timed(legacy_features, slips)
+        t_new, new = _timed(part_features, slips)
+        pd.testing.assert_frame_equal(
+            old.astype({'ma_pt': str}), new.astype({'ma_pt': str}), check_dtype=False
+        )
+        print(f"{n_rows:>10,} {len(new):>8,} {t_old:>10.3f} {t_new:>10.3f} {t_old / t_new:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,241 @@
+# benchmarks/bench_suite.py
+"""
+Đo tốc độ các bước chính trên dữ liệu giả lập ở nhiều quy mô và lưu kết quả để so sánh
+giữa các phiên bản
+
+Chạy từ thư mục gốc dự án:
+    python -m benchmarks.bench_suite [--scales nho vua] [--profile hon_hop] [--repeat 3] [--memory]
+
+Mỗi lần chạy ghi nối vào RESULTS_FILE (JSON lines, mỗi bước một dòng, kèm commit git) và so
+với lần chạy gần nhất trước đó cùng quy mô/hồ sơ: bước chậm hơn quá `--threshold` bị đánh dấu.
+RESULTS_FILE ghi cả tên máy nên chỉ để trên máy chạy (đã có trong .gitignore).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from benchmarks.synthetic import GENERATOR_VERSION, PROFILES, generate, write_workbook
+from utils.aggregates import InventoryAggregates
+from utils.artifacts import FLOW_LEVELS
+from utils.clustering import DEALER_CLUSTERS, PART_CLUSTER_FEATURES, PART_CLUSTERS, DealerSegmentation, kmeans_result
+from utils.data_loader import load_inventory_data
+from utils.dataset import COLUMNS, SHEET_TABLES
+from utils.diagnostics import count_rows, stage, start_run
+from utils.features import dealer_features, demand_classes, part_features
+from utils.time_cube import FLOWS, TimeCube
+
+# Quy mô dữ liệu giả lập: số phụ tùng, đại lý, kho và số năm
+SCALES = {
+    'nho': {'n_parts': 500, 'n_dealers': 60, 'n_warehouses': 3, 'years': 3},
+    'vua': {'n_parts': 2_000, 'n_dealers': 200, 'n_warehouses': 5, 'years': 3},
+    'lon': {'n_parts': 10_000, 'n_dealers': 800, 'n_warehouses': 8, 'years': 4}
+}
+
+# Thư mục chứa file Excel giả lập (sinh một lần, dùng lại) và file kết quả
+DATA_DIR = "benchmarks/.data"
+RESULTS_FILE = "benchmarks/results.jsonl"
+
+# Chậm hơn lần chạy trước quá tỷ lệ này thì coi là chậm đi
+THRESHOLD = 0.2
+
+# Số lần đọc Excel mỗi quy mô (đọc Excel chậm nên không lặp theo `--repeat`)
+EXCEL_REPEAT = 1
+
+
+def workbook_path(scale, profile, seed, directory=DATA_DIR):
+    """
+    File Excel giả lập của một quy mô, sinh mới nếu chưa có
+    """
+    path = os.path.join(directory, f"synthetic_v{GENERATOR_VERSION}_{scale}_{profile}_{seed}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        start = time.perf_counter()
+        tmp = f"{path}.{os.getpid()}.tmp.xlsx"
+        write_workbook(generate(profile=profile, seed=seed, **SCALES[scale]), tmp)
+        os.replace(tmp, path)
+        print(f"Đã sinh {path} trong {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def _measure(name, func, repeat, memory=False):
+    """
+    Chạy `func` `repeat` lần, lấy thời gian nhanh nhất; với `memory` chạy thêm một lần có
+    tracemalloc để đo bộ nhớ đỉnh (tracemalloc làm chậm nên không tính vào thời gian)
+    """
+    runs = []
+    for _ in range(max(repeat, 1)):
+        with stage(name) as record:
+            result = func()
+            record['rows'] = count_rows(result)
+        runs.append(record)
+    best = min(runs, key=lambda r: r['seconds'])
+
+    peak_mb = None
+    if memory:
+        start_run(f"bench:{name}", track_memory=True)
+        with stage(name) as traced:
+            func()
+        peak_mb = traced['peak_mb']
+        start_run(f"bench:{name}")
+    return {'stage': name, 'seconds': best['seconds'], 'peak_mb': peak_mb, 'rows': best['rows']}, result
+
+
+def run_scale(path, repeat=3, memory=False):
+    """
+    Đo các bước trên một file dữ liệu, trả về danh sách kết quả từng bước
+    """
+    results = []
+
+    def measure(name, func, n=repeat):
+        record, result = _measure(name, func, n, memory)
+        results.append(record)
+        return result
+
+    measure('doc_excel', lambda: load_inventory_data(path, use_snapshot=False), EXCEL_REPEAT)
+    load_inventory_data(path)  # ghi snapshot (nếu chưa có) trước khi đo đọc snapshot
+    frames = measure('doc_snapshot', lambda: load_inventory_data(path))
+
+    tables = {
+        SHEET_TABLES[sheet]: df.rename(columns=COLUMNS[SHEET_TABLES[sheet]])
+        for sheet, df in zip(SHEET_TABLES, frames)
+    }
+    pn, px = tables['phieu_nhap'], tables['phieu_xuat']
+
+    aggregates = measure('tong_hop', lambda: InventoryAggregates(tables))
+    measure('tong_quan_kho', aggregates.warehouse_summary)
+    measure('time_cube', lambda: [
+        TimeCube.build(pn, px, aggregates.ledger.warehouses).series(flow, level)
+        for flow in FLOWS for level in FLOW_LEVELS
+    ])
+
+    features = measure('dac_trung_phu_tung', lambda: part_features(px))
+    measure('nhom_nhu_cau', lambda: demand_classes(px))
+    dealers = measure('dac_trung_dai_ly', lambda: dealer_features(aggregates.dealer_stats(), aggregates.dai_ly_pt))
+
+    # Phân cụm không qua cache (cached_clustering) để đo đúng thời gian huấn luyện
+    X = features[PART_CLUSTER_FEATURES].to_numpy(dtype='float64')
+    measure('phan_cum_phu_tung', lambda: kmeans_result(X, PART_CLUSTERS)['labels'])
+    measure('phan_cum_dai_ly', lambda: DealerSegmentation(DEALER_CLUSTERS).fit(dealers).labels_for(dealers))
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """
+    Thông tin môi trường ghi kèm kết quả (máy, số CPU, phiên bản thư viện)
+    """
+    return {
+        'commit': _git_commit(),
+        'machine': platform.node(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__
+    }
+
+
+def load_results(path=RESULTS_FILE):
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    with open(path, encoding='utf-8') as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def save_results(rows, path=RESULTS_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def compare(current, previous, threshold=THRESHOLD):
+    """
+    So thời gian từng bước với lần chạy gần nhất trước đó (cùng quy mô, hồ sơ và máy)
+
+    Trả về bảng so sánh có cột `ti_le` (mới / cũ) và `cham_hon` (vượt ngưỡng).
+    """
+    current = pd.DataFrame(current)
+    keys = ['scale', 'profile', 'machine', 'stage']
+    if previous.empty:
+        return current.assign(truoc=np.nan, ti_le=np.nan, cham_hon=False)
+
+    previous = previous[previous['run'] != current['run'].iloc[0]]
+    previous = previous.merge(current[['scale', 'profile', 'machine']].drop_duplicates(),
+                              on=['scale', 'profile', 'machine'])
+    last = previous.sort_values('run').groupby(keys, sort=False).tail(1)
+    table = current.merge(last[keys + ['seconds', 'commit']].rename(
+        columns={'seconds': 'truoc', 'commit': 'commit_truoc'}), on=keys, how='left')
+    table['ti_le'] = table['seconds'] / table['truoc']
+    table['cham_hon'] = table['ti_le'] > 1 + threshold
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo tốc độ các bước xử lý trên dữ liệu giả lập")
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['nho', 'vua'], help="Các quy mô cần đo")
+    parser.add_argument('--profile', choices=list(PROFILES), default='hon_hop', help="Hồ sơ gián đoạn nhu cầu")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3, help="Số lần lặp mỗi bước (lấy lần nhanh nhất)")
+    parser.add_argument('--memory', action='store_true', help="Đo thêm bộ nhớ đỉnh (mỗi bước chạy thêm một lần với tracemalloc, chậm)")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Thư mục chứa file Excel giả lập")
+    parser.add_argument('--results', default=RESULTS_FILE, help="File JSON lines lưu kết quả")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="Ngưỡng chậm hơn so với lần trước")
+    parser.add_argument('--no-save', action='store_true', help="Chỉ in kết quả, không ghi vào file")
+    parser.add_argument('--strict', action='store_true', help="Thoát với mã 1 nếu có bước chậm hơn ngưỡng")
+    args = parser.parse_args(argv)
+
+    # Mã lần chạy: thời điểm đến micro giây (sắp xếp theo thời gian) + chuỗi ngẫu nhiên để không trùng
+    run = f"{datetime.now().isoformat(timespec='microseconds')}-{uuid.uuid4().hex[:8]}"
+    env = environment()
+    previous = load_results(args.results)
+    rows = []
+    for scale in args.scales:
+        path = workbook_path(scale, args.profile, args.seed, args.data_dir)
+        start_run(f"bench:{scale}")
+        for record in run_scale(path, args.repeat, args.memory):
+            rows.append(dict(
+                env, run=run, scale=scale, profile=args.profile, seed=args.seed,
+                generator=GENERATOR_VERSION, stage=record['stage'], seconds=record['seconds'],
+                peak_mb=record['peak_mb'], rows=record['rows'], repeat=args.repeat
+            ))
+
+    table = compare(rows, previous, args.threshold)
+    print(f"\nCommit {env['commit']} · {env['cpus']} CPU · pandas {env['pandas']} · hồ sơ {args.profile}")
+    print(f"{'quy_mo':<6} {'buoc':<20} {'so_dong':>10} {'moi (s)':>9} {'truoc (s)':>10} {'ti_le':>7}"
+          + (f" {'MB':>8}" if args.memory else ''))
+    for r in table.itertuples():
+        truoc = f"{r.truoc:>10.3f}" if pd.notna(r.truoc) else f"{'-':>10}"
+        ti_le = f"{r.ti_le:>6.2f}x" if pd.notna(r.ti_le) else f"{'-':>7}"
+        rows_text = f"{r.rows:>10,.0f}" if pd.notna(r.rows) else f"{'-':>10}"
+        print(f"{r.scale:<6} {r.stage:<20} {rows_text} {r.seconds:>9.3f} {truoc} {ti_le}"
+              + (f" {r.peak_mb:>8.1f}" if args.memory else '')
+              + ("  <- CHẬM HƠN" if r.cham_hon else ''))
+
+    if not args.no_save:
+        save_results(rows, args.results)
+        print(f"\nĐã ghi {len(rows)} kết quả vào {args.results}")
+    if args.strict and table['cham_hon'].any():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+# benchmarks/synthetic.py
+"""
+Sinh file Excel dữ liệu giả lập đúng 5 sheet mà utils.data_loader đọc (không cần dữ liệu thật)
+
+Chạy từ thư mục gốc dự án:
+    python -m benchmarks.synthetic file.xlsx [--parts 500] [--dealers 60] [--warehouses 3]
+                                             [--years 3] [--profile hon_hop] [--seed 42]
+"""
+import argparse
+import time
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from utils.export import python_rows
+
+# Tăng số này khi đổi cách sinh dữ liệu (file sinh trước đó với cùng tham số sẽ khác nội dung)
+GENERATOR_VERSION = 1
+
+# Kiểu nhu cầu của một phụ tùng -> (số ngày TB giữa hai lần có nhu cầu, hệ số biến thiên số lượng),
+# theo 4 nhóm Syntetos–Boylan khi tổng hợp theo tháng
+ARCHETYPES = {
+    'smooth': (10, 0.3),
+    'erratic': (10, 1.2),
+    'intermittent': (75, 0.3),
+    'lumpy': (75, 1.2)
+}
+
+# Hồ sơ gián đoạn: tỷ lệ phụ tùng thuộc từng kiểu nhu cầu
+PROFILES = {
+    'on_dinh': {'smooth': 0.7, 'erratic': 0.2, 'intermittent': 0.05, 'lumpy': 0.05},
+    'hon_hop': {'smooth': 0.4, 'erratic': 0.2, 'intermittent': 0.25, 'lumpy': 0.15},
+    'gian_doan': {'smooth': 0.1, 'erratic': 0.1, 'intermittent': 0.4, 'lumpy': 0.4}
+}
+
+START_DATE = '2022-01-01'
+
+# Tỷ lệ dòng đơn không được xuất, tỷ lệ dòng xuất làm hai phiếu, tỷ lệ đơn gấp và tỷ lệ dòng có RO
+UNFILLED_SHARE = 0.05
+SPLIT_SHARE = 0.15
+URGENT_SHARE = 0.2
+RO_SHARE = 0.1
+
+
+def _codes(prefix, n, width=5):
+    width = max(width, len(str(max(n - 1, 0))))
+    return np.array([f"{prefix}{i:0{width}d}" for i in range(n)], dtype=object)
+
+
+def _warehouse_names(n):
+    named = ['KHO_HN', 'KHO_HCM', 'KHO_DN']
+    return np.array(named[:n] + [f"KHO_{i + 1:02d}" for i in range(len(named), n)], dtype=object)
+
+
+def _demand_lines(rng, n_parts, days, profile):
+    """
+    Các dòng nhu cầu (phụ tùng, ngày, số lượng): số lần có nhu cầu mỗi phụ tùng ~ Poisson theo
+    khoảng cách TB của kiểu nhu cầu, số lượng ~ Gamma với hệ số biến thiên của kiểu đó
+    """
+    kinds = list(ARCHETYPES)
+    share = np.array([PROFILES[profile][k] for k in kinds])
+    kind = rng.choice(len(kinds), n_parts, p=share / share.sum())
+    adi = np.array([ARCHETYPES[k][0] for k in kinds])[kind] * rng.lognormal(0, 0.3, n_parts)
+    cv = np.array([ARCHETYPES[k][1] for k in kinds])[kind]
+    mean_qty = rng.lognormal(np.log(5), 0.7, n_parts)
+
+    counts = rng.poisson(days / adi)
+    part = np.repeat(np.arange(n_parts), counts)
+    shape = 1 / cv[part] ** 2
+    qty = np.ceil(rng.gamma(shape, mean_qty[part] / shape)).astype(np.int64)
+    day = rng.integers(0, days, len(part))
+    return part, day, np.maximum(qty, 1)
+
+
+def generate(n_parts=500, n_dealers=60, n_warehouses=3, years=3, profile='hon_hop', seed=42, start=START_DATE):
+    """
+    Sinh 5 bảng giả lập {tên sheet: DataFrame} với đúng tên cột của file Excel thật
+
+    Đơn đặt hàng: mỗi dòng nhu cầu là một dòng đơn, các dòng cùng đại lý cùng ngày chung một mã
+    đơn. Phiếu xuất: xuất từ kho gần đại lý sau vài ngày, một phần dòng tách hai phiếu, một phần
+    không được xuất. Phiếu nhập: mỗi tháng nhập bù lượng đã xuất của (phụ tùng, kho) trong tháng.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Hồ sơ gián đoạn không hợp lệ: {profile} (chọn một trong {', '.join(PROFILES)})")
+    rng = np.random.default_rng(seed)
+    days = int(round(365.25 * years))
+    start = np.datetime64(start, 'D')
+
+    parts = _codes('PT', n_parts)
+    dealers = _codes('DL', n_dealers, 3)
+    warehouses = _warehouse_names(n_warehouses)
+
+    danh_muc = pd.DataFrame({
+        'Mã phụ tùng': parts,
+        'Tên phụ tùng': [f"Tên {p}" for p in parts],
+        'Group No': rng.integers(1, 21, n_parts),
+        'Part Name Code': parts,
+        'Các model áp dụng': rng.choice(np.array(['A', 'B', 'C', 'A, B', 'B, C', 'A, B, C'], dtype=object), n_parts)
+    })
+
+    # Đơn đặt hàng: đại lý lớn đặt nhiều hơn (trọng số Dirichlet), đánh số đơn theo thứ tự ngày
+    part, day, qty = _demand_lines(rng, n_parts, days, profile)
+    dealer = rng.choice(n_dealers, len(part), p=rng.dirichlet(np.full(n_dealers, 0.5)))
+    order = np.lexsort((part, dealer, day))
+    part, day, qty, dealer = part[order], day[order], qty[order], dealer[order]
+    new_order = np.ones(len(part), dtype=bool)
+    new_order[1:] = (day[1:] != day[:-1]) | (dealer[1:] != dealer[:-1])
+    ma_dh = np.cumsum(new_order) - 1
+    orders = _codes('DH', new_order.sum(), 6)
+    urgent = rng.random(len(orders)) < URGENT_SHARE
+    don_dat_hang = pd.DataFrame({
+        'Ngày đặt hàng': pd.to_datetime(start + day),
+        'Mã đại lý': dealers[dealer],
+        'Mã đơn hàng': orders[ma_dh],
+        'Mã phụ tùng': parts[part],
+        'Số lượng': qty,
+        'Hình thức đơn hàng': np.where(urgent[ma_dh], 'Gấp', 'Thường').astype(object)
+    })
+
+    # Phiếu xuất: mỗi đại lý lấy hàng từ một kho; dòng tách phiếu giao phần còn lại muộn hơn
+    home = rng.integers(0, n_warehouses, n_dealers)
+    line = np.flatnonzero(rng.random(len(part)) >= UNFILLED_SHARE)
+    ship = day[line] + rng.geometric(0.4, len(line)) - 1
+    split = rng.random(len(line)) < SPLIT_SHARE
+    first = np.where(split, np.ceil(qty[line] * rng.uniform(0.3, 0.8, len(line))), qty[line]).astype(np.int64)
+    second = np.flatnonzero(split & (first < qty[line]))
+    line = np.concatenate([line, line[second]])
+    ship = np.concatenate([ship, ship[second] + rng.geometric(0.3, len(second))])
+    sl_xuat = np.concatenate([first, qty[line[len(first):]] - first[second]])
+
+    keep = ship < days
+    line, ship, sl_xuat = line[keep], ship[keep], sl_xuat[keep]
+    order = np.lexsort((line, ship))
+    line, ship, sl_xuat = line[order], ship[order], sl_xuat[order]
+    so_phieu = pd.factorize(pd.MultiIndex.from_arrays([ma_dh[line], ship]))[0]
+    kho = home[dealer[line]]
+    phieu_xuat = pd.DataFrame({
+        'Ngày xuất hàng': pd.to_datetime(start + ship),
+        'Mã đại lý': dealers[dealer[line]],
+        'Mã đơn hàng': orders[ma_dh[line]],
+        'Số phiếu xuất': _codes('PX', so_phieu.max() + 1 if len(so_phieu) else 0, 7)[so_phieu],
+        'Mã phụ tùng': parts[part[line]],
+        'Số lượng xuất': sl_xuat,
+        'Kho xuất': warehouses[kho]
+    })
+
+    # Phiếu nhập: đầu mỗi tháng (sớm hơn vài ngày) nhập bù lượng xuất trong tháng, dư 0-30%
+    month = (start + ship).astype('datetime64[M]')
+    nhap = pd.DataFrame({'pt': part[line], 'kho': kho, 'thang': month, 'sl': sl_xuat}) \
+        .groupby(['pt', 'kho', 'thang'], sort=False)['sl'].sum().reset_index()
+    ngay_nhap = np.maximum(
+        nhap['thang'].to_numpy().astype('datetime64[D]') - rng.integers(0, 15, len(nhap)), start
+    )
+    nhap = nhap.assign(ngay=ngay_nhap).sort_values(['ngay', 'pt', 'kho'], kind='stable')
+    phieu_nhap = pd.DataFrame({
+        'Ngày nhập kho': pd.to_datetime(nhap['ngay'].to_numpy()),
+        'Mã phụ tùng': parts[nhap['pt'].to_numpy()],
+        'Số lượng nhập': np.ceil(nhap['sl'].to_numpy() * rng.uniform(1.0, 1.3, len(nhap))).astype(np.int64),
+        'Kho nhập': warehouses[nhap['kho'].to_numpy()]
+    })
+
+    # RO của đại lý: một phần dòng đơn, đặt trước đơn vài ngày
+    ro = np.flatnonzero(rng.random(len(part)) < RO_SHARE)
+    ngay_ro = np.maximum(day[ro] - rng.integers(0, 5, len(ro)), 0)
+    order = np.argsort(ngay_ro, kind='stable')
+    ro, ngay_ro = ro[order], ngay_ro[order]
+    ro_frame = pd.DataFrame({
+        'Ngày đặt RO': pd.to_datetime(start + ngay_ro),
+        'Mã đại lý': dealers[dealer[ro]],
+        'Mã phụ tùng': parts[part[ro]],
+        'Số lượng': np.maximum(qty[ro] // 2, 1)
+    })
+
+    frames = {
+        'Danh_muc_vat_tu': danh_muc,
+        'Don_dat_hang_ban': don_dat_hang,
+        'Phieu_xuat': phieu_xuat,
+        'Phieu_nhap': phieu_nhap,
+        'RO': ro_frame
+    }
+    return frames
+
+
+def write_workbook(frames, path):
+    """
+    Ghi các bảng thành file Excel (mỗi bảng một sheet) bằng chế độ write-only của openpyxl
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    for sheet_name, df in frames.items():
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append(list(df.columns))
+        for row in python_rows(df):
+            sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinh file Excel dữ liệu phụ tùng giả lập (5 sheet)")
+    parser.add_argument('file', help="File Excel cần ghi")
+    parser.add_argument('--parts', type=int, default=500, help="Số phụ tùng")
+    parser.add_argument('--dealers', type=int, default=60, help="Số đại lý")
+    parser.add_argument('--warehouses', type=int, default=3, help="Số kho")
+    parser.add_argument('--years', type=float, default=3, help="Số năm dữ liệu")
+    parser.add_argument('--profile', choices=list(PROFILES), default='hon_hop', help="Hồ sơ gián đoạn nhu cầu")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    frames = generate(args.parts, args.dealers, args.warehouses, args.years, args.profile, args.seed)
+    write_workbook(frames, args.file)
+    print(f"Đã ghi {args.file} trong {time.perf_counter() - start:.1f}s")
+    for sheet, df in frames.items():
+        print(f"  {sheet:<20}{len(df):>10,} dòng")
+
+
+if __name__ == '__main__':
+    main()
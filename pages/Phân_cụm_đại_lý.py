@@ -1,114 +1,89 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
 import plotly.express as px
-from utils.data_loader import load_inventory_data
+from utils.artifacts import current_artifacts
+from utils.charts import pie_chart
+from utils.clustering import DEALER_CLUSTERS, DEALER_FEATURES, cluster_dealers, k_sweep
+from utils.dataset import get_dataset
+from utils.diagnostics import begin_page, diagnostics_panel, stage, timed
+from utils.export import export_button
+from utils.features import dealer_features
 
 # Tiêu đề ứng dụng
 st.set_page_config(page_title="Phân Tích Đại Lý", layout="wide")
+# Ghi thời gian/bộ nhớ từng giai đoạn của lần chạy này (xem bảng chẩn đoán cuối trang)
+begin_page("Phân cụm đại lý")
 st.title("Phân Tích & Phân Nhóm Đại Lý")
 st.markdown("""
 **Phân cụm đại lý dựa trên 5 đặc trưng quan trọng:**  
 1. Độ đa dạng SKU  
 2. Cường độ nhập hàng  
 3. Hệ số biến động  
-4. Chỉ số tập trung  
-5. Độ trễ thanh toán  
+4. Chỉ số tập trung (Herfindahl theo cơ cấu phụ tùng)  
+5. Độ trễ từ đặt hàng đến xuất hàng  
 """)
 
 ## 1. Load và chuẩn bị dữ liệu
-@st.cache_data
 def load_data():
+    # Đặc trưng/phân cụm tính trước bằng `python -m utils.artifacts` nếu có: khi đó không cần
+    # tải bộ dữ liệu; không thì tổng hợp đại lý từ phiếu xuất và đơn đặt hàng (cập nhật tăng dần)
     try:
-        _, ddh, px, ro, _ = load_inventory_data("data/du_lieu_phu_tung_thuc_te.xlsx")
-        
-        # Kết hợp dữ liệu từ phiếu xuất và đơn đặt hàng
-        px = px.rename(columns={
-            'Mã đại lý': 'ma_dl',
-            'Mã phụ tùng': 'ma_pt',
-            'Số lượng xuất': 'sl_xuat',
-            'Ngày xuất hàng': 'ngay_xuat'
-        })
-        
-        ddh = ddh.rename(columns={
-            'Mã đại lý': 'ma_dl',
-            'Mã phụ tùng': 'ma_pt',
-            'Số lượng': 'sl_dat',
-            'Ngày đặt hàng': 'ngay_dat'
-        })
-        
-        return pd.concat([px[['ma_dl', 'ma_pt', 'sl_xuat', 'ngay_xuat']], 
-                         ddh[['ma_dl', 'ma_pt', 'sl_dat', 'ngay_dat']]])
-    
+        artifacts = current_artifacts()
+        if artifacts is not None and 'dac_trung_dai_ly' in artifacts:
+            return artifacts['data_version'], None, artifacts
+        dataset = get_dataset()
     except Exception as e:
         st.error(f"Lỗi khi tải dữ liệu: {str(e)}")
-        return pd.DataFrame()
+        return None, None, None
+
+    return dataset.version, dataset.aggregates, None
 
-dl_data = load_data()
+data_version, aggregates, artifacts = load_data()
 
-if dl_data.empty:
+if artifacts is None and (aggregates is None or aggregates.dai_ly is None):
     st.stop()
 
 ## 2. Tính toán các đặc trưng
-def calculate_agency_features(data):
-    # Chuyển đổi ngày
-    data['ngay_xuat'] = pd.to_datetime(data['ngay_xuat'])
-    data['ngay_dat'] = pd.to_datetime(data['ngay_dat'])
-    
-    # Tính toán cho từng đại lý
-    features = data.groupby('ma_dl').agg({
-        'ma_pt': ['nunique', 'count'],  # Đếm số SKU khác nhau và tổng lần nhập
-        'sl_xuat': ['sum', 'mean', 'std'],  # Tổng, TB và độ lệch số lượng xuất
-        'ngay_xuat': ['min', 'max']  # Ngày đầu và cuối
-    }).reset_index()
-    
-    # Làm phẳng multi-index columns
-    features.columns = ['ma_dl', 'sku_da_dang', 'tong_lan_nhap', 
-                      'tong_xuat', 'tb_xuat', 'do_lech_xuat',
-                      'ngay_dau', 'ngay_cuoi']
-    
-    # Tính các đặc trưng
-    features['thoi_gian_hoat_dong'] = (features['ngay_cuoi'] - features['ngay_dau']).dt.days
-    features['cuong_do_nhap'] = features['tong_xuat'] / (features['thoi_gian_hoat_dong']/30)  # SP/tháng
-    features['he_so_bien_dong'] = features['do_lech_xuat'] / features['tb_xuat']
-    features['chi_so_tap_trung'] = 1  # Tạm thời, sẽ tính sau
-    
-    # Xử lý giá trị vô cùng và NaN
-    features.replace([np.inf, -np.inf], np.nan, inplace=True)
-    features.fillna(0, inplace=True)
-    
-    return features
+@timed()
+def calculate_agency_features(aggregates):
+    # Số SKU và chỉ số tập trung (Herfindahl) trên ma trận thưa đại lý × phụ tùng,
+    # cường độ nhập, hệ số biến động và độ trễ đặt hàng -> xuất hàng từ thống kê đại lý
+    if artifacts is not None:
+        return artifacts['dac_trung_dai_ly'][['ma_dl'] + DEALER_FEATURES]
+    return dealer_features(aggregates.dealer_stats(), aggregates.dai_ly_pt)
 
 with st.spinner('Đang tính toán đặc trưng đại lý...'):
-    agency_features = calculate_agency_features(dl_data)
+    agency_features = calculate_agency_features(aggregates)
 
 ## 3. Phân cụm đại lý
-def cluster_agencies(features_df):
-    # Chuẩn hóa dữ liệu
-    scaler = StandardScaler()
-    X = features_df[['sku_da_dang', 'cuong_do_nhap', 'he_so_bien_dong', 'chi_so_tap_trung']]
-    X_scaled = scaler.fit_transform(X)
-    
-    # Phân cụm K-means
-    kmeans = KMeans(n_clusters=6, random_state=42)
-    features_df['cluster'] = kmeans.fit_predict(X_scaled)
-    
-    # Gán nhãn cho các cụm
-    features_df['nhom'] = features_df['cluster'].map({
-        0: 'Nhóm 1: Đại lý toàn diện',
-        1: 'Nhóm 2: Đại lý chuyên biệt ổn định',
-        2: 'Nhóm 3: Đại lý mùa vụ',
-        3: 'Nhóm 4: Đại lý nhỏ rủi ro cao',
-        4: 'Nhóm 5: Đại lý chiến lược',
-        5: 'Nhóm 6: Đại lý mới/đặc biệt'
-    })
-    
-    return features_df
+@timed()
+def cluster_agencies(features_df, n_clusters=DEALER_CLUSTERS):
+    # MiniBatch K-means dùng chung theo phiên bản dữ liệu (chỉ cập nhật khi có dữ liệu mới),
+    # tên cụm đặt theo tâm cụm (DEALER_PROFILES); kết quả lưu cache theo nội dung ma trận đặc trưng.
+    # Nếu đã có kết quả tính trước cho phiên bản dữ liệu này thì dùng luôn
+    if artifacts is not None and n_clusters == artifacts['params']['dealer_clusters']:
+        return artifacts['dac_trung_dai_ly']
+    return cluster_dealers(features_df, data_version, n_clusters)
+
+so_cum = DEALER_CLUSTERS
+if st.checkbox("Tự động chọn số cụm (k)"):
+    with st.spinner('Đang thử các số cụm k...'), stage('k_sweep'):
+        sweep, so_cum = k_sweep(agency_features, DEALER_FEATURES, default_k=DEALER_CLUSTERS)
+
+    if sweep.empty:
+        st.warning(f"Không đủ dữ liệu để thử các số cụm (cần ít nhất 3 dòng), dùng k = {so_cum}")
+    else:
+        # Đường khuỷu tay (inertia) và silhouette theo k
+        col1, col2 = st.columns(2)
+        with col1:
+            st.plotly_chart(px.line(sweep, x='k', y='inertia', markers=True, title='Inertia theo số cụm'),
+                            use_container_width=True)
+        with col2:
+            st.plotly_chart(px.line(sweep, x='k', y='silhouette', markers=True, title='Silhouette (mẫu) theo số cụm'),
+                            use_container_width=True)
+        st.info(f"Chọn k = {so_cum} (silhouette cao nhất)")
 
 with st.spinner('Đang phân nhóm đại lý...'):
-    clustered_agencies = cluster_agencies(agency_features)
+    clustered_agencies = cluster_agencies(agency_features, so_cum)
 
 ## 4. Hiển thị kết quả
 st.write("## Kết quả phân nhóm đại lý")
@@ -121,9 +96,9 @@ with tab1:
     
     with col1:
         # Biểu đồ Pie
-        fig_pie = px.pie(
-            clustered_agencies,
-            names='nhom',
+        # Đếm sẵn mỗi nhóm một dòng thay vì gửi từng đại lý xuống trình duyệt
+        fig_pie = pie_chart(
+            clustered_agencies['nhom'],
             title='Phân bổ các nhóm đại lý',
             hole=0.3,
             color_discrete_sequence=px.colors.qualitative.Pastel
@@ -153,7 +128,8 @@ with tab2:
         'sku_da_dang': 'mean',
         'cuong_do_nhap': 'mean',
         'he_so_bien_dong': 'mean',
-        'chi_so_tap_trung': 'mean'
+        'chi_so_tap_trung': 'mean',
+        'do_tre': 'mean'
     }).reset_index()
     
     # Hiển thị bảng
@@ -162,7 +138,8 @@ with tab2:
             'sku_da_dang': '{:.1f}',
             'cuong_do_nhap': '{:.1f}',
             'he_so_bien_dong': '{:.2f}',
-            'chi_so_tap_trung': '{:.2f}'
+            'chi_so_tap_trung': '{:.2f}',
+            'do_tre': '{:.1f}'
         }).background_gradient(cmap='Blues'),
         use_container_width=True
     )
@@ -226,7 +203,8 @@ with tab3:
     }
     
     st.write(f"**Chiến lược cho {selected_group}:**")
-    for strategy in strategies[selected_group]:
+    # Cụm không có chiến lược soạn sẵn (khi tự chọn k > 6)
+    for strategy in strategies.get(selected_group, ["Đánh giá thủ công trước khi áp dụng chính sách riêng"]):
         st.write(f"- {strategy}")
     
     # Hiển thị danh sách đại lý thuộc nhóm
@@ -239,7 +217,7 @@ with tab3:
     )
 
 # Xuất dữ liệu
-if st.button("Xuất kết quả phân tích"):
-    with pd.ExcelWriter('phan_nhom_dai_ly.xlsx') as writer:
-        clustered_agencies.to_excel(writer, index=False)
-    st.success("Đã xuất file thành công!")
\ No newline at end of file
+# (ghi ở luồng nền vào bộ nhớ của phiên, tải về qua nút tải xuống)
+export_button(clustered_agencies, 'phan_nhom_dai_ly', key='xuat_dai_ly', label="Xuất kết quả phân tích")
+
+diagnostics_panel()
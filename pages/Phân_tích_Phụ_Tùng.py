@@ -1,94 +1,63 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from utils.data_loader import load_inventory_data
+from utils.artifacts import current_artifacts
+from utils.charts import category_counts, pie_chart, scatter_chart
+from utils.clustering import PART_CLUSTER_FEATURES, PART_CLUSTERS, k_sweep
+from utils.clustering import cluster_parts as cluster_part_features
+from utils.dataset import get_dataset
+from utils.diagnostics import begin_page, diagnostics_panel, stage, timed
+from utils.export import export_button
+from utils.features import ADI_CUTOFF, CV2_CUTOFF, DEMAND_CLASSES, PART_FEATURES, demand_classes, part_features
+from utils.tables import paged_table
 
 # Tiêu đề ứng dụng
 st.set_page_config(page_title="Phân Tích Nhu Cầu Phụ Tùng", layout="wide")
+# Ghi thời gian/bộ nhớ từng giai đoạn của lần chạy này (xem bảng chẩn đoán cuối trang)
+begin_page("Phân tích phụ tùng")
 st.title("Phân Tích & Phân Nhóm Phụ Tùng Theo Nhu Cầu")
 st.markdown("""
 **Tính toán các đặc trưng từ dữ liệu gốc và phân nhóm phụ tùng theo nhu cầu thực tế**
 """)
 
 ## 1. Load và chuẩn bị dữ liệu
-@st.cache_data
 def load_and_prepare_data():
+    # Đặc trưng/phân cụm tính trước bằng `python -m utils.artifacts` nếu có: khi đó không cần
+    # tải bộ dữ liệu (Excel/snapshot), phiếu xuất chỉ dùng để tính lại khi chưa có bản tính trước
     try:
-        # Load dữ liệu từ các sheet
-        dmvt, ddh, phieu_xuat, ro, pn = load_inventory_data("data/du_lieu_phu_tung_thuc_te.xlsx")
-        
-        # Chuẩn hóa tên cột
-        phieu_xuat = phieu_xuat.rename(columns={
-            'Ngày xuất hàng': 'ngay_xuat',
-            'Mã phụ tùng': 'ma_pt',
-            'Số lượng xuất': 'sl_xuat'
-        })
-        
-        dmvt = dmvt.rename(columns={
-            'Mã phụ tùng': 'ma_pt', 
-            'Tên phụ tùng': 'ten_pt'
-        })
-        
-        return dmvt, phieu_xuat
+        artifacts = current_artifacts()
+        if artifacts is not None:
+            return artifacts['danh_muc'], None, artifacts
+        dataset = get_dataset()
     except Exception as e:
         st.error(f"Lỗi khi tải dữ liệu: {str(e)}")
-        return None, None
+        return None, None, None
 
-dmvt, phieu_xuat = load_and_prepare_data()
+    return dataset.danh_muc, dataset.phieu_xuat, None
 
-if dmvt is None or phieu_xuat is None:
+dmvt, phieu_xuat, artifacts = load_and_prepare_data()
+
+if dmvt is None or (phieu_xuat is None and artifacts is None):
     st.stop()
 
 ## 2. Tính toán các đặc trưng quan trọng
+@timed()
 def calculate_features(phieu_xuat):
-    # Chuyển đổi ngày
-    phieu_xuat['ngay_xuat'] = pd.to_datetime(phieu_xuat['ngay_xuat'])
-    phieu_xuat['thang'] = phieu_xuat['ngay_xuat'].dt.to_period('M')
-    
-    # Tính các đặc trưng cơ bản
-    features = phieu_xuat.groupby('ma_pt').agg({
-        'sl_xuat': ['sum', 'mean', 'std'],
-        'ngay_xuat': ['count', lambda x: (x.max() - x.min()).days]
-    }).reset_index()
-    
-    # Đặt tên cột
-    features.columns = ['ma_pt', 'tong_xuat', 'trung_binh_xuat', 
-                      'do_lech_chuan', 'so_lan_xuat', 'so_ngay_hoat_dong']
-    
-    # Xử lý các trường hợp đặc biệt
-    features['so_ngay_hoat_dong'] = features['so_ngay_hoat_dong'].replace(0, 1)
-    
-    # Tính các đặc trưng phức tạp
-    features['tan_suat'] = features['so_lan_xuat'] / (features['so_ngay_hoat_dong']/30)  # Số lần xuất/tháng
-    features['khoang_cach_tb'] = features['so_ngay_hoat_dong'] / features['so_lan_xuat']  # Khoảng cách TB giữa các lần xuất (ngày)
-    
-    # Tính độ biến động (coefficient of variation)
-    features['do_bien_dong'] = features['do_lech_chuan'] / features['trung_binh_xuat']
-    
-    # Tính tỷ lệ tháng có phát sinh
-    monthly_sales = phieu_xuat.groupby(['ma_pt', 'thang'])['sl_xuat'].sum().reset_index()
-    total_months = phieu_xuat['thang'].nunique()
-    monthly_count = monthly_sales.groupby('ma_pt')['thang'].count().reset_index()
-    monthly_count.columns = ['ma_pt', 'so_thang_co_xuat']
-    features = pd.merge(features, monthly_count, on='ma_pt')
-    features['ti_le_thang_xuat'] = features['so_thang_co_xuat'] / total_months
-    
-    # Xử lý giá trị vô cùng và NaN
-    features.replace([np.inf, -np.inf], np.nan, inplace=True)
-    features.fillna(0, inplace=True)
-    
-    return features
+    # Tổng/TB/độ lệch, số lần xuất, số ngày hoạt động, tần suất, độ biến động, tỷ lệ tháng có xuất
+    if artifacts is not None:
+        return artifacts['dac_trung_phu_tung'][PART_FEATURES]
+    return part_features(phieu_xuat)
 
 with st.spinner('Đang tính toán các đặc trưng từ dữ liệu...'):
     features = calculate_features(phieu_xuat)
 
 # Hiển thị các đặc trưng đã tính
 st.write("### Các đặc trưng đã tính toán")
-st.dataframe(
-    features.style.format({
+# Lọc/sắp xếp/phân trang phía server, chỉ định dạng các dòng của trang đang xem
+paged_table(
+    features,
+    key='dac_trung',
+    format={
         'tong_xuat': '{:,.0f}',
         'trung_binh_xuat': '{:.1f}',
         'do_lech_chuan': '{:.1f}',
@@ -96,33 +65,65 @@ st.dataframe(
         'khoang_cach_tb': '{:.1f}',
         'do_bien_dong': '{:.2f}',
         'ti_le_thang_xuat': '{:.2%}'
-    }),
-    use_container_width=True
+    },
+    sort_column='tong_xuat',
+    ascending=False,
+    search_columns=['ma_pt'],
+    hide_index=False
 )
 
 ## 3. Phân cụm phụ tùng
-def cluster_parts(features_df):
-    # Chuẩn hóa dữ liệu
-    scaler = StandardScaler()
-    X = features_df[['trung_binh_xuat', 'do_bien_dong', 'tan_suat', 'ti_le_thang_xuat']]
-    X_scaled = scaler.fit_transform(X)
-    
-    # Phân cụm K-means
-    kmeans = KMeans(n_clusters=4, random_state=42)
-    features_df['cluster'] = kmeans.fit_predict(X_scaled)
-    
-    # Gán nhãn cho các cụm
-    features_df['nhom'] = features_df['cluster'].map({
-        0: 'Nhóm A - Nhu cầu cao',
-        1: 'Nhóm B - Mùa vụ',
-        2: 'Nhóm C - Cố định',
-        3: 'Nhóm D - Nhu cầu thấp'
-    })
-    
+X_COLUMNS = PART_CLUSTER_FEATURES
+TEN_NHOM = ['Nhóm A - Nhu cầu cao', 'Nhóm B - Mùa vụ', 'Nhóm C - Cố định', 'Nhóm D - Nhu cầu thấp']
+
+@timed()
+def cluster_parts(features_df, n_clusters=PART_CLUSTERS):
+    # Chuẩn hóa + K-means, tên cụm đặt theo tâm cụm (PART_PROFILES); kết quả lưu cache theo
+    # nội dung ma trận đặc trưng. Nếu đã có kết quả tính trước cho phiên bản dữ liệu này thì dùng luôn
+    if artifacts is not None and n_clusters == artifacts['params']['part_clusters']:
+        return artifacts['dac_trung_phu_tung']
+    return cluster_part_features(features_df, n_clusters)
+
+@timed()
+def classify_parts(features_df, phieu_xuat):
+    # Phân loại Syntetos–Boylan theo ADI/CV² của nhu cầu hàng tháng
+    classes = artifacts['nhom_nhu_cau'] if artifacts is not None else demand_classes(phieu_xuat)
+    features_df = pd.merge(features_df, classes, on='ma_pt')
+    features_df['nhom'] = features_df['nhom_nhu_cau'].astype(str)
     return features_df
 
+phuong_phap = st.radio(
+    "Phương pháp phân nhóm",
+    options=['K-means theo đặc trưng', 'ADI/CV² (Syntetos–Boylan)'],
+    horizontal=True
+)
+
+so_cum = PART_CLUSTERS
+if phuong_phap == 'K-means theo đặc trưng' and st.checkbox("Tự động chọn số cụm (k)"):
+    with st.spinner('Đang thử các số cụm k...'), stage('k_sweep'):
+        sweep, so_cum = k_sweep(features, X_COLUMNS, default_k=PART_CLUSTERS)
+
+    if sweep.empty:
+        st.warning(f"Không đủ dữ liệu để thử các số cụm (cần ít nhất 3 dòng), dùng k = {so_cum}")
+    else:
+        # Đường khuỷu tay (inertia) và silhouette theo k
+        col1, col2 = st.columns(2)
+        with col1:
+            st.plotly_chart(px.line(sweep, x='k', y='inertia', markers=True, title='Inertia theo số cụm'),
+                            use_container_width=True)
+        with col2:
+            st.plotly_chart(px.line(sweep, x='k', y='silhouette', markers=True, title='Silhouette (mẫu) theo số cụm'),
+                            use_container_width=True)
+        st.info(f"Chọn k = {so_cum} (silhouette cao nhất)")
+
 with st.spinner('Đang phân nhóm phụ tùng...'):
-    clustered_data = cluster_parts(features)
+    if phuong_phap == 'K-means theo đặc trưng':
+        clustered_data = cluster_parts(features, so_cum)
+        nhom_co_mat = set(clustered_data['nhom'])
+        nhom_order = [n for n in TEN_NHOM if n in nhom_co_mat] + sorted(nhom_co_mat - set(TEN_NHOM))
+    else:
+        clustered_data = classify_parts(features, phieu_xuat)
+        nhom_order = DEMAND_CLASSES
 
 # Kết hợp với thông tin danh mục
 final_data = pd.merge(clustered_data, dmvt, on='ma_pt', how='left')
@@ -136,9 +137,10 @@ col1, col2 = st.columns(2)
 with col1:
     # Biểu đồ Pie chart
     st.write("### Phân bổ tỷ lệ các nhóm")
-    fig_pie = px.pie(
-        final_data, 
-        names='nhom', 
+    # Đếm sẵn mỗi nhóm một dòng thay vì gửi từng phụ tùng xuống trình duyệt
+    fig_pie = pie_chart(
+        final_data['nhom'],
+        order=nhom_order,
         title='Tỷ lệ các nhóm phụ tùng',
         hole=0.3,
         color_discrete_sequence=px.colors.qualitative.Pastel
@@ -149,15 +151,8 @@ with col2:
     # Biểu đồ Bar chart
     st.write("### Số lượng phụ tùng từng nhóm")
     
-    # Đếm số lượng phụ tùng mỗi nhóm
-    count_data = final_data['nhom'].value_counts().reset_index()
-    count_data.columns = ['nhom', 'so_luong']
-    
-    # Sắp xếp theo thứ tự nhóm A, B, C, D
-    nhom_order = ['Nhóm A - Nhu cầu cao', 'Nhóm B - Mùa vụ', 
-                 'Nhóm C - Cố định', 'Nhóm D - Nhu cầu thấp']
-    count_data['nhom'] = pd.Categorical(count_data['nhom'], categories=nhom_order, ordered=True)
-    count_data = count_data.sort_values('nhom')
+    # Đếm số lượng phụ tùng mỗi nhóm, sắp xếp theo thứ tự nhóm
+    count_data = category_counts(final_data['nhom'], order=nhom_order)
     
     fig_bar = px.bar(
         count_data,
@@ -187,6 +182,26 @@ st.markdown("""
 - **Biểu đồ cột (bên phải)**: Thể hiện số lượng phụ tùng cụ thể trong mỗi nhóm
 """)
 
+if phuong_phap != 'K-means theo đặc trưng':
+    # Bản đồ ADI/CV² với hai ngưỡng phân loại
+    st.write("### Bản đồ ADI - CV² của phụ tùng")
+    # Vẽ bằng WebGL, tối đa SCATTER_BUDGET điểm (lấy mẫu theo nhóm khi có nhiều phụ tùng)
+    fig_sb = scatter_chart(
+        final_data,
+        x='adi',
+        y='cv2',
+        color='nhom',
+        category_orders={'nhom': nhom_order},
+        hover_data=['ma_pt', 'ten_pt'],
+        log_x=True,
+        title='Phân loại nhu cầu Syntetos–Boylan',
+        labels={'adi': 'ADI (khoảng cách TB giữa các kỳ có xuất)', 'cv2': 'CV² lượng xuất', 'nhom': 'Nhóm'},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    fig_sb.add_vline(x=ADI_CUTOFF, line_dash='dash')
+    fig_sb.add_hline(y=CV2_CUTOFF, line_dash='dash')
+    st.plotly_chart(fig_sb, use_container_width=True)
+
 # Đặc trưng từng nhóm
 st.write("### Đặc trưng trung bình từng nhóm")
 group_stats = final_data.groupby('nhom').agg({
@@ -250,17 +265,59 @@ strategies = {
     }
 }
 
-selected_group = st.selectbox("Chọn nhóm để xem chiến lược", options=list(strategies.keys()))
+if phuong_phap != 'K-means theo đặc trưng':
+    strategies = {
+        'Đều đặn (Smooth)': {
+            'Đặc điểm': 'Xuất gần như mọi kỳ, lượng xuất mỗi lần ổn định',
+            'Chiến lược': [
+                'Dự báo bằng trung bình trượt hoặc san bằng mũ',
+                'Tồn kho an toàn thấp',
+                'Bổ sung định kỳ theo điểm đặt hàng (ROP)'
+            ]
+        },
+        'Biến động (Erratic)': {
+            'Đặc điểm': 'Xuất thường xuyên nhưng lượng xuất mỗi lần dao động mạnh',
+            'Chiến lược': [
+                'Tồn kho an toàn cao hơn theo độ lệch chuẩn',
+                'Theo dõi các đơn hàng lớn bất thường',
+                'Rà soát dự báo thường xuyên'
+            ]
+        },
+        'Gián đoạn (Intermittent)': {
+            'Đặc điểm': 'Nhiều kỳ không xuất, lượng xuất mỗi lần tương đối ổn định',
+            'Chiến lược': [
+                'Dự báo bằng Croston/SBA',
+                'Giữ mức tồn kho nhỏ cố định',
+                'Đặt hàng khi có nhu cầu thực tế'
+            ]
+        },
+        'Thất thường (Lumpy)': {
+            'Đặc điểm': 'Nhiều kỳ không xuất và lượng xuất mỗi lần dao động mạnh',
+            'Chiến lược': [
+                'Đặt hàng theo đơn (make-to-order) khi có thể',
+                'Gom nhu cầu ở kho trung tâm',
+                'Đánh giá định kỳ để loại bỏ hàng tồn'
+            ]
+        }
+    }
+
+selected_group = st.selectbox("Chọn nhóm để xem chiến lược", options=nhom_order)
+
+# Cụm không có chiến lược soạn sẵn (khi tự chọn k > 4)
+chien_luoc = strategies.get(selected_group, {
+    'Đặc điểm': 'Nhóm do K-means tự tách thêm, xem đặc trưng trung bình ở biểu đồ trên',
+    'Chiến lược': ['Đánh giá thủ công trước khi áp dụng chính sách riêng']
+})
 
 st.write(f"### Chiến lược cho {selected_group}")
 col1, col2 = st.columns(2)
 
 with col1:
     st.write("**Đặc điểm:**")
-    st.write(strategies[selected_group]['Đặc điểm'])
+    st.write(chien_luoc['Đặc điểm'])
     
     st.write("**Chiến lược quản lý:**")
-    for strategy in strategies[selected_group]['Chiến lược']:
+    for strategy in chien_luoc['Chiến lược']:
         st.write(f"- {strategy}")
 
 with col2:
@@ -277,7 +334,7 @@ with col2:
 
 # Xuất dữ liệu phân nhóm
 st.write("## Xuất dữ liệu phân nhóm")
-if st.button("Xuất file Excel"):
-    with pd.ExcelWriter('phan_nhom_phu_tung.xlsx') as writer:
-        final_data.to_excel(writer, index=False)
-    st.success("Đã xuất file thành công!")
\ No newline at end of file
+# (ghi ở luồng nền vào bộ nhớ của phiên, tải về qua nút tải xuống)
+export_button(final_data, 'phan_nhom_phu_tung', key='xuat_phu_tung', label="Xuất file")
+
+diagnostics_panel()
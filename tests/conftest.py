@@ -0,0 +1,15 @@
+# tests/conftest.py
+import pytest
+
+from benchmarks.synthetic import generate, write_workbook
+
+
+@pytest.fixture
+def synthetic_workbook(tmp_path):
+    """
+    File Excel giả lập nhỏ (5 sheet) và các bảng đã ghi vào đó
+    """
+    frames = generate(n_parts=20, n_dealers=6, n_warehouses=3, years=1, seed=7)
+    path = str(tmp_path / 'du_lieu.xlsx')
+    write_workbook(frames, path)
+    return path, frames
@@ -0,0 +1,99 @@
+# tests/test_aggregates.py
+import pandas as pd
+import pandas.testing as pdt
+
+from benchmarks.synthetic import generate, write_workbook
+from utils.aggregates import InventoryAggregates
+from utils.data_loader import snapshot_manifest
+from utils.dataset import InventoryDataset
+from utils.features import dealer_features
+from utils.time_cube import FLOWS, LEVELS
+
+DATES = ['2021-12-31', '2022-01-01', '2022-03-15', '2022-08-09', '2022-12-31', '2024-01-01']
+
+
+def _canonical(df, keys):
+    """
+    Bảng so sánh được: cột category đổi về chuỗi, sắp theo khóa, bỏ index
+    """
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(str)
+    return df.sort_values(keys).reset_index(drop=True)
+
+
+def _assert_same(actual, expected, keys):
+    pdt.assert_frame_equal(_canonical(actual, keys), _canonical(expected, keys), check_dtype=False)
+
+
+def _appended_workbook(frames):
+    """
+    Thêm vào cuối các sheet chứng từ một kho, phụ tùng, đại lý và đơn hàng mới,
+    kèm dòng đặt hàng cho phiếu xuất `DH_CHO` đã có từ trước
+    """
+    frames = dict(frames)
+    frames['Danh_muc_vat_tu'] = pd.concat([frames['Danh_muc_vat_tu'], pd.DataFrame([{
+        'Mã phụ tùng': 'PT_MOI', 'Tên phụ tùng': 'Tên PT_MOI', 'Group No': 1,
+        'Part Name Code': 'PT_MOI', 'Các model áp dụng': 'A'
+    }])], ignore_index=True)
+    frames['Don_dat_hang_ban'] = pd.concat([frames['Don_dat_hang_ban'], pd.DataFrame([
+        {'Ngày đặt hàng': pd.Timestamp('2022-12-20'), 'Mã đại lý': 'DL_MOI', 'Mã đơn hàng': 'DH_MOI',
+         'Mã phụ tùng': 'PT_MOI', 'Số lượng': 5, 'Hình thức đơn hàng': 'Gấp'},
+        {'Ngày đặt hàng': pd.Timestamp('2022-06-01'), 'Mã đại lý': 'DL000', 'Mã đơn hàng': 'DH_CHO',
+         'Mã phụ tùng': 'PT00001', 'Số lượng': 2, 'Hình thức đơn hàng': 'Thường'}
+    ])], ignore_index=True)
+    frames['Phieu_xuat'] = pd.concat([frames['Phieu_xuat'], pd.DataFrame([{
+        'Ngày xuất hàng': pd.Timestamp('2022-12-28'), 'Mã đại lý': 'DL_MOI', 'Mã đơn hàng': 'DH_MOI',
+        'Số phiếu xuất': 'PX_MOI', 'Mã phụ tùng': 'PT_MOI', 'Số lượng xuất': 5, 'Kho xuất': 'KHO_MOI'
+    }])], ignore_index=True)
+    frames['Phieu_nhap'] = pd.concat([frames['Phieu_nhap'], pd.DataFrame([{
+        'Ngày nhập kho': pd.Timestamp('2022-12-22'), 'Mã phụ tùng': 'PT_MOI', 'Số lượng nhập': 8,
+        'Kho nhập': 'KHO_MOI'
+    }])], ignore_index=True)
+    return frames
+
+
+def test_incremental_aggregates_match_full_rebuild(tmp_path):
+    full = generate(n_parts=20, n_dealers=6, n_warehouses=3, years=1, seed=7)
+    # Bản đầu: 70% dòng đầu mỗi sheet chứng từ, thêm một phiếu xuất mà đơn hàng chỉ có ở bản sau
+    base = {sheet: df if sheet == 'Danh_muc_vat_tu' else df.iloc[:int(len(df) * 0.7)]
+            for sheet, df in full.items()}
+    base['Phieu_xuat'] = pd.concat([base['Phieu_xuat'], pd.DataFrame([{
+        'Ngày xuất hàng': pd.Timestamp('2022-06-10'), 'Mã đại lý': 'DL000', 'Mã đơn hàng': 'DH_CHO',
+        'Số phiếu xuất': 'PX_CHO', 'Mã phụ tùng': 'PT00001', 'Số lượng xuất': 2, 'Kho xuất': 'KHO_HN'
+    }])], ignore_index=True)
+    appended = {sheet: df if sheet == 'Danh_muc_vat_tu' else pd.concat(
+        [base[sheet], df.iloc[int(len(df) * 0.7):]], ignore_index=True) for sheet, df in full.items()}
+
+    path = str(tmp_path / 'du_lieu.xlsx')
+    write_workbook(base, path)
+    first = InventoryDataset(path)
+    write_workbook(_appended_workbook(appended), path)
+    second = InventoryDataset(path, previous=first)
+    assert snapshot_manifest(path)['parent'] == first.version
+
+    incremental = second.aggregates
+    rebuilt = InventoryAggregates({name: second.table(name) for name in (
+        'danh_muc', 'don_dat_hang', 'phieu_xuat', 'phieu_nhap', 'ro')})
+
+    _assert_same(incremental.ledger.stock_frame(), rebuilt.ledger.stock_frame(), ['Kho', 'ma_pt'])
+    _assert_same(incremental.ledger.warehouse_totals(), rebuilt.ledger.warehouse_totals(), ['Kho'])
+    assert 'KHO_MOI' in set(rebuilt.ledger.warehouses)
+
+    for flow, (kho, _, _) in FLOWS.items():
+        for level in LEVELS:
+            _assert_same(incremental.cube.series(flow, level), rebuilt.cube.series(flow, level),
+                         ['Thoi_gian', kho])
+
+    assert incremental.history.date_range() == rebuilt.history.date_range()
+    for date in DATES:
+        _assert_same(incremental.history.on_hand_at(date), rebuilt.history.on_hand_at(date), ['Kho', 'ma_pt'])
+        assert incremental.history.on_hand_at(date, 'KHO_MOI', 'PT_MOI') == \
+            rebuilt.history.on_hand_at(date, 'KHO_MOI', 'PT_MOI')
+
+    actual = dealer_features(incremental.dealer_stats(), incremental.dai_ly_pt)
+    expected = dealer_features(rebuilt.dealer_stats(), rebuilt.dai_ly_pt)
+    _assert_same(actual, expected, ['ma_dl'])
+    assert 'DL_MOI' in set(expected['ma_dl'].astype(str))
+    assert incremental.cho_don['ma_dh'].astype(str).eq('DH_CHO').sum() == 0
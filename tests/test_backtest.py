@@ -0,0 +1,73 @@
+# tests/test_backtest.py
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import norm
+
+from utils.backtest import _simulate_block, backtest, summarize
+
+MONTHS = pd.date_range('2023-01-01', periods=10, freq='MS') + pd.Timedelta(days=9)
+
+
+def test_simulate_block_by_hand():
+    # Nhu cầu 5 mỗi kỳ, dự báo 5, sai số 0: s = 5 × 2 = 10, S = s + 5 = 15, hàng về sau 1 kỳ.
+    # Kỳ 6: hết hàng, đặt 15; kỳ 7-9: nhận hàng, bán 5, còn 10 <= s nên đặt thêm 5.
+    Y = np.full((1, 10), 5.0)
+    block = (Y, np.zeros_like(Y), np.zeros(1), np.array([norm.ppf(0.95)]), np.ones(1))
+    nhu_cau, dap_ung, het_hang, ton, so_lan_dat, ton_thuc_te = _simulate_block(
+        block, start=6, step=3, lead=1, protection=2, season=12, window=3, alpha=0.1)
+
+    assert nhu_cau[0] == 20
+    assert dap_ung[0] == 15
+    assert het_hang[0] == 1
+    assert so_lan_dat[0] == 4
+    assert ton[0] == pytest.approx((0 + 10 + 10 + 10) / 4)
+    assert ton_thuc_te[0] == 0
+
+
+def test_backtest_by_hand():
+    # Hai phụ tùng cùng kho, xuất 5 mỗi tháng trong 10 tháng; phát lại 4 tháng cuối, hàng về ngay
+    # (thời gian bổ sung 0): s = 5, S = 10. PT1 có tồn đầu 40 + 3 (phiếu trước kỳ đầu) - 30 = 13
+    # và một phiếu nhập 7 ở tháng thứ 9; PT2 không có phiếu nhập nào.
+    phieu_xuat = pd.DataFrame({
+        'ngay_xuat': np.tile(MONTHS, 2),
+        'ma_pt': ['PT1'] * 10 + ['PT2'] * 10,
+        'kho_xuat': 'KHO_HN',
+        'sl_xuat': 5
+    })
+    phieu_nhap = pd.DataFrame({
+        'ngay_nhap': pd.to_datetime(['2022-12-20', '2023-01-05', '2023-09-01', '2023-09-01']),
+        'ma_pt': ['PT1', 'PT1', 'PT1', 'PT9'],
+        'kho_nhap': 'KHO_HN',
+        'sl_nhap': [3, 40, 7, 100]
+    })
+    groups = pd.Series({'PT1': 'Nhóm 1', 'PT2': 'Nhóm 2'})
+    policy = {'lead_time_days': 0, 'cover_periods': 1}
+    result = backtest(phieu_nhap, phieu_xuat, policy, groups=groups, workers=1).set_index('ma_pt')
+
+    # PT1: tồn 13 -> 8 -> 3 (đặt 7) -> 5 (đặt 5) -> 5 (đặt 5); tồn cuối kỳ 8, 10, 10, 10
+    pt1 = result.loc['PT1']
+    assert pt1['nhu_cau'] == 20 and pt1['da_dap_ung'] == 20
+    assert pt1['so_ky_het_hang'] == 0
+    assert pt1['so_lan_dat'] == 3
+    assert pt1['ton_TB'] == pytest.approx(9.5)
+    # Tồn thực tế: 13 - 5 = 8, 3, 3 + 7 - 5 = 5, 0
+    assert pt1['ton_thuc_te_TB'] == pytest.approx(4)
+
+    # PT2: hết hàng ở kỳ đầu, sau đó mỗi kỳ đặt lại lên 10
+    pt2 = result.loc['PT2']
+    assert pt2['da_dap_ung'] == 15
+    assert pt2['so_ky_het_hang'] == 1
+    assert pt2['ti_le_ky_het_hang'] == pytest.approx(0.25)
+    assert pt2['so_lan_dat'] == 4
+    assert pt2['ton_TB'] == pytest.approx(10)
+
+    summary = summarize(result.reset_index()).set_index('nhom')
+    assert summary.loc['Tổng', 'Ti_le_dap_ung'] == pytest.approx(35 / 40)
+
+
+def test_backtest_needs_enough_history():
+    phieu_xuat = pd.DataFrame({'ngay_xuat': MONTHS[:4], 'ma_pt': 'PT1', 'kho_xuat': 'KHO_HN', 'sl_xuat': 5})
+    phieu_nhap = pd.DataFrame({'ngay_nhap': [], 'ma_pt': [], 'kho_nhap': [], 'sl_nhap': []})
+    with pytest.raises(ValueError):
+        backtest(phieu_nhap, phieu_xuat, groups=pd.Series({'PT1': 'A'}), workers=1)
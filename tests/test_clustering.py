@@ -0,0 +1,60 @@
+# tests/test_clustering.py
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from utils.clustering import _raw_centers, k_sweep, kmeans_result, label_clusters
+
+COLUMNS = ['x', 'y']
+
+
+def test_k_sweep_too_few_rows_returns_default_k():
+    features = pd.DataFrame({'x': [1.0, 2.0], 'y': [3.0, 4.0]})
+    sweep, best = k_sweep(features, COLUMNS, n_jobs=1, default_k=4)
+    assert sweep.empty
+    assert best == 4
+
+
+def test_k_sweep_all_nan_silhouette_falls_back_to_default_k():
+    # Mọi dòng trùng nhau: K-means chỉ ra một cụm nên silhouette của mọi k đều NaN
+    features = pd.DataFrame({'x': np.ones(6), 'y': np.full(6, 2.0)})
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        sweep, best = k_sweep(features, COLUMNS, k_values=[2, 3], n_jobs=1, default_k=6)
+        _, fallback = k_sweep(features, COLUMNS, k_values=[2, 3], n_jobs=1)
+    assert list(sweep['k']) == [2, 3]
+    assert sweep['silhouette'].isna().all()
+    assert best == 6
+    assert fallback == 2
+
+
+def test_k_sweep_picks_largest_silhouette():
+    rng = np.random.default_rng(0)
+    centers = np.array([[0, 0], [10, 0], [0, 10]])
+    X = np.concatenate([c + rng.normal(scale=0.3, size=(30, 2)) for c in centers])
+    sweep, best = k_sweep(pd.DataFrame(X, columns=COLUMNS), COLUMNS, k_values=[2, 3, 4], n_jobs=1, default_k=2)
+    assert best == 3
+    assert best == sweep.loc[sweep['silhouette'].idxmax(), 'k']
+
+
+def test_label_clusters_keeps_names_when_centroids_are_permuted():
+    rng = np.random.default_rng(1)
+    centers = np.array([[0, 0], [8, 0], [0, 8]])
+    X = np.concatenate([c + rng.normal(scale=0.5, size=(40, 2)) for c in centers])
+    profiles = [('Phải', {'x': 1}), ('Trên', {'y': 1}), ('Gốc', {})]
+
+    first = kmeans_result(X, 3)
+    first = dict(first, names=label_clusters(first, COLUMNS, profiles))
+
+    # Lần sau: dữ liệu dịch nhẹ, thứ tự tâm cụm bị đảo và bộ chuẩn hóa khác
+    order = np.array([2, 0, 1])
+    second = kmeans_result(X + rng.normal(scale=0.05, size=X.shape), 3)
+    second = dict(second, centers=second['centers'][order], labels=np.argsort(order)[second['labels']])
+    names = label_clusters(second, COLUMNS, [('Khác', {'x': -1})], previous=first)
+
+    for center, name in zip(_raw_centers(second), names):
+        nearest = np.argmin(((_raw_centers(first) - center) ** 2).sum(axis=1))
+        assert name == first['names'][nearest]
+    assert sorted(names) == sorted(first['names'])
+    assert names[second['labels'][0]] == first['names'][first['labels'][0]]
@@ -0,0 +1,85 @@
+# tests/test_data_loader.py
+import datetime
+
+import openpyxl
+import pandas as pd
+
+from utils.data_loader import CATEGORY_GROUPS, QUANTITY_COLUMNS, SHEETS, load_inventory_data, memory_report
+
+
+def _write_workbook(path, phieu_xuat):
+    """
+    File Excel 5 sheet tối thiểu; sheet Phieu_xuat lấy các dòng `phieu_xuat`, các sheet khác một dòng
+    """
+    ngay = datetime.datetime(2024, 1, 1)
+    rows = {
+        'Danh_muc_vat_tu': [('PT1', 'Phụ tùng 1', 1, 'PT1', 'A')],
+        'Don_dat_hang_ban': [(ngay, 'DL1', 'DH1', 'PT1', 5, 'Thường')],
+        'Phieu_xuat': phieu_xuat,
+        'Phieu_nhap': [(ngay, 'PT1', 50, 'KHO_HN')],
+        'RO': [(ngay, 'DL1', 'PT1', 1)]
+    }
+    workbook = openpyxl.Workbook(write_only=True)
+    for sheet, (columns, _) in SHEETS.items():
+        ws = workbook.create_sheet(sheet)
+        ws.append(columns)
+        for row in rows[sheet]:
+            ws.append(row)
+    workbook.save(path)
+
+
+def test_mixed_types_across_chunk_boundary(tmp_path):
+    # Khối đầu toàn số (số phiếu, mã đơn), khối sau là chữ: không được suy ra kiểu theo từng khối
+    ngay = datetime.datetime(2024, 1, 2)
+    so_phieu = [752, 753, 754, 755, 'PX752', 'PX753', 'PX754', 'PX755']
+    phieu_xuat = [(ngay, 'DL1', 100 + i if i < 4 else f'DH{i}', p, 'PT1', 1, 'KHO_HN')
+                  for i, p in enumerate(so_phieu)]
+    path = str(tmp_path / 'du_lieu.xlsx')
+    _write_workbook(path, phieu_xuat)
+
+    chunked = load_inventory_data(path, snapshot_dir=str(tmp_path / 'snap'), chunk_rows=4, workers=1)[2]
+    whole = load_inventory_data(path, use_snapshot=False, chunk_rows=100, workers=1)[2]
+
+    assert pd.api.types.is_string_dtype(chunked['Số phiếu xuất'])
+    assert pd.api.types.is_string_dtype(chunked['Mã đơn hàng'])
+    assert list(chunked['Số phiếu xuất']) == [str(p) for p in so_phieu]
+    pd.testing.assert_frame_equal(chunked, whole)
+
+    # Đọc lại từ snapshot vừa ghi cho cùng kết quả
+    again = load_inventory_data(path, snapshot_dir=str(tmp_path / 'snap'), chunk_rows=4, workers=1)[2]
+    pd.testing.assert_frame_equal(again, whole)
+
+
+def test_schema_dtypes_and_values_match_read_excel(synthetic_workbook):
+    # Bảng đọc bằng schema gọn phải giữ nguyên giá trị so với pd.read_excel
+    path, _ = synthetic_workbook
+    frames = dict(zip(SHEETS, load_inventory_data(path, use_snapshot=False, workers=1)))
+
+    for sheet, (usecols, date_col) in SHEETS.items():
+        df, baseline = frames[sheet], pd.read_excel(path, sheet_name=sheet, usecols=usecols)[usecols]
+        assert list(df.columns) == usecols
+        assert len(df) == len(baseline)
+        for col in usecols:
+            if col == date_col:
+                assert pd.api.types.is_datetime64_any_dtype(df[col])
+                assert (df[col].to_numpy() == baseline[col].to_numpy()).all()
+            elif col in QUANTITY_COLUMNS:
+                # Số lượng nguyên được ép về kiểu số nguyên nhỏ nhất
+                assert df[col].dtype == pd.to_numeric(baseline[col], downcast='integer').dtype
+                assert (df[col].to_numpy() == baseline[col].to_numpy()).all()
+            else:
+                assert list(df[col].astype(str)) == list(baseline[col].astype(str))
+
+    # Cột cùng nhóm dùng chung một bộ category ở mọi sheet
+    for group in CATEGORY_GROUPS:
+        dtypes = [frames[sheet][col].dtype for sheet in SHEETS for col in group if col in frames[sheet].columns]
+        assert all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes)
+        assert all(dtype == dtypes[0] for dtype in dtypes)
+    assert set(frames['Phieu_xuat']['Kho xuất'].cat.categories) == \
+        set(frames['Phieu_xuat']['Kho xuất']) | set(frames['Phieu_nhap']['Kho nhập'])
+
+    # Schema gọn chiếm ít bộ nhớ hơn bảng thô (cột object)
+    raw = {sheet: pd.read_excel(path, sheet_name=sheet, usecols=usecols, dtype=object)[usecols]
+           for sheet, (usecols, _) in SHEETS.items()}
+    report = memory_report(raw, frames)
+    assert (report['Sau_MB'] < report['Truoc_MB']).all()
@@ -0,0 +1,70 @@
+# tests/test_forecasting.py
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import norm
+
+from utils.forecasting import (METHODS, PERIOD_DAYS, _croston, _moving_average, _seasonal_naive, _ses,
+                               forecast_demand, reorder_points)
+
+CONSTANT = np.full((1, 8), 5.0)
+# Xuất 4 ở kỳ 1 và 2 ở kỳ 4, các kỳ khác không xuất
+INTERMITTENT = np.array([[0.0, 4.0, 0.0, 0.0, 2.0]])
+
+
+def test_constant_series_forecasts_the_constant():
+    for F in (_moving_average(CONSTANT, 3), _ses(CONSTANT, 0.3), _croston(CONSTANT, 0.3, sba=False)):
+        assert F.shape == (1, 9)
+        assert np.isnan(F[0, 0])
+        np.testing.assert_allclose(F[0, 1:], 5.0)
+    np.testing.assert_allclose(_croston(CONSTANT, 0.3)[0, 1:], 5.0 * (1 - 0.3 / 2))
+
+
+def test_moving_average_and_ses_by_hand():
+    Y = np.array([[3.0, 6.0, 9.0]])
+    np.testing.assert_allclose(_moving_average(Y, 3), [[np.nan, 3.0, 4.5, 6.0]])
+    np.testing.assert_allclose(_moving_average(Y, 2), [[np.nan, 3.0, 4.5, 7.5]])
+    # level: 3 -> 3 + 0.5 × (6 - 3) = 4.5 -> 4.5 + 0.5 × (9 - 4.5) = 6.75
+    np.testing.assert_allclose(_ses(Y, 0.5), [[np.nan, 3.0, 4.5, 6.75]])
+
+
+def test_croston_intermittent_series_by_hand():
+    # Lần xuất đầu (kỳ 1): z = 4, p = 2 -> dự báo 2; kỳ 4 xuất 2 sau 3 kỳ:
+    # z = 4 + 0.5 × (2 - 4) = 3, p = 2 + 0.5 × (3 - 2) = 2.5 -> dự báo 1.2
+    croston = _croston(INTERMITTENT, 0.5, sba=False)
+    np.testing.assert_allclose(croston, [[np.nan, np.nan, 2.0, 2.0, 2.0, 1.2]])
+    np.testing.assert_allclose(_croston(INTERMITTENT, 0.5), croston * 0.75)
+    assert np.isnan(_croston(np.zeros((1, 4)), 0.5)).all()
+
+
+def test_seasonal_naive_repeats_last_season():
+    Y = np.arange(1.0, 7.0)[None, :]
+    np.testing.assert_allclose(_seasonal_naive(Y, 4), [[np.nan] * 4 + [1.0, 2.0, 3.0]])
+    assert np.isnan(_seasonal_naive(Y, 12)).all()
+
+
+def test_forecast_demand_picks_croston_for_intermittent_series():
+    # PT1 xuất đều mỗi tháng (ADI = 1), PT2 chỉ xuất 2 trong 5 tháng (ADI = 2.5)
+    phieu_xuat = pd.DataFrame({
+        'ngay_xuat': pd.to_datetime(['2023-01-10', '2023-02-10', '2023-03-10', '2023-04-10', '2023-05-10',
+                                     '2023-06-10', '2023-02-05', '2023-06-05']),
+        'ma_pt': ['PT1'] * 6 + ['PT2'] * 2,
+        'kho_xuat': 'KHO_HN',
+        'sl_xuat': [5, 5, 5, 5, 5, 5, 4, 2]
+    })
+    result = forecast_demand(phieu_xuat, 'M', workers=1).set_index('ma_pt')
+    assert result.loc['PT1', 'mo_hinh'] != 'SBA'
+    assert result.loc['PT1', 'du_bao'] == pytest.approx(5.0)
+    assert result.loc['PT1', 'sai_so'] == 0
+    assert result.loc['PT2', 'mo_hinh'] == 'SBA'
+    assert set(f'du_bao_{m}' for m in METHODS) <= set(result.columns)
+
+
+def test_reorder_points():
+    forecast = pd.DataFrame({'du_bao': [10.0, 0.0], 'sai_so': [2.0, 0.0]})
+    result = reorder_points(forecast, 'M', lead_time_days=2 * PERIOD_DAYS['M'], service_level=0.95)
+    z = norm.ppf(0.95)
+    np.testing.assert_allclose(result['nhu_cau_bo_sung'], [20.0, 0.0])
+    np.testing.assert_allclose(result['ton_an_toan'], [z * 2.0 * np.sqrt(2), 0.0])
+    np.testing.assert_allclose(result['diem_dat_hang'], [20.0 + z * 2.0 * np.sqrt(2), 0.0])
+    assert 'diem_dat_hang' not in forecast.columns
@@ -0,0 +1,60 @@
+# tests/test_fulfilment.py
+import numpy as np
+import pandas as pd
+
+from utils.fulfilment import TRANG_THAI, FulfilmentIndex
+
+
+def _don_dat_hang(rows):
+    return pd.DataFrame(rows, columns=['ngay_dat', 'ma_dl', 'ma_dh', 'ma_pt', 'sl_dat', 'hinh_thuc']).astype(
+        {'ngay_dat': 'datetime64[ns]'})
+
+
+def _phieu_xuat(rows):
+    return pd.DataFrame(rows, columns=['ngay_xuat', 'ma_dl', 'ma_dh', 'so_phieu_xuat', 'ma_pt', 'sl_xuat',
+                                       'kho_xuat']).astype({'ngay_xuat': 'datetime64[ns]'})
+
+
+def test_partial_slips_fill_one_order_line():
+    # Một dòng đơn 10 được giao bằng phiếu 4 (ngày 3) và phiếu 6 (ngày 5); thêm một dòng đơn
+    # chưa giao và một phiếu không khớp dòng đơn nào
+    ddh = _don_dat_hang([
+        ('2024-01-01', 'DL1', 'DH1', 'PT1', 10, 'Thường'),
+        ('2024-01-01', 'DL1', 'DH1', 'PT2', 3, 'Thường')
+    ])
+    px = _phieu_xuat([
+        ('2024-01-06', 'DL1', 'DH1', 'PX2', 'PT1', 6, 'KHO_HCM'),
+        ('2024-01-04', 'DL1', 'DH1', 'PX1', 'PT1', 4, 'KHO_HN'),
+        ('2024-01-04', 'DL2', 'DH9', 'PX3', 'PT1', 7, 'KHO_HN')
+    ])
+    index = FulfilmentIndex(ddh, px)
+    lines = index.lines.set_index('ma_pt')
+
+    line = lines.loc['PT1']
+    assert line['so_phieu'] == 2
+    assert line['sl_xuat'] == 10
+    assert line['tg_xuat_dau'] == 3
+    assert line['tg_giao_du'] == 5
+    assert line['kho_xuat'] == 'KHO_HN'
+    assert line['trang_thai'] == 'Đã giao đủ'
+    assert line['ti_le_dap_ung'] == 1
+
+    line = lines.loc['PT2']
+    assert line['so_phieu'] == 0
+    assert np.isnan(line['tg_xuat_dau']) and np.isnan(line['tg_giao_du'])
+    assert line['trang_thai'] == TRANG_THAI[2]
+
+    assert index.unmatched == 1
+    overview = index.overview()
+    assert overview['phieu_khong_khop'] == 1
+    assert overview['ti_le_dap_ung'] == 10 / 13
+
+
+def test_partial_delivery_has_no_full_date():
+    ddh = _don_dat_hang([('2024-01-01', 'DL1', 'DH1', 'PT1', 10, 'Gấp')])
+    px = _phieu_xuat([('2024-01-02', 'DL1', 'DH1', 'PX1', 'PT1', 4, 'KHO_HN')])
+    line = FulfilmentIndex(ddh, px).lines.iloc[0]
+    assert line['trang_thai'] == 'Giao một phần'
+    assert line['tg_xuat_dau'] == 1
+    assert np.isnan(line['tg_giao_du'])
+    assert line['ti_le_dap_ung'] == 0.4
@@ -0,0 +1,125 @@
+# tests/test_stock_ledger.py
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from benchmarks.synthetic import generate
+from utils.dataset import COLUMNS, InventoryDataset
+from utils.stock_ledger import StockHistory, StockLedger
+
+
+@pytest.fixture(params=['category', 'object'])
+def slips(request, synthetic_workbook):
+    """
+    Phiếu nhập/xuất đọc qua data_loader (cột mã kiểu category) hoặc bảng gốc (kiểu object)
+    """
+    path, _ = synthetic_workbook
+    if request.param == 'category':
+        dataset = InventoryDataset(path)
+        return dataset.phieu_nhap, dataset.phieu_xuat
+    frames = generate(n_parts=20, n_dealers=6, n_warehouses=3, years=1, seed=7)
+    return (frames['Phieu_nhap'].rename(columns=COLUMNS['phieu_nhap']),
+            frames['Phieu_xuat'].rename(columns=COLUMNS['phieu_xuat']))
+
+
+def _baseline_stock(pn, px):
+    """
+    Tồn kho kho × phụ tùng bằng groupby pandas (cách tính trước khi có StockLedger)
+    """
+    nhap = pn.groupby(['kho_nhap', 'ma_pt'], observed=True)['sl_nhap'].sum().rename_axis(['Kho', 'ma_pt'])
+    xuat = px.groupby(['kho_xuat', 'ma_pt'], observed=True)['sl_xuat'].sum().rename_axis(['Kho', 'ma_pt'])
+    stock = pd.concat([nhap.rename('Tong_nhap'), xuat.rename('Tong_xuat')], axis=1).fillna(0).reset_index()
+    stock['Ton_kho'] = stock['Tong_nhap'] - stock['Tong_xuat']
+    return stock
+
+
+def _canonical(df, keys):
+    df = df.copy()
+    for col in keys:
+        df[col] = df[col].astype(str)
+    return df.sort_values(keys).reset_index(drop=True)
+
+
+def test_stock_frame_matches_groupby(slips):
+    pn, px = slips
+    ledger = StockLedger.build(pn, px)
+    expected = _baseline_stock(pn, px)
+    pdt.assert_frame_equal(_canonical(ledger.stock_frame(), ['Kho', 'ma_pt']),
+                           _canonical(expected, ['Kho', 'ma_pt']), check_dtype=False)
+
+
+@pytest.mark.parametrize('threshold', [-50, 0, 10, 1000])
+def test_below_matches_groupby(slips, threshold):
+    pn, px = slips
+    ledger = StockLedger.build(pn, px)
+    expected = _baseline_stock(pn, px)
+    expected = expected[expected['Ton_kho'] <= threshold]
+    pdt.assert_frame_equal(_canonical(ledger.below(threshold), ['Kho', 'ma_pt']),
+                           _canonical(expected, ['Kho', 'ma_pt']), check_dtype=False)
+
+
+def test_warehouse_totals_match_groupby(slips):
+    pn, px = slips
+    totals = StockLedger.build(pn, px).warehouse_totals()
+    nhap = pn.groupby('kho_nhap', observed=True)['sl_nhap'].agg(['sum', 'count'])
+    xuat = px.groupby('kho_xuat', observed=True)['sl_xuat'].agg(['sum', 'count'])
+    expected = pd.DataFrame({
+        'Tong_nhap': nhap['sum'], 'So_lan_nhap': nhap['count'],
+        'Tong_xuat': xuat['sum'], 'So_lan_xuat': xuat['count']
+    }).fillna(0).rename_axis('Kho').reset_index()
+    pdt.assert_frame_equal(_canonical(totals, ['Kho']), _canonical(expected, ['Kho']), check_dtype=False)
+
+
+def _stock_at(pn, px, date):
+    """
+    Tồn kho tại hết ngày `date`: cộng dồn có dấu các phiếu đến ngày đó
+    """
+    date = pd.Timestamp(date)
+    events = pd.concat([
+        pd.DataFrame({'Kho': pn['kho_nhap'].astype(str), 'ma_pt': pn['ma_pt'].astype(str),
+                      'ngay': pn['ngay_nhap'], 'sl': pn['sl_nhap'].astype('float64')}),
+        pd.DataFrame({'Kho': px['kho_xuat'].astype(str), 'ma_pt': px['ma_pt'].astype(str),
+                      'ngay': px['ngay_xuat'], 'sl': -px['sl_xuat'].astype('float64')})
+    ], ignore_index=True)
+    events = events[events['ngay'] <= date]
+    return events.groupby(['Kho', 'ma_pt'])['sl'].sum().rename('Ton_kho').reset_index()
+
+
+def test_on_hand_at_matches_filtered_cumsum(slips):
+    pn, px = slips
+    ledger = StockLedger.build(pn, px)
+    history = StockHistory.build(pn, px, ledger.warehouses, ledger.parts)
+    first, last = history.date_range()
+    dates = [first - pd.Timedelta(days=1), first, first + (last - first) / 3, last - pd.Timedelta(days=1),
+             last, last + pd.Timedelta(days=30)]
+
+    for date in dates:
+        expected = _stock_at(pn, px, date)
+        pdt.assert_frame_equal(_canonical(history.on_hand_at(date), ['Kho', 'ma_pt']),
+                               _canonical(expected, ['Kho', 'ma_pt']), check_dtype=False)
+
+        kho, ma_pt = expected.iloc[0][['Kho', 'ma_pt']] if len(expected) else ('KHO_HN', 'PT00000')
+        assert history.on_hand_at(date, kho, ma_pt) == pytest.approx(
+            expected.loc[(expected['Kho'] == kho) & (expected['ma_pt'] == ma_pt), 'Ton_kho'].sum())
+
+    assert history.on_hand_at(first - pd.Timedelta(days=1)).empty
+    end = history.on_hand_at(last)
+    pdt.assert_frame_equal(_canonical(end, ['Kho', 'ma_pt']),
+                           _canonical(ledger.stock_frame()[['Kho', 'ma_pt', 'Ton_kho']], ['Kho', 'ma_pt']),
+                           check_dtype=False)
+
+
+def test_updated_history_matches_rebuild(slips):
+    pn, px = slips
+    cut_pn, cut_px = int(len(pn) * 0.6), int(len(px) * 0.6)
+    ledger = StockLedger.build(pn, px)
+    old = StockHistory.build(pn.iloc[:cut_pn], px.iloc[:cut_px], ledger.warehouses, ledger.parts)
+    updated = old.updated(pn.iloc[cut_pn:], px.iloc[cut_px:], ledger.warehouses, ledger.parts)
+    rebuilt = StockHistory.build(pn, px, ledger.warehouses, ledger.parts)
+
+    assert np.array_equal(updated.composite, rebuilt.composite)
+    assert np.array_equal(updated.cum[np.r_[updated.starts[1:] - 1, len(updated.cum) - 1]],
+                          rebuilt.cum[np.r_[rebuilt.starts[1:] - 1, len(rebuilt.cum) - 1]])
+    for date in ['2022-02-01', '2022-07-01', '2022-12-31']:
+        pdt.assert_frame_equal(updated.on_hand_at(date), rebuilt.on_hand_at(date))
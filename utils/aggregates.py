@@ -0,0 +1,194 @@
+# utils/aggregates.py
+import copy
+
+import numpy as np
+import pandas as pd
+
+from utils.stock_ledger import StockHistory, StockLedger
+from utils.time_cube import TimeCube
+
+# Cách gộp từng cột của bảng tổng hợp đại lý khi cộng thêm dòng mới
+DEALER_COMBINE = {
+    'n': 'sum', 'tong': 'sum', 'tong_bp': 'sum', 'ngay_dau': 'min', 'ngay_cuoi': 'max',
+    'tong_tre': 'sum', 'so_dong_tre': 'sum'
+}
+
+
+def _combine(old, new, keys, how):
+    """
+    Gộp hai bảng tổng hợp theo khóa, `how` là cách gộp từng cột (sum/min/max)
+    """
+    merged = pd.concat([df for df in (old, new) if df is not None], ignore_index=True)
+    return merged.groupby(keys, observed=True, as_index=False).agg(how)
+
+
+class InventoryAggregates:
+    """
+    Các tổng hợp cộng dồn được từ phiếu nhập, phiếu xuất và đơn đặt hàng
+
+    Dựng một lần từ toàn bộ dữ liệu; khi file nguồn chỉ ghi thêm chứng từ mới thì
+    `updated(delta)` chỉ tổng hợp phần dòng mới rồi gộp vào kết quả cũ.
+    """
+
+    def __init__(self, tables=None):
+        self.ledger = None     # sổ tồn kho kho × phụ tùng: tổng và số lần nhập/xuất
+        self.history = None    # lịch sử tồn kho theo ngày (tra cứu tồn kho tại một ngày)
+        self.cube = None       # lượng nhập/xuất theo kỳ (ngày/tháng/quý/năm) × kho
+        self.dai_ly = None     # đại lý: số dòng xuất, tổng, tổng bình phương, ngày đầu/cuối, độ trễ
+        self.dai_ly_pt = None  # đại lý × phụ tùng: số dòng (xuất + đặt hàng) và tổng xuất
+        self.don_hang = None   # ngày đặt (sớm nhất) của từng mã đơn hàng, để tính độ trễ xuất
+        self.cho_don = None    # dòng xuất (ma_dl, ma_dh, ngay_xuat) chưa tìm thấy đơn hàng, chờ đơn về sau
+        if tables is not None:
+            self._add(tables)
+
+    def updated(self, delta):
+        """
+        Bản tổng hợp mới sau khi cộng thêm các dòng mới (bản cũ giữ nguyên)
+
+        Dòng xuất đã cộng trước đó mà đơn hàng chỉ có trong phần dòng mới được tính lại độ
+        trễ. Khác với dựng lại từ đầu ở một trường hợp: mã đơn đã có mà phần dòng mới có ngày
+        đặt sớm hơn thì độ trễ của các dòng xuất cũ vẫn tính theo ngày đặt cũ.
+        """
+        result = copy.copy(self)
+        result._add(delta)
+        return result
+
+    def _add(self, tables):
+        pn = tables.get('phieu_nhap')
+        px = tables.get('phieu_xuat')
+        ddh = tables.get('don_dat_hang')
+
+        if pn is not None and px is not None:
+            if self.ledger is None:
+                self.ledger = StockLedger.build(pn, px)
+                self.history = StockHistory.build(pn, px, self.ledger.warehouses, self.ledger.parts)
+                self.cube = TimeCube.build(pn, px, self.ledger.warehouses)
+            else:
+                self.ledger = self.ledger.updated(pn, px)
+                self.history = self.history.updated(pn, px, self.ledger.warehouses, self.ledger.parts)
+                self.cube = self.cube.updated(pn, px, self.ledger.warehouses)
+
+        if ddh is not None:
+            don_hang = ddh.groupby('ma_dh', observed=True)['ngay_dat'].min()
+            if self.don_hang is not None:
+                don_hang = pd.concat([self.don_hang, don_hang]).groupby(level=0).min()
+            self.don_hang = don_hang
+            self._match_waiting()
+
+        if px is not None:
+            sl = px['sl_xuat'].astype('float64')
+            tre = self._lag_days(px)
+            cho = px.loc[tre.isna() & px['ma_dh'].notna(), ['ma_dl', 'ma_dh', 'ngay_xuat']]
+            self.cho_don = pd.concat([df for df in (self.cho_don, cho) if df is not None], ignore_index=True)
+            dai_ly = px.assign(sl=sl, sl_bp=sl ** 2, tre=tre, co_tre=tre.notna()).groupby('ma_dl', observed=True).agg(
+                n=('sl', 'count'),
+                tong=('sl', 'sum'),
+                tong_bp=('sl_bp', 'sum'),
+                ngay_dau=('ngay_xuat', 'min'),
+                ngay_cuoi=('ngay_xuat', 'max'),
+                tong_tre=('tre', 'sum'),
+                so_dong_tre=('co_tre', 'sum')
+            ).reset_index()
+            self.dai_ly = _combine(self.dai_ly, dai_ly, 'ma_dl', DEALER_COMBINE)
+
+        pairs = []
+        if px is not None:
+            pairs.append(px.groupby(['ma_dl', 'ma_pt'], observed=True)['sl_xuat'].agg(['count', 'sum']).reset_index())
+        if ddh is not None:
+            dat = ddh.groupby(['ma_dl', 'ma_pt'], observed=True).size().reset_index(name='count')
+            pairs.append(dat.assign(sum=0))
+        if pairs:
+            dai_ly_pt = pd.concat(pairs, ignore_index=True)
+            dai_ly_pt.columns = ['ma_dl', 'ma_pt', 'so_dong', 'tong_xuat']
+            self.dai_ly_pt = _combine(self.dai_ly_pt, dai_ly_pt, ['ma_dl', 'ma_pt'], 'sum')
+
+    def _match_waiting(self):
+        """
+        Cộng độ trễ của các dòng xuất đang chờ đơn hàng nay đã có trong `don_hang`
+        """
+        if self.cho_don is None or self.cho_don.empty or self.dai_ly is None:
+            return
+        tre = self._lag_days(self.cho_don)
+        khop = tre.notna()
+        if not khop.any():
+            return
+
+        bo_sung = self.cho_don[khop].assign(tre=tre[khop]).groupby('ma_dl', observed=True).agg(
+            tong_tre=('tre', 'sum'),
+            so_dong_tre=('tre', 'count')
+        ).reset_index()
+        bo_sung = bo_sung.assign(n=0, tong=0.0, tong_bp=0.0, ngay_dau=pd.NaT, ngay_cuoi=pd.NaT)
+        self.dai_ly = _combine(self.dai_ly, bo_sung[self.dai_ly.columns], 'ma_dl', DEALER_COMBINE)
+        self.cho_don = self.cho_don[~khop].reset_index(drop=True)
+
+    def _lag_days(self, px):
+        """
+        Số ngày từ ngày đặt đơn hàng đến ngày xuất của từng dòng phiếu xuất (NaN nếu không
+        tìm thấy mã đơn hàng)
+        """
+        if self.don_hang is None:
+            return pd.Series(np.nan, index=px.index)
+        pos = self.don_hang.index.get_indexer(px['ma_dh'])
+        ngay_dat = self.don_hang.to_numpy()[np.maximum(pos, 0)]
+        tre = (px['ngay_xuat'].to_numpy() - ngay_dat) / np.timedelta64(1, 'D')
+        return pd.Series(np.where(pos >= 0, tre, np.nan), index=px.index)
+
+    def warehouse_summary(self):
+        """
+        Tổng nhập, tổng xuất, tồn kho và tỷ lệ xuất/nhập theo kho
+        """
+        totals = self.ledger.warehouse_totals()
+        totals = totals[(totals['So_lan_nhap'] > 0) | (totals['So_lan_xuat'] > 0)]
+        tong_hop = pd.DataFrame({
+            'Kho': totals['Kho'],
+            'Tong_nhap': totals['Tong_nhap'].where(totals['So_lan_nhap'] > 0),
+            'Tong_xuat': totals['Tong_xuat'].where(totals['So_lan_xuat'] > 0)
+        }).reset_index(drop=True)
+        tong_hop['Ton_kho'] = tong_hop['Tong_nhap'] - tong_hop['Tong_xuat']
+        tong_hop['Ti_le_xuat_nhap'] = tong_hop['Tong_xuat'] / tong_hop['Tong_nhap']
+        return tong_hop
+
+    def warehouse_metrics(self):
+        """
+        Chỉ số hiệu suất kho: tổng/trung bình/số lần nhập, tổng xuất, tỷ lệ và tồn kho
+        """
+        totals = self.ledger.warehouse_totals()
+        totals = totals[totals['So_lan_nhap'] > 0].reset_index(drop=True)
+        metrics = pd.DataFrame({
+            'Kho': totals['Kho'],
+            'Tong_nhap': totals['Tong_nhap'],
+            'Trung_binh_nhap': totals['Tong_nhap'] / totals['So_lan_nhap'],
+            'So_lan_nhap': totals['So_lan_nhap'],
+            'Tong_xuat': totals['Tong_xuat'].where(totals['So_lan_xuat'] > 0)
+        })
+        metrics['Ti_le_xuat_nhap'] = metrics['Tong_xuat'] / metrics['Tong_nhap']
+        metrics['Ton_kho'] = metrics['Tong_nhap'] - metrics['Tong_xuat']
+        return metrics
+
+    def dealer_stats(self):
+        """
+        Thống kê cơ bản từng đại lý: số SKU, số dòng, tổng/TB/độ lệch lượng xuất, ngày đầu/cuối
+        và độ trễ trung bình (ngày) từ đặt hàng đến xuất hàng
+        """
+        pairs = self.dai_ly_pt.groupby('ma_dl', observed=True).agg(
+            sku_da_dang=('ma_pt', 'nunique'),
+            tong_lan_nhap=('so_dong', 'sum')
+        ).reset_index()
+
+        stats = self.dai_ly
+        n = stats['n'].astype('float64')
+        phuong_sai = (stats['tong_bp'] - stats['tong'] ** 2 / n) / (n - 1)
+        stats = pd.DataFrame({
+            'ma_dl': stats['ma_dl'],
+            'tong_xuat': stats['tong'],
+            'tb_xuat': stats['tong'] / n,
+            'do_lech_xuat': np.sqrt(phuong_sai.clip(lower=0)).where(n > 1),
+            'ngay_dau': stats['ngay_dau'],
+            'ngay_cuoi': stats['ngay_cuoi'],
+            'do_tre': stats['tong_tre'] / stats['so_dong_tre'].where(stats['so_dong_tre'] > 0)
+        })
+
+        features = pd.merge(pairs, stats, on='ma_dl', how='outer')
+        features['tong_xuat'] = features['tong_xuat'].fillna(0)
+        features[['sku_da_dang', 'tong_lan_nhap']] = features[['sku_da_dang', 'tong_lan_nhap']].fillna(0)
+        return features
@@ -0,0 +1,225 @@
+# utils/artifacts.py
+"""
+Tính trước các bảng của dashboard ngoài Streamlit (chạy định kỳ hoặc trên máy mạnh hơn):
+
+    python -m utils.artifacts [file Excel] [--out thư_mục]
+
+Mỗi phiên bản dữ liệu được ghi vào một thư mục con riêng; app.py và các trang đọc lại bằng
+`current_artifacts()` trước, chỉ tải bộ dữ liệu (Excel/snapshot) khi thiếu bảng cần dùng.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+import pandas as pd
+import streamlit as st
+from pyarrow import feather
+
+from utils.clustering import DEALER_CLUSTERS, PART_CLUSTERS, cluster_dealers, cluster_parts
+from utils.data_loader import source_version, write_manifest
+from utils.dataset import DATA_FILE, InventoryDataset
+from utils.features import dealer_features, demand_classes, part_features
+from utils.forecasting import cached_demand_forecast
+from utils.fulfilment import SUMMARY_KEYS
+from utils.time_cube import FLOWS
+
+ARTIFACT_DIR = "data/artifacts"
+
+# Tăng số này khi thay đổi nội dung/định dạng các bảng để bản tính trước cũ tự bị bỏ qua
+ARTIFACT_VERSION = 3
+
+# Cấp thời gian của các bảng luồng hàng (theo tùy chọn của tab "Luồng hàng kho")
+FLOW_LEVELS = ['D', 'M', 'Q', 'Y']
+
+# Cấp thời gian của các bảng dự báo (theo tùy chọn "Chu kỳ dự báo" của tab "Cảnh báo")
+FORECAST_LEVELS = ['M', 'W']
+
+
+def warehouse_part_issues(phieu_xuat, danh_muc):
+    """
+    Tổng lượng xuất theo kho × tên phụ tùng
+    """
+    xuat_chi_tiet = pd.merge(phieu_xuat, danh_muc, on='ma_pt', how='left')
+    return xuat_chi_tiet.groupby(['kho_xuat', 'ten_pt'], observed=True)['sl_xuat'].sum().reset_index()
+
+
+def _last_day_stock(dataset):
+    history = dataset.aggregates.history
+    return history.warehouse_on_hand_at(history.date_range()[1])
+
+
+def _flow_table(flow, level):
+    return lambda dataset: dataset.aggregates.cube.series(flow, level)
+
+
+def _forecast_table(level):
+    return lambda dataset: cached_demand_forecast(dataset, level)
+
+
+def _fulfilment_table(key):
+    return lambda dataset: dataset.fulfilment.summary(key)
+
+
+# Các bảng của app.py: tên -> hàm tính từ bộ dữ liệu (dùng khi chưa có bản tính trước)
+DASHBOARD_TABLES = {
+    'danh_muc': lambda dataset: dataset.danh_muc,
+    'tong_quan_kho': lambda dataset: dataset.aggregates.warehouse_summary(),
+    'hieu_suat_kho': lambda dataset: dataset.aggregates.warehouse_metrics(),
+    'ton_kho': lambda dataset: dataset.aggregates.ledger.stock_frame(),
+    'khoang_ngay': lambda dataset: pd.DataFrame(
+        [dataset.aggregates.history.date_range()], columns=['ngay_dau', 'ngay_cuoi']
+    ),
+    'ton_kho_ngay_cuoi': _last_day_stock,
+    'xuat_kho_phu_tung': lambda dataset: warehouse_part_issues(dataset.phieu_xuat, dataset.danh_muc),
+    'dap_ung_tong_quan': lambda dataset: pd.DataFrame([dataset.fulfilment.overview()]),
+    **{f'luong_{flow}_{level}': _flow_table(flow, level) for flow in FLOWS for level in FLOW_LEVELS},
+    **{f'du_bao_{level}': _forecast_table(level) for level in FORECAST_LEVELS},
+    **{f'dap_ung_{key}': _fulfilment_table(key) for key in SUMMARY_KEYS}
+}
+
+
+def compute_artifacts(dataset, part_clusters=PART_CLUSTERS, dealer_clusters=DEALER_CLUSTERS):
+    """
+    Tính mọi bảng của dashboard từ một bộ dữ liệu: các bảng của app.py (DASHBOARD_TABLES),
+    đặc trưng + nhóm phụ tùng, nhóm nhu cầu, danh mục và đặc trưng + nhóm đại lý
+    """
+    artifacts = {name: build(dataset) for name, build in DASHBOARD_TABLES.items()}
+
+    aggregates = dataset.aggregates
+    phieu_xuat = dataset.phieu_xuat
+    artifacts['dac_trung_phu_tung'] = cluster_parts(part_features(phieu_xuat), part_clusters)
+    artifacts['nhom_nhu_cau'] = demand_classes(phieu_xuat)
+    if aggregates.dai_ly is not None:
+        features = dealer_features(aggregates.dealer_stats(), aggregates.dai_ly_pt)
+        artifacts['dac_trung_dai_ly'] = cluster_dealers(features, dataset.version, dealer_clusters)
+    return artifacts
+
+
+def dashboard_table(artifacts, name, load_dataset):
+    """
+    Bảng `name` của app.py: lấy từ bản tính trước nếu có, không thì tính từ bộ dữ liệu
+    (`load_dataset()` chỉ được gọi khi thiếu bảng)
+    """
+    if artifacts is not None and name in artifacts:
+        return artifacts[name]
+    return DASHBOARD_TABLES[name](load_dataset())
+
+
+def artifact_path(version, directory=ARTIFACT_DIR):
+    return os.path.join(directory, version[:16])
+
+
+def write_artifacts(artifacts, version, directory=ARTIFACT_DIR, params=None, source=None):
+    """
+    Ghi mỗi bảng thành một file Feather trong thư mục của phiên bản, manifest ghi sau cùng
+    """
+    path = artifact_path(version, directory)
+    os.makedirs(path, exist_ok=True)
+    manifest = {
+        'version': ARTIFACT_VERSION,
+        'data_version': version,
+        'source': os.path.abspath(source) if source else None,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': params or {},
+        'tables': {}
+    }
+    for name, df in artifacts.items():
+        file_name = f'{name}.feather'
+        tmp = os.path.join(path, f'{file_name}.{os.getpid()}.tmp')
+        feather.write_feather(df.reset_index(drop=True), tmp, compression='uncompressed')
+        os.replace(tmp, os.path.join(path, file_name))
+        manifest['tables'][name] = {'file': file_name, 'rows': len(df)}
+
+    write_manifest(path, manifest)
+    return path
+
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_artifacts(version, directory=ARTIFACT_DIR):
+    """
+    Các bảng tính trước của phiên bản dữ liệu `version` ({tên: DataFrame, 'params': ..., 'data_version': ...}),
+    None nếu chưa có hoặc không dùng được
+    """
+    path = artifact_path(version, directory)
+    manifest = _read_manifest(path)
+    if manifest is None or manifest.get('version') != ARTIFACT_VERSION or manifest.get('data_version') != version:
+        return None
+
+    try:
+        artifacts = {
+            name: feather.read_feather(os.path.join(path, info['file']))
+            for name, info in manifest['tables'].items()
+        }
+    except (OSError, ValueError) as e:
+        logging.warning(f"Không đọc được bảng tính trước ở {path}: {str(e)}")
+        return None
+    artifacts['params'] = manifest['params']
+    artifacts['data_version'] = manifest['data_version']
+    return artifacts
+
+
+@st.cache_resource(show_spinner=False)
+def _cached_artifacts(version, directory, mtime):
+    return load_artifacts(version, directory)
+
+
+def cached_artifacts(version, directory=ARTIFACT_DIR):
+    """
+    Bảng tính trước dùng chung trong tiến trình server (đọc lại khi manifest được ghi mới)
+
+    Mỗi bảng trả về là bản sao nông: trang nào thêm/sửa cột cũng không ảnh hưởng trang khác.
+    """
+    try:
+        mtime = os.stat(os.path.join(artifact_path(version, directory), 'manifest.json')).st_mtime_ns
+    except OSError:
+        return None
+
+    artifacts = _cached_artifacts(version, directory, mtime)
+    if artifacts is None:
+        return None
+    return {
+        name: value.copy(deep=False) if isinstance(value, pd.DataFrame) else value
+        for name, value in artifacts.items()
+    }
+
+
+def current_artifacts(file_path=DATA_FILE, directory=ARTIFACT_DIR):
+    """
+    Bảng tính trước của phiên bản hiện tại của file nguồn (None nếu chưa có), không cần
+    tải bộ dữ liệu: phiên bản lấy từ manifest snapshot hoặc hash file
+    """
+    return cached_artifacts(source_version(file_path), directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tính trước các bảng tổng hợp của dashboard (không cần Streamlit)")
+    parser.add_argument('file', nargs='?', default=DATA_FILE, help="File Excel dữ liệu nguồn")
+    parser.add_argument('--out', default=ARTIFACT_DIR, help="Thư mục ghi kết quả (mỗi phiên bản dữ liệu một thư mục con)")
+    parser.add_argument('--part-clusters', type=int, default=PART_CLUSTERS, help="Số cụm phụ tùng")
+    parser.add_argument('--dealer-clusters', type=int, default=DEALER_CLUSTERS, help="Số cụm đại lý")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    start = time.perf_counter()
+    dataset = InventoryDataset(args.file)
+    artifacts = compute_artifacts(dataset, args.part_clusters, args.dealer_clusters)
+    params = {'part_clusters': args.part_clusters, 'dealer_clusters': args.dealer_clusters}
+    path = write_artifacts(artifacts, dataset.version, args.out, params, source=args.file)
+
+    print(f"Phiên bản dữ liệu {dataset.version[:16]}: đã ghi {len(artifacts)} bảng vào {path} "
+          f"trong {time.perf_counter() - start:.1f}s")
+    for name, df in artifacts.items():
+        print(f"  {name:<24}{len(df):>10,} dòng")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+# utils/backtest.py
+import json
+import logging
+import math
+import threading
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy.stats import norm
+
+from utils.features import demand_classes
+from utils.forecasting import BLOCK_ROWS, PERIOD_DAYS, SEASON, demand_series, forecast_block, run_blocks
+from utils.time_cube import period_codes
+
+# Chính sách mặc định: (s, S) xem xét mỗi kỳ, s = ROP theo dự báo, S = s + `cover_periods` kỳ dự báo.
+# `groups` ghi đè mức phục vụ/số kỳ đặt thêm cho từng nhóm phụ tùng.
+DEFAULT_POLICY = {
+    'level': 'M',
+    'lead_time_days': 30,
+    'service_level': 0.95,
+    'cover_periods': 1,
+    'groups': {}
+}
+
+# Số kỳ cuối được phát lại, số kỳ giữa hai gốc dự báo và số kỳ lịch sử tối thiểu trước gốc đầu
+HORIZON = 12
+STEP = 3
+MIN_HISTORY = 6
+
+# Nhóm của chuỗi không có trong bảng nhóm phụ tùng
+OTHER_GROUP = 'Khác'
+
+
+def _policy(policy):
+    merged = dict(DEFAULT_POLICY, **(policy or {}))
+    merged['groups'] = {str(k): dict(v) for k, v in merged['groups'].items()}
+    return merged
+
+
+def policy_key(policy):
+    """
+    Chuỗi khóa ổn định của chính sách (dùng làm khóa cache)
+    """
+    return json.dumps(_policy(policy), sort_keys=True, ensure_ascii=False)
+
+
+def _receipts(phieu_nhap, keys, ky, level):
+    """
+    Lượng nhập theo kỳ, căn theo đúng dòng (phụ tùng × kho) và cột kỳ của ma trận nhu cầu
+
+    Phiếu trước kỳ đầu được dồn vào kỳ đầu; cặp không có trong ma trận nhu cầu bị bỏ qua.
+    """
+    matrix = np.zeros((len(keys), len(ky)))
+    if not len(keys) or phieu_nhap.empty:
+        return matrix
+
+    index = pd.MultiIndex.from_arrays([keys['ma_pt'].astype(object), keys['kho_xuat'].astype(object)])
+    dong = index.get_indexer(pd.MultiIndex.from_arrays([
+        phieu_nhap['ma_pt'].astype(object), phieu_nhap['kho_nhap'].astype(object)
+    ]))
+    days = pd.to_datetime(phieu_nhap['ngay_nhap']).to_numpy().astype('datetime64[D]')
+    qty = np.nan_to_num(phieu_nhap['sl_nhap'].to_numpy(dtype='float64', na_value=np.nan))
+
+    keep = (dong >= 0) & ~np.isnat(days)
+    cot = period_codes(days[keep].astype(np.int64), level) - ky[0]
+    keep_ky = cot < len(ky)
+    flat = dong[keep][keep_ky] * len(ky) + np.maximum(cot[keep_ky], 0)
+    return np.bincount(flat, weights=qty[keep][keep_ky], minlength=matrix.size).reshape(matrix.shape)
+
+
+def _simulate_block(block, start, step, lead, protection, season, window, alpha):
+    """
+    Phát lại nhu cầu thực tế từ kỳ `start` dưới chính sách (s, S) cho một khối chuỗi
+
+    Tại mỗi gốc (cách nhau `step` kỳ) dự báo lại chỉ từ dữ liệu trước gốc để tính s, S.
+    Mỗi kỳ: nhận hàng đến hạn, đáp ứng nhu cầu từ tồn (thiếu thì mất bán), rồi đặt hàng lên
+    S nếu vị thế tồn (tồn + hàng đang về) <= s; hàng đặt về sau `lead` kỳ.
+    """
+    Y, nhap, ton_dau, z, cover = block
+    n, T = Y.shape
+    on_hand = ton_dau.copy()
+    pipeline = np.zeros((n, max(lead, 1)))
+    nhu_cau, dap_ung, ton = np.zeros(n), np.zeros(n), np.zeros(n)
+    het_hang, so_lan_dat = np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    dong = np.arange(n)
+
+    for t in range(start, T):
+        if (t - start) % step == 0:
+            forecasts, _, rmse, _, chon = forecast_block(Y[:, :t], season, window, alpha)
+            du_bao = np.nan_to_num(forecasts[dong, chon])
+            rop = du_bao * protection + z * np.nan_to_num(rmse[dong, chon]) * np.sqrt(protection)
+            muc_dat = rop + du_bao * cover
+
+        if lead > 0:
+            on_hand += pipeline[:, 0]
+            pipeline[:, :-1] = pipeline[:, 1:]
+            pipeline[:, -1] = 0
+
+        d = Y[:, t]
+        served = np.minimum(on_hand, d)
+        on_hand -= served
+        nhu_cau += d
+        dap_ung += served
+        het_hang += d > served
+
+        vi_the = on_hand + pipeline.sum(axis=1)
+        dat = np.where(vi_the <= rop, np.maximum(muc_dat - vi_the, 0), 0)
+        if lead > 0:
+            pipeline[:, lead - 1] += dat
+        else:
+            on_hand += dat
+        so_lan_dat += dat > 0
+        ton += on_hand
+
+    # Tồn thực tế cuối mỗi kỳ trong cùng giai đoạn (để so sánh)
+    thuc_te = ton_dau[:, None] + np.cumsum(nhap[:, start:] - Y[:, start:], axis=1)
+    so_ky = T - start
+    return nhu_cau, dap_ung, het_hang, ton / so_ky, so_lan_dat, np.maximum(thuc_te, 0).mean(axis=1)
+
+
+def backtest(phieu_nhap, phieu_xuat, policy=None, groups=None, horizon=HORIZON, step=STEP,
+             window=3, alpha=0.1, workers=None, block_rows=BLOCK_ROWS):
+    """
+    Kiểm định chính sách ROP/đặt hàng lên mức S trên lịch sử phiếu nhập/xuất (rolling origin)
+
+    `groups` là Series mã phụ tùng -> nhóm (mặc định: nhóm nhu cầu Syntetos–Boylan); mức
+    phục vụ và số kỳ đặt thêm lấy theo nhóm trong `policy['groups']` nếu có. Tồn đầu giai
+    đoạn là tồn thực tế (nhập - xuất) trước kỳ phát lại đầu tiên. Các khối chuỗi chạy song
+    song trên `workers` tiến trình. Trả về bảng kết quả từng chuỗi phụ tùng × kho.
+    """
+    started = time.perf_counter()
+    policy = _policy(policy)
+    level = policy['level']
+    keys, ky, Y = demand_series(phieu_xuat, level)
+    n, T = Y.shape
+
+    start = max(T - horizon, MIN_HISTORY)
+    if start >= T:
+        raise ValueError(f"Chưa đủ lịch sử để kiểm định: cần hơn {MIN_HISTORY} kỳ, hiện có {T} kỳ")
+
+    nhap = _receipts(phieu_nhap, keys, ky, level)
+    ton_dau = np.maximum(nhap[:, :start].sum(axis=1) - Y[:, :start].sum(axis=1), 0)
+
+    if groups is None:
+        classes = demand_classes(phieu_xuat, level)
+        groups = pd.Series(classes['nhom_nhu_cau'].to_numpy(), index=classes['ma_pt'].astype(object))
+    nhom = keys['ma_pt'].astype(object).map(groups).fillna(OTHER_GROUP).astype(str)
+    rieng = policy['groups']
+    muc_phuc_vu = nhom.map(lambda g: rieng.get(g, {}).get('service_level', policy['service_level']))
+    cover = nhom.map(lambda g: rieng.get(g, {}).get('cover_periods', policy['cover_periods'])).to_numpy(dtype=float)
+    z = norm.ppf(muc_phuc_vu.to_numpy(dtype=float))
+
+    # Số kỳ chờ hàng khi mô phỏng và số kỳ cần che phủ khi tính ROP (thời gian bổ sung + 1 kỳ xem xét)
+    period_days = PERIOD_DAYS[level]
+    lead = math.ceil(policy['lead_time_days'] / period_days)
+    protection = policy['lead_time_days'] / period_days + 1
+
+    blocks = [
+        (Y[i:i + block_rows], nhap[i:i + block_rows], ton_dau[i:i + block_rows],
+         z[i:i + block_rows], cover[i:i + block_rows])
+        for i in range(0, n, block_rows)
+    ]
+    task = partial(_simulate_block, start=start, step=step, lead=lead, protection=protection,
+                   season=SEASON[level], window=window, alpha=alpha)
+    results, workers = run_blocks(task, blocks, workers)
+    nhu_cau, dap_ung, het_hang, ton, so_lan_dat, ton_thuc_te = (np.concatenate(part) for part in zip(*results))
+
+    result = keys.assign(
+        nhom=nhom.to_numpy(),
+        nhu_cau=nhu_cau,
+        da_dap_ung=dap_ung,
+        ti_le_dap_ung=np.divide(dap_ung, nhu_cau, out=np.ones(n), where=nhu_cau > 0),
+        so_ky_het_hang=het_hang,
+        ti_le_ky_het_hang=het_hang / (T - start),
+        ton_TB=ton,
+        ton_thuc_te_TB=ton_thuc_te,
+        so_lan_dat=so_lan_dat
+    )
+    logging.info(
+        f"Kiểm định {n:,} chuỗi × {T - start} kỳ ({level}) trong "
+        f"{time.perf_counter() - started:.2f}s ({workers} tiến trình)"
+    )
+    return result
+
+
+def summarize(result):
+    """
+    Tổng hợp kết quả kiểm định theo nhóm phụ tùng, kèm dòng tổng
+    """
+    agg = {
+        'So_chuoi': ('nhu_cau', 'size'),
+        'Nhu_cau': ('nhu_cau', 'sum'),
+        'Da_dap_ung': ('da_dap_ung', 'sum'),
+        'Ti_le_ky_het_hang': ('ti_le_ky_het_hang', 'mean'),
+        'So_lan_dat': ('so_lan_dat', 'sum'),
+        'Ton_TB': ('ton_TB', 'sum'),
+        'Ton_thuc_te_TB': ('ton_thuc_te_TB', 'sum')
+    }
+    summary = pd.concat([
+        result.groupby('nhom').agg(**agg).reset_index(),
+        result.assign(nhom='Tổng').groupby('nhom').agg(**agg).reset_index()
+    ], ignore_index=True)
+    summary.insert(4, 'Ti_le_dap_ung', summary['Da_dap_ung'] / summary['Nhu_cau'])
+    return summary
+
+
+@st.cache_resource(show_spinner=False)
+def _registry():
+    # Kết quả kiểm định theo chính sách của phiên bản dữ liệu hiện tại, dùng chung mọi phiên
+    return {'lock': threading.Lock(), 'version': None, 'results': {}}
+
+
+def cached_backtest(dataset, policy=None):
+    """
+    Kiểm định chính sách trên bộ dữ liệu dùng chung, lưu cache theo (chính sách, phiên bản dữ liệu)
+    """
+    registry = _registry()
+    key = policy_key(policy)
+    with registry['lock']:
+        if registry['version'] != dataset.version:
+            registry['version'] = dataset.version
+            registry['results'] = {}
+        result = registry['results'].get(key)
+    if result is None:
+        # Phát lại lịch sử ngoài khóa để phiên khác (chính sách khác) không phải chờ;
+        # hai phiên cùng chạy một chính sách thì giữ kết quả ghi trước
+        result = backtest(dataset.phieu_nhap, dataset.phieu_xuat, policy)
+        with registry['lock']:
+            if registry['version'] == dataset.version:
+                result = registry['results'].setdefault(key, result)
+    return result.copy()
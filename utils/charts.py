@@ -0,0 +1,105 @@
+# utils/charts.py
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+# Số điểm tối đa gửi xuống trình duyệt cho mỗi biểu đồ đường (chia đều cho các đường)
+# và mỗi biểu đồ phân tán
+LINE_BUDGET = 3000
+SCATTER_BUDGET = 5000
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: chọn `n_out` điểm giữ hình dạng đường (đỉnh, đáy)
+
+    Giữ điểm đầu và cuối; mỗi nhóm ở giữa chọn điểm tạo tam giác lớn nhất với điểm đã chọn
+    ở nhóm trước và trung bình nhóm sau. Trả về chỉ số các điểm được chọn (tăng dần).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        tb_x, tb_y = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        area = np.abs((x[a] - tb_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (tb_y - y[a]))
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+
+def downsample_lines(df, x, y, color=None, budget=LINE_BUDGET):
+    """
+    Giảm số điểm mỗi đường (theo `color`) bằng LTTB để cả biểu đồ không quá `budget` điểm
+
+    Trục x là vị trí điểm trong đường sau khi sắp xếp theo `x` (nhãn kỳ hoặc ngày đều dùng được).
+    """
+    groups = [df] if color is None else [g for _, g in df.groupby(color, observed=True, sort=False)]
+    per_line = max(budget // max(len(groups), 1), 3)
+    parts = []
+    for g in groups:
+        g = g.sort_values(x, kind='stable')
+        parts.append(g.iloc[lttb(np.arange(len(g)), g[y].to_numpy(dtype='float64'), per_line)])
+    return pd.concat(parts) if parts else df
+
+
+def category_counts(values, name='nhom', order=None):
+    """
+    Đếm số dòng mỗi nhóm (một dòng cho mỗi nhóm) thay vì gửi từng dòng cho biểu đồ tự đếm
+    """
+    counts = values.value_counts(sort=False).rename_axis(name).reset_index(name='so_luong')
+    counts = counts[counts['so_luong'] > 0]
+    if order is not None:
+        rank = {n: i for i, n in enumerate(order)}
+        counts = counts.sort_values(name, key=lambda s: s.map(rank).fillna(len(rank)), kind='stable')
+    return counts.reset_index(drop=True)
+
+
+def sample_points(df, budget=SCATTER_BUDGET, by=None, seed=42):
+    """
+    Lấy mẫu tối đa `budget` điểm, chia theo tỷ lệ từng nhóm `by` (nhóm nhỏ vẫn có ít nhất 1 điểm)
+    """
+    if len(df) <= budget:
+        return df
+    rng = np.random.default_rng(seed)
+    if by is None:
+        return df.iloc[np.sort(rng.choice(len(df), budget, replace=False))]
+    share = budget / len(df)
+    keep = [
+        rng.choice(rows, max(1, int(round(len(rows) * share))), replace=False)
+        for rows in df.groupby(by, observed=True).indices.values()
+    ]
+    return df.iloc[np.sort(np.concatenate(keep))]
+
+
+def line_chart(df, x, y, color=None, budget=LINE_BUDGET, **kwargs):
+    """
+    px.line trên dữ liệu đã giảm điểm, vẽ bằng WebGL
+    """
+    data = downsample_lines(df, x, y, color, budget)
+    orders = dict(kwargs.pop('category_orders', {}))
+    orders.setdefault(x, sorted(df[x].unique()))
+    return px.line(data, x=x, y=y, color=color, render_mode='webgl', category_orders=orders, **kwargs)
+
+
+def pie_chart(values, name='nhom', order=None, **kwargs):
+    """
+    px.pie trên bảng đếm sẵn mỗi nhóm một dòng
+    """
+    counts = category_counts(values, name, order)
+    return px.pie(counts, names=name, values='so_luong', **kwargs)
+
+
+def scatter_chart(df, x, y, budget=SCATTER_BUDGET, **kwargs):
+    """
+    px.scatter vẽ bằng WebGL, tối đa `budget` điểm (lấy mẫu theo nhóm màu nếu có)
+    """
+    data = sample_points(df, budget, kwargs.get('color'))
+    return px.scatter(data, x=x, y=y, render_mode='webgl', **kwargs)
@@ -0,0 +1,414 @@
+# utils/clustering.py
+import copy
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from joblib import Parallel, delayed
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+# Đặc trưng dùng để phân cụm đại lý
+DEALER_FEATURES = ['sku_da_dang', 'cuong_do_nhap', 'he_so_bien_dong', 'chi_so_tap_trung', 'do_tre']
+
+# Đặc trưng dùng để phân cụm phụ tùng
+PART_CLUSTER_FEATURES = ['trung_binh_xuat', 'do_bien_dong', 'tan_suat', 'ti_le_thang_xuat']
+
+# Đặt tên cụm phụ tùng theo tâm cụm (đặc trưng đã chuẩn hóa), lần lượt theo thứ tự ưu tiên:
+# A - lượng xuất TB và tần suất cao nhất, D - thấp nhất, B - biến động mạnh và ít tháng có
+# xuất, C - nhiều tháng có xuất và ổn định
+PART_PROFILES = [
+    ('Nhóm A - Nhu cầu cao', {'trung_binh_xuat': 1, 'tan_suat': 1}),
+    ('Nhóm D - Nhu cầu thấp', {'trung_binh_xuat': -1, 'tan_suat': -1}),
+    ('Nhóm B - Mùa vụ', {'do_bien_dong': 1, 'ti_le_thang_xuat': -0.5}),
+    ('Nhóm C - Cố định', {'ti_le_thang_xuat': 1, 'do_bien_dong': -1})
+]
+
+# Đặt tên cụm đại lý theo tâm cụm, lần lượt theo thứ tự ưu tiên
+DEALER_PROFILES = [
+    ('Nhóm 5: Đại lý chiến lược', {'cuong_do_nhap': 1}),
+    ('Nhóm 1: Đại lý toàn diện', {'sku_da_dang': 1}),
+    ('Nhóm 3: Đại lý mùa vụ', {'he_so_bien_dong': 1}),
+    ('Nhóm 2: Đại lý chuyên biệt ổn định', {'chi_so_tap_trung': 1, 'he_so_bien_dong': -1}),
+    ('Nhóm 4: Đại lý nhỏ rủi ro cao', {'cuong_do_nhap': -1, 'sku_da_dang': -1, 'do_tre': 1}),
+    ('Nhóm 6: Đại lý mới/đặc biệt', {})
+]
+
+# Số cụm mặc định khi không tự chọn k
+PART_CLUSTERS = 4
+DEALER_CLUSTERS = 6
+
+# Số kết quả phân cụm giữ trong bộ nhớ; đặt CACHE_DIR để lưu thêm xuống đĩa (file .npz)
+CACHE_ENTRIES = 32
+CACHE_DIR = None
+
+# Dải số cụm thử khi tự chọn k và số điểm lấy mẫu để tính silhouette
+K_RANGE = range(2, 11)
+SILHOUETTE_SAMPLE = 5000
+
+# Tỷ lệ đại lý thay đổi vượt ngưỡng này thì huấn luyện lại toàn bộ (vẫn khởi tạo từ tâm cũ)
+REFIT_SHARE = 0.5
+
+
+class DealerSegmentation:
+    """
+    Mô hình phân cụm đại lý (MiniBatchKMeans) giữ lại giữa các phiên bản dữ liệu
+
+    Lần đầu huấn luyện đầy đủ. Khi dữ liệu có chứng từ mới, `updated` chỉ cập nhật tâm
+    cụm bằng partial_fit trên các đại lý có đặc trưng thay đổi, bắt đầu từ tâm cụm cũ và
+    giữ nguyên bộ chuẩn hóa để các tâm cụm cùng một hệ tọa độ.
+    """
+
+    def __init__(self, n_clusters=6, random_state=42, batch_size=1024, columns=DEALER_FEATURES):
+        self.n_clusters = n_clusters
+        self.random_state = random_state
+        self.batch_size = batch_size
+        self.columns = list(columns)
+        self.version = None
+
+    def _matrix(self, features):
+        return features[self.columns].to_numpy(dtype='float64')
+
+    def fit(self, features, version=None):
+        """
+        Huấn luyện từ đầu trên toàn bộ đại lý
+        """
+        X = self._matrix(features)
+        self.scaler = StandardScaler().fit(X)
+        self.model = MiniBatchKMeans(
+            n_clusters=self.n_clusters, random_state=self.random_state,
+            batch_size=self.batch_size, n_init=3
+        ).fit(self.scaler.transform(X))
+        self.refits, self.updates = 1, 0
+        self._remember(features, X, version)
+        return self
+
+    def updated(self, features, version=None):
+        """
+        Mô hình mới sau khi cập nhật theo dữ liệu mới (mô hình cũ giữ nguyên)
+        """
+        X = self._matrix(features)
+        changed = self._changed(features, X)
+
+        segmentation = copy.copy(self)
+        segmentation.model = copy.deepcopy(self.model)
+        X_scaled = self.scaler.transform(X)
+
+        if changed.mean() > REFIT_SHARE:
+            segmentation.model = MiniBatchKMeans(
+                n_clusters=self.n_clusters, random_state=self.random_state,
+                batch_size=self.batch_size, init=self.model.cluster_centers_, n_init=1
+            ).fit(X_scaled)
+            segmentation.refits += 1
+        elif changed.any():
+            segmentation.model.partial_fit(X_scaled[changed])
+            segmentation.updates += 1
+
+        segmentation._remember(features, X, version, X_scaled)
+        return segmentation
+
+    def _positions(self, ma_dl):
+        """
+        Vị trí từng đại lý trong lần huấn luyện trước (-1 nếu đại lý mới)
+        """
+        ma_dl = ma_dl.astype(object).to_numpy()
+        n = len(self.ma_dl)
+        # Thường gặp: thứ tự đại lý cũ không đổi, đại lý mới nối ở cuối -> không cần tra khóa
+        if len(ma_dl) >= n and (ma_dl[:n] == self.ma_dl).all():
+            return np.concatenate([np.arange(n), np.full(len(ma_dl) - n, -1)])
+        return pd.Index(self.ma_dl).get_indexer(ma_dl)
+
+    def _changed(self, features, X):
+        """
+        Đại lý mới hoặc có đặc trưng khác so với lần huấn luyện trước
+        """
+        pos = self._positions(features['ma_dl'])
+        changed = pos < 0
+        known = ~changed
+        changed[known] = ~np.isclose(X[known], self.X[pos[known]], equal_nan=True).all(axis=1)
+        return changed
+
+    def _remember(self, features, X, version, X_scaled=None):
+        self.version = version
+        self.ma_dl = features['ma_dl'].astype(object).to_numpy()
+        self.X = X
+        X_scaled = self.scaler.transform(X) if X_scaled is None else X_scaled
+        self.labels = self.model.predict(X_scaled)
+
+    def labels_for(self, features):
+        """
+        Nhãn cụm theo thứ tự dòng của `features` (đã huấn luyện trên đúng bộ đại lý này)
+        """
+        pos = self._positions(features['ma_dl'])
+        if (pos < 0).any():
+            return self.model.predict(self.scaler.transform(self._matrix(features)))
+        return self.labels[pos]
+
+    def result(self, features):
+        """
+        Kết quả phân cụm dạng lưu cache được: nhãn, tâm cụm và tham số chuẩn hóa
+        """
+        return {
+            'labels': self.labels_for(features),
+            'centers': self.model.cluster_centers_,
+            'scaler_mean': self.scaler.mean_,
+            'scaler_scale': self.scaler.scale_
+        }
+
+
+class ClusteringCache:
+    """
+    Cache kết quả phân cụm theo dấu vân tay (fingerprint) của ma trận đặc trưng
+
+    Giữ tối đa `max_entries` kết quả trong bộ nhớ, bỏ kết quả ít dùng nhất (LRU) khi
+    đầy. Nếu có `directory` thì kết quả được ghi thêm xuống đĩa để tiến trình khác hoặc
+    lần khởi động sau dùng lại.
+    """
+
+    def __init__(self, max_entries=CACHE_ENTRIES, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if self.directory and os.path.exists(self._path(key)):
+            try:
+                with np.load(self._path(key)) as stored:
+                    result = {name: stored[name] for name in stored.files}
+            except (OSError, ValueError) as e:
+                logging.warning(f"Không đọc được kết quả phân cụm đã lưu: {str(e)}")
+                return None
+            self._remember(key, result)
+            return result
+        return None
+
+    def put(self, key, result):
+        self._remember(key, result)
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                tmp = self._path(key) + '.tmp.npz'
+                np.savez(tmp, **result)
+                os.replace(tmp, self._path(key))
+            except OSError as e:
+                logging.warning(f"Không ghi được kết quả phân cụm: {str(e)}")
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource(show_spinner=False)
+def _registry():
+    # Mô hình phân cụm hiện tại theo từng bộ đặc trưng, dùng chung cho mọi phiên
+    return {
+        'lock': threading.Lock(),
+        'models': {},
+        'results': ClusteringCache(CACHE_ENTRIES, CACHE_DIR),
+        'labelings': {}
+    }
+
+
+def fingerprint(X, columns, n_clusters, random_state, method='kmeans'):
+    """
+    Khóa cache: hash nội dung ma trận đặc trưng cùng tên cột, số cụm, seed và phương pháp
+    """
+    X = np.ascontiguousarray(X, dtype='float64')
+    digest = hashlib.sha256(X.tobytes())
+    digest.update(repr((X.shape, list(columns), n_clusters, random_state, method)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def kmeans_result(X, n_clusters, random_state=42):
+    """
+    Chuẩn hóa + K-means đầy đủ, trả về nhãn, tâm cụm và tham số chuẩn hóa
+    """
+    scaler = StandardScaler().fit(X)
+    kmeans = KMeans(n_clusters=n_clusters, random_state=random_state)
+    labels = kmeans.fit_predict(scaler.transform(X))
+    return {
+        'labels': labels,
+        'centers': kmeans.cluster_centers_,
+        'scaler_mean': scaler.mean_,
+        'scaler_scale': scaler.scale_
+    }
+
+
+def _raw_centers(result):
+    # Tâm cụm theo đơn vị gốc của đặc trưng (bỏ chuẩn hóa)
+    return result['centers'] * result['scaler_scale'] + result['scaler_mean']
+
+
+def label_clusters(result, columns, profiles, previous=None):
+    """
+    Tên từng cụm (theo chỉ số cụm) dựa trên tâm cụm thay vì chỉ số K-means trả về
+
+    `profiles` là danh sách (tên, {cột: trọng số}) theo thứ tự ưu tiên: lần lượt mỗi tên
+    được gán cho cụm còn lại có điểm (tâm cụm đã chuẩn hóa · trọng số) cao nhất; cụm thừa
+    đặt tên 'Cụm i'. Nếu có lần gán tên trước (`previous`) với cùng số cụm thì các tâm mới
+    được ghép với tâm cũ gần nhất (thuật toán Hungary) và giữ nguyên tên cũ.
+    """
+    centers = result['centers']
+    k = len(centers)
+
+    if previous is not None and len(previous['centers']) == k:
+        # Đưa tâm cũ về cùng hệ chuẩn hóa với lần phân cụm này rồi ghép cặp
+        old = (_raw_centers(previous) - result['scaler_mean']) / result['scaler_scale']
+        cost = ((centers[:, None, :] - old[None, :, :]) ** 2).sum(axis=2)
+        rows, cols = linear_sum_assignment(cost)
+        names = np.empty(k, dtype=object)
+        names[rows] = np.asarray(previous['names'], dtype=object)[cols]
+        return names.astype(str)
+
+    names = np.empty(k, dtype=object)
+    remaining = list(range(k))
+    for name, weights in profiles:
+        if not remaining:
+            break
+        w = np.array([weights.get(col, 0.0) for col in columns])
+        best = remaining[int(np.argmax(centers[remaining] @ w))]
+        names[best] = name
+        remaining.remove(best)
+    for i in remaining:
+        names[i] = f"Cụm {i + 1}"
+    return names.astype(str)
+
+
+def cached_clustering(features, columns, n_clusters, random_state=42, method='kmeans', fit=None, profiles=None):
+    """
+    Kết quả phân cụm của `features[columns]`, chỉ tính khi chưa có trong cache
+
+    `fit` (không tham số) thay cho K-means mặc định khi cần cách phân cụm khác; kết quả
+    phải có dạng như `kmeans_result`. Có `profiles` thì kết quả có thêm 'names' (tên
+    từng cụm, xem `label_clusters`), được lưu cùng cache nên không đổi giữa các lần chạy.
+    Không sửa `features`.
+    """
+    X = features[list(columns)].to_numpy(dtype='float64')
+    profile_names = [name for name, _ in profiles or []]
+    key = fingerprint(X, columns, n_clusters, random_state, (method, profile_names))
+    registry = _registry()
+    cache = registry['results']
+
+    result = cache.get(key)
+    if result is None:
+        result = fit() if fit is not None else kmeans_result(X, n_clusters, random_state)
+        if profiles:
+            with registry['lock']:
+                previous = registry['labelings'].get((tuple(columns), method))
+            result = dict(result, names=label_clusters(result, columns, profiles, previous))
+        cache.put(key, result)
+
+    if profiles:
+        # Lần gán tên gần nhất: mốc để ghép tâm cụm của các lần phân cụm sau
+        with registry['lock']:
+            registry['labelings'][(tuple(columns), method)] = result
+    return result
+
+
+def get_dealer_segmentation(features, version, n_clusters=6):
+    """
+    Mô hình phân cụm đại lý của phiên bản dữ liệu `version`
+
+    Tương tác trên giao diện (cùng phiên bản) chỉ tra lại kết quả đã có; phiên bản mới
+    được cập nhật tăng dần từ mô hình trước thay vì huấn luyện lại từ đầu.
+    """
+    registry = _registry()
+    key = (tuple(DEALER_FEATURES), n_clusters)
+    with registry['lock']:
+        segmentation = registry['models'].get(key)
+        if segmentation is None:
+            segmentation = DealerSegmentation(n_clusters).fit(features, version)
+        elif segmentation.version != version:
+            segmentation = segmentation.updated(features, version)
+        registry['models'][key] = segmentation
+    return segmentation
+
+
+def cluster_parts(features, n_clusters=PART_CLUSTERS):
+    """
+    Phân cụm phụ tùng (chuẩn hóa + K-means), thêm cột `cluster` và tên nhóm `nhom`
+    """
+    result = cached_clustering(features, PART_CLUSTER_FEATURES, n_clusters=n_clusters, random_state=42,
+                               profiles=PART_PROFILES)
+    features = features.assign(cluster=result['labels'])
+    features['nhom'] = result['names'][result['labels']]
+    return features
+
+
+def cluster_dealers(features, version, n_clusters=DEALER_CLUSTERS):
+    """
+    Phân cụm đại lý bằng MiniBatch K-means dùng chung theo phiên bản dữ liệu, thêm cột
+    `cluster` và tên nhóm `nhom`
+    """
+    result = cached_clustering(
+        features, DEALER_FEATURES, n_clusters=n_clusters, random_state=42, method='minibatch',
+        fit=lambda: get_dealer_segmentation(features, version, n_clusters).result(features),
+        profiles=DEALER_PROFILES
+    )
+    features = features.assign(cluster=result['labels'])
+    features['nhom'] = result['names'][result['labels']]
+    return features
+
+
+def _score_k(X, k, random_state, sample):
+    """
+    Huấn luyện K-means với k cụm, trả về (k, inertia, silhouette trên mẫu)
+    """
+    kmeans = KMeans(n_clusters=k, random_state=random_state).fit(X)
+    labels = kmeans.labels_[sample]
+    silhouette = silhouette_score(X[sample], labels) if len(np.unique(labels)) > 1 else np.nan
+    return k, kmeans.inertia_, silhouette
+
+
+def k_sweep(features, columns, k_values=K_RANGE, random_state=42, sample_size=SILHOUETTE_SAMPLE, n_jobs=-1,
+            default_k=None):
+    """
+    Đánh giá các số cụm k: inertia (khuỷu tay) và silhouette trên mẫu, chạy song song
+
+    Silhouette tính trên tối đa `sample_size` điểm (cùng một mẫu cho mọi k) nên chi phí
+    không tăng theo bình phương số dòng. Kết quả lưu cache theo nội dung ma trận đặc trưng
+    (tức theo phiên bản dữ liệu). Trả về bảng k, inertia, silhouette và k được chọn
+    (silhouette lớn nhất). Không thử được k nào (ít hơn 3 dòng) thì trả về bảng rỗng và `default_k`;
+    mọi silhouette đều NaN (mỗi mẫu chỉ có một cụm) thì chọn `default_k`, không có thì k nhỏ nhất.
+    """
+    X = features[list(columns)].to_numpy(dtype='float64')
+    k_values = [k for k in k_values if 1 < k < len(X)]
+    if not k_values:
+        return pd.DataFrame({'k': [], 'inertia': [], 'silhouette': []}), default_k
+    key = fingerprint(X, columns, tuple(k_values), random_state, f'sweep-{sample_size}')
+    cache = _registry()['results']
+
+    result = cache.get(key)
+    if result is None:
+        X_scaled = StandardScaler().fit_transform(X)
+        rng = np.random.default_rng(random_state)
+        sample = np.sort(rng.choice(len(X), min(sample_size, len(X)), replace=False))
+        scores = Parallel(n_jobs=n_jobs)(
+            delayed(_score_k)(X_scaled, k, random_state, sample) for k in k_values
+        )
+        result = {name: np.array(values) for name, values in zip(['k', 'inertia', 'silhouette'], zip(*scores))}
+        cache.put(key, result)
+
+    sweep = pd.DataFrame(result)
+    if sweep['silhouette'].notna().any():
+        return sweep, int(sweep.loc[sweep['silhouette'].idxmax(), 'k'])
+    return sweep, default_k if default_k is not None else k_values[0]
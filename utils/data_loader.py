@@ -1,59 +1,621 @@
 # utils/data_loader.py
-import pandas as pd
+import hashlib
+import json
 import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+# Cấu hình 5 sheet: tên sheet -> (các cột cần đọc, cột ngày tháng cần chuyển đổi)
+SHEETS = {
+    'Danh_muc_vat_tu': (
+        ['Mã phụ tùng', 'Tên phụ tùng', 'Group No', 'Part Name Code', 'Các model áp dụng'],
+        None
+    ),
+    'Don_dat_hang_ban': (
+        ['Ngày đặt hàng', 'Mã đại lý', 'Mã đơn hàng', 'Mã phụ tùng', 'Số lượng', 'Hình thức đơn hàng'],
+        'Ngày đặt hàng'
+    ),
+    'Phieu_xuat': (
+        ['Ngày xuất hàng', 'Mã đại lý', 'Mã đơn hàng', 'Số phiếu xuất', 'Mã phụ tùng', 'Số lượng xuất', 'Kho xuất'],
+        'Ngày xuất hàng'
+    ),
+    'Phieu_nhap': (
+        ['Ngày nhập kho', 'Mã phụ tùng', 'Số lượng nhập', 'Kho nhập'],
+        'Ngày nhập kho'
+    ),
+    'RO': (
+        ['Ngày đặt RO', 'Mã đại lý', 'Mã phụ tùng', 'Số lượng'],
+        'Ngày đặt RO'
+    ),
+}
+
+# Các sheet chứng từ chỉ được ghi thêm dòng mới ở cuối -> đọc tăng dần.
+# Giá trị là cột số chứng từ dùng làm mốc (high-water mark) cùng với cột ngày.
+APPEND_ONLY_SHEETS = {
+    'Don_dat_hang_ban': 'Mã đơn hàng',
+    'Phieu_xuat': 'Số phiếu xuất',
+    'Phieu_nhap': None,
+    'RO': None,
+}
+
+# Schema kiểu dữ liệu gọn: mỗi nhóm cột mã dùng chung một bộ category giữa các sheet
+# (vd. 'Kho xuất' và 'Kho nhập' cùng là danh sách kho) để merge/groupby trên mã số nguyên
+CATEGORY_GROUPS = [
+    ['Mã phụ tùng'],
+    ['Mã đại lý'],
+    ['Kho xuất', 'Kho nhập'],
+    ['Hình thức đơn hàng'],
+]
+
+# Các cột số lượng: ép về kiểu số nhỏ nhất đủ chứa (int8/16/32 hoặc float32 nếu thiếu giá trị)
+QUANTITY_COLUMNS = ['Số lượng', 'Số lượng xuất', 'Số lượng nhập']
+
+# Số dòng Excel chuyển đổi mỗi lần khi đọc sheet: giới hạn bộ nhớ đỉnh khi đọc file lớn
+CHUNK_ROWS = 50_000
+
+# Số tiến trình đọc song song các sheet (mặc định: mỗi sheet một tiến trình, tối đa số CPU)
+WORKERS = min(len(SHEETS), os.cpu_count() or 1)
+
+# Tăng số này khi thay đổi cách đọc/chuẩn hóa dữ liệu để snapshot cũ tự bị bỏ qua
+SNAPSHOT_VERSION = 4
 
-def load_inventory_data(file_path):
+
+def _iter_rows(workbook, sheet_name):
     """
-    Tải dữ liệu từ file Excel gồm 5 sheet
+    Duyệt các dòng không trống của sheet (openpyxl read-only), chỉ lấy các cột trong SHEETS
+    """
+    usecols, _ = SHEETS[sheet_name]
+    rows = workbook[sheet_name].iter_rows(values_only=True)
+    header = [str(c).strip() if c is not None else None for c in next(rows, ())]
+
+    missing = [col for col in usecols if col not in header]
+    if missing:
+        raise ValueError(f"Sheet {sheet_name} thiếu cột: {', '.join(missing)}")
+    idx = [header.index(col) for col in usecols]
+
+    for row in rows:
+        values = tuple(row[i] if i < len(row) else None for i in idx)
+        if any(v is not None for v in values):
+            yield values
+
+
+def _column_kinds(sheet_name):
+    """
+    Kiểu của từng cột theo schema (không suy ra từ dữ liệu): 'date', 'number' hoặc 'text'
+    """
+    usecols, date_col = SHEETS[sheet_name]
+    return {
+        col: 'date' if col == date_col else 'number' if col in QUANTITY_COLUMNS else 'text'
+        for col in usecols
+    }
+
+
+def _object_frame(sheet_name, rows):
+    """
+    DataFrame thô từ các dòng đã đọc: mọi cột kiểu object, giá trị giữ nguyên như trong Excel
+    """
+    return pd.DataFrame(rows, columns=SHEETS[sheet_name][0], dtype=object)
+
+
+def _typed_frame(sheet_name, df):
+    """
+    Ép kiểu DataFrame thô theo schema và bỏ dòng ngày không hợp lệ
+
+    Kiểu cột lấy từ schema chứ không suy ra theo từng khối: cột mã/chữ luôn là 'string'
+    (vd. số phiếu 752 -> '752'), cột số lượng là số, cột ngày là datetime. Nhờ vậy mọi khối
+    của một sheet (và phần dòng ghi thêm) có cùng kiểu, nối lại không sinh cột object lẫn kiểu.
+    """
+    date_col = SHEETS[sheet_name][1]
+    for col, kind in _column_kinds(sheet_name).items():
+        if kind == 'date':
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        elif kind == 'number':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        else:
+            df[col] = df[col].astype('string')
+
+    if date_col:
+        df = df.dropna(subset=[date_col])
+    return df.reset_index(drop=True)
+
+
+def _frame_from_rows(sheet_name, rows):
+    """
+    Dựng DataFrame đã ép kiểu theo schema từ các dòng đã đọc
+    """
+    return _typed_frame(sheet_name, _object_frame(sheet_name, rows))
+
+
+def _compact_chunk(df):
+    """
+    Thu gọn một khối dòng vừa đọc: cột mã -> category, cột số lượng -> kiểu số
+    """
+    for group in CATEGORY_GROUPS:
+        for col in group:
+            if col in df.columns:
+                df[col] = df[col].astype('string').astype('category')
+    for col in QUANTITY_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def _concat_chunks(sheet_name, chunks):
+    """
+    Nối các khối đã thu gọn, gộp bộ category của các khối cho cột mã
+    """
+    if not chunks:
+        return _frame_from_rows(sheet_name, [])
+    if len(chunks) == 1:
+        return chunks[0]
+
+    columns = {}
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            columns[col] = pd.api.types.union_categoricals([c[col] for c in chunks])
+        else:
+            columns[col] = pd.concat([c[col] for c in chunks], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def _read_sheet(workbook, sheet_name, hwm=None, chunk_rows=CHUNK_ROWS):
+    """
+    Đọc một sheet, trả về (DataFrame, mốc high-water mới)
+
+    Các dòng được chuyển đổi theo từng khối `chunk_rows` dòng (kiểu dữ liệu, bỏ dòng
+    ngày không hợp lệ, thu gọn cột mã) nên bộ nhớ đỉnh chỉ cỡ một khối dòng thô cộng
+    với phần dữ liệu đã thu gọn, không phụ thuộc kích thước sheet.
+
+    Mốc gồm số dòng đã đọc và hash của toàn bộ các dòng đó. Nếu có mốc `hwm` từ lần
+    đọc trước thì các dòng cũ chỉ được băm để kiểm tra (không chuyển đổi), chỉ các dòng
+    sau mốc được dựng thành DataFrame; trả về None nếu dòng cũ bị sửa/xóa. Mốc kèm
+    `raw_bytes`: bộ nhớ của các khối thô (cột object) trước khi ép kiểu và thu gọn.
+    """
+    rows = _iter_rows(workbook, sheet_name)
+    digest = hashlib.sha1()
+    seen = 0
+    raw_bytes = 0
+
+    def convert(block):
+        nonlocal raw_bytes
+        raw = _object_frame(sheet_name, block)
+        raw_bytes += int(raw.memory_usage(deep=True).sum())
+        return _compact_chunk(_typed_frame(sheet_name, raw))
+
+    if hwm is not None:
+        for values in islice(rows, hwm['rows']):
+            digest.update(repr(values).encode('utf-8'))
+            seen += 1
+        if seen != hwm['rows'] or digest.hexdigest() != hwm['digest']:
+            return None
+
+    chunks, block, so_dong_moi = [], [], 0
+    for values in rows:
+        digest.update(repr(values).encode('utf-8'))
+        block.append(values)
+        if len(block) == chunk_rows:
+            chunks.append(convert(block))
+            so_dong_moi += len(block)
+            block = []
+    if block or not chunks:
+        chunks.append(convert(block))
+        so_dong_moi += len(block)
+
+    return _concat_chunks(sheet_name, chunks), {
+        'rows': seen + so_dong_moi,
+        'digest': digest.hexdigest(),
+        'raw_bytes': raw_bytes
+    }
+
+
+def _downcast_quantity(series):
+    """
+    Ép cột số lượng về kiểu nhỏ nhất: số nguyên nếu không thiếu và không có phần lẻ
+    """
+    values = pd.to_numeric(series, errors='coerce')
+    if values.notna().all() and (values % 1 == 0).all():
+        return pd.to_numeric(values.astype('int64'), downcast='integer')
+    return pd.to_numeric(values, downcast='float')
+
+
+def apply_schema(frames, base=None):
+    """
+    Áp dụng schema kiểu dữ liệu gọn cho các sheet đã đọc
+
+    Cột mã -> category (dùng chung bộ category theo CATEGORY_GROUPS),
+    cột số lượng -> số nguyên/thực nhỏ nhất, cột ngày -> datetime64.
+    Khi có `base` (dữ liệu đã lưu), bộ category cũ được giữ nguyên thứ tự và
+    chỉ nối thêm mã mới ở cuối để mã số của dữ liệu cũ không đổi.
+    """
+    frames = {sheet: df.copy() for sheet, df in frames.items()}
+
+    for group in CATEGORY_GROUPS:
+        columns = [(sheet, col) for sheet, df in frames.items() for col in group if col in df.columns]
+        values = pd.concat([frames[sheet][col].dropna().astype(str) for sheet, col in columns]).unique()
+
+        known = [base[sheet][col].cat.categories for sheet, col in columns if base is not None]
+        if known:
+            categories = list(known[0]) + sorted(set(values) - set(known[0]))
+        else:
+            categories = sorted(values)
+
+        dtype = pd.CategoricalDtype(categories)
+        for sheet, col in columns:
+            frames[sheet][col] = frames[sheet][col].astype('string').astype(dtype)
+
+    for sheet, df in frames.items():
+        date_col = SHEETS[sheet][1]
+        if date_col:
+            df[date_col] = pd.to_datetime(df[date_col])
+        for col in QUANTITY_COLUMNS:
+            if col in df.columns:
+                df[col] = _downcast_quantity(df[col])
+
+    return frames
+
+
+def memory_report(before, after):
+    """
+    So sánh bộ nhớ (MB) từng bảng trước và sau khi áp dụng schema
+
+    `before` là {sheet: số byte} của dữ liệu thô (cột object, như dựng thẳng từ các dòng Excel)
+    hoặc {sheet: DataFrame}.
+    """
+    rows = []
+    for sheet in before:
+        truoc = before[sheet]
+        if isinstance(truoc, pd.DataFrame):
+            truoc = truoc.memory_usage(deep=True).sum()
+        truoc /= 1024 ** 2
+        sau = after[sheet].memory_usage(deep=True).sum() / 1024 ** 2
+        rows.append([sheet, len(after[sheet]), truoc, sau, sau / truoc if truoc else 0])
+    return pd.DataFrame(rows, columns=['Sheet', 'So_dong', 'Truoc_MB', 'Sau_MB', 'Ti_le'])
+
+
+def _file_hash(file_path, chunk_size=1 << 20):
+    """
+    Tính SHA-256 nội dung file theo từng khối
+    """
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _snapshot_path(file_path, snapshot_dir=None):
+    """
+    Thư mục snapshot riêng cho từng file nguồn (khóa theo đường dẫn tuyệt đối)
+    """
+    abs_path = os.path.abspath(file_path)
+    base = snapshot_dir or os.path.join(os.path.dirname(abs_path), '.snapshot')
+    key = hashlib.sha1(abs_path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(base, key)
+
+
+def _read_manifest(snap_dir):
+    try:
+        with open(os.path.join(snap_dir, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(directory, manifest):
+    """
+    Ghi manifest.json vào `directory` (snapshot, bảng tính trước): ghi ra file tạm rồi đổi
+    tên để tiến trình khác không đọc phải manifest dở dang
+    """
+    tmp = os.path.join(directory, f'manifest.json.{os.getpid()}.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(directory, 'manifest.json'))
+
+
+def _snapshot_files_exist(snap_dir, manifest):
+    return all(os.path.exists(os.path.join(snap_dir, info['file']))
+               for info in manifest['sheets'].values())
+
+
+def _snapshot_is_valid(file_path, snap_dir, manifest):
+    """
+    Kiểm tra snapshot còn khớp với file nguồn: so mtime/kích thước trước,
+    chỉ tính lại hash nội dung khi mtime hoặc kích thước thay đổi
+    """
+    if manifest is None or not _snapshot_files_exist(snap_dir, manifest):
+        return False
+
+    stat = os.stat(file_path)
+    if manifest['mtime'] == stat.st_mtime_ns and manifest['size'] == stat.st_size:
+        return True
+
+    if manifest['sha256'] != _file_hash(file_path):
+        return False
+
+    # Nội dung không đổi (vd. file được copy lại) -> chỉ cập nhật mtime
+    manifest['mtime'] = stat.st_mtime_ns
+    manifest['size'] = stat.st_size
+    write_manifest(snap_dir, manifest)
+    return True
+
+
+def _load_snapshot(snap_dir, manifest):
+    """
+    Đọc các sheet từ file Feather bằng memory-map
+    """
+    return {
+        sheet: feather.read_table(os.path.join(snap_dir, info['file']), memory_map=True).to_pandas()
+        for sheet, info in manifest['sheets'].items()
+    }
+
+
+def _high_water_mark(sheet_name, df, hwm):
+    """
+    Mốc đã đọc của sheet: số dòng nguồn, hash các dòng đã đọc, ngày và số chứng từ mới nhất
+    """
+    date_col = SHEETS[sheet_name][1]
+    key_col = APPEND_ONLY_SHEETS.get(sheet_name)
+    info = {'rows': hwm['rows'], 'digest': hwm['digest']}
+    if date_col and len(df):
+        info['date'] = df[date_col].max().isoformat()
+    if key_col and df[key_col].notna().any():
+        info['key'] = str(df[key_col].dropna().iloc[-1])
+    return info
+
+
+def _write_snapshot(file_path, snap_dir, frames, marks, parent=None, appended=None):
+    """
+    Ghi mỗi sheet thành một file Feather không nén (đọc lại được bằng memory-map)
+
+    `appended` ghi lại vị trí dòng đầu tiên được nối thêm ở lần cập nhật này,
+    để các tổng hợp phía sau chỉ cần cộng phần dữ liệu mới.
+    """
+    os.makedirs(snap_dir, exist_ok=True)
+    stat = os.stat(file_path)
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'path': os.path.abspath(file_path),
+        'mtime': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': _file_hash(file_path),
+        'parent': parent,
+        'sheets': {}
+    }
+
+    for sheet, df in frames.items():
+        name = f'{sheet}.feather'
+        tmp = os.path.join(snap_dir, f'{name}.{os.getpid()}.tmp')
+        feather.write_feather(df, tmp, compression='uncompressed')
+        os.replace(tmp, os.path.join(snap_dir, name))
+        manifest['sheets'][sheet] = _high_water_mark(sheet, df, marks[sheet])
+        manifest['sheets'][sheet]['file'] = name
+        manifest['sheets'][sheet]['appended_from'] = (appended or {}).get(sheet, 0)
+
+    write_manifest(snap_dir, manifest)
+    return manifest
+
+
+def _read_sheet_file(file_path, sheet_name, hwm=None, chunk_rows=CHUNK_ROWS):
+    """
+    Mở file và đọc một sheet (chạy trong tiến trình con), trả về (kết quả, số giây)
     """
+    start = time.perf_counter()
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
     try:
-        # Đọc Danh mục vật tư
-        dmvt = pd.read_excel(
-            file_path,
-            sheet_name='Danh_muc_vat_tu',
-            usecols=['Mã phụ tùng', 'Tên phụ tùng', 'Group No', 'Part Name Code', 'Các model áp dụng']
-        )
+        result = _read_sheet(workbook, sheet_name, hwm, chunk_rows)
+    finally:
+        workbook.close()
+    return result, time.perf_counter() - start
 
-        # Đọc Đơn đặt hàng bán - ĐẢM BẢO CHUYỂN ĐỔI NGÀY THÁNG
-        ddh = pd.read_excel(
-            file_path,
-            sheet_name='Don_dat_hang_ban',
-            usecols=['Ngày đặt hàng', 'Mã đại lý', 'Mã đơn hàng', 'Mã phụ tùng', 'Số lượng', 'Hình thức đơn hàng']
-        )
-        ddh['Ngày đặt hàng'] = pd.to_datetime(ddh['Ngày đặt hàng'], errors='coerce')  # Thêm dòng này
 
-        # Đọc Phiếu xuất - ĐẢM BẢO CHUYỂN ĐỔI NGÀY THÁNG
-        px = pd.read_excel(
-            file_path,
-            sheet_name='Phieu_xuat',
-            usecols=['Ngày xuất hàng', 'Mã đại lý', 'Mã đơn hàng', 'Số phiếu xuất', 'Mã phụ tùng', 'Số lượng xuất', 'Kho xuất']
-        )
-        px['Ngày xuất hàng'] = pd.to_datetime(px['Ngày xuất hàng'], errors='coerce')  # Thêm dòng này
+def _read_sheets(file_path, hwms=None, chunk_rows=CHUNK_ROWS, workers=None):
+    """
+    Đọc các sheet song song, mỗi sheet trong một tiến trình riêng (tránh GIL khi openpyxl
+    phân tích XML), trả về {sheet: (DataFrame, mốc) hoặc None}
 
-        # Đọc Phiếu nhập - ĐẢM BẢO CHUYỂN ĐỔI NGÀY THÁNG
-        pn = pd.read_excel(
-            file_path,
-            sheet_name='Phieu_nhap',
-            usecols=['Ngày nhập kho', 'Mã phụ tùng', 'Số lượng nhập', 'Kho nhập']
-        )
-        pn['Ngày nhập kho'] = pd.to_datetime(pn['Ngày nhập kho'], errors='coerce')  # Thêm dòng này
+    `workers` <= 1 thì đọc tuần tự trong tiến trình hiện tại. Ghi log thời gian và tốc độ
+    đọc từng sheet.
+    """
+    hwms = hwms or {}
+    workers = WORKERS if workers is None else workers
+    start = time.perf_counter()
+    results = None
 
-        # Đọc RO - ĐẢM BẢO CHUYỂN ĐỔI NGÀY THÁNG
-        ro = pd.read_excel(
-            file_path,
-            sheet_name='RO',
-            usecols=['Ngày đặt RO', 'Mã đại lý', 'Mã phụ tùng', 'Số lượng']
-        )
-        ro['Ngày đặt RO'] = pd.to_datetime(ro['Ngày đặt RO'], errors='coerce')  # Thêm dòng này
+    if workers > 1:
+        try:
+            # 'spawn' thay vì fork: server Streamlit đang chạy nhiều luồng
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(workers, len(SHEETS)), mp_context=context) as pool:
+                futures = {
+                    sheet: pool.submit(_read_sheet_file, file_path, sheet, hwms.get(sheet), chunk_rows)
+                    for sheet in SHEETS
+                }
+                results = {sheet: future.result() for sheet, future in futures.items()}
+            workers = min(workers, len(SHEETS))
+        except (OSError, RuntimeError) as e:
+            # Không tạo được tiến trình con (vd. môi trường hạn chế) -> đọc tuần tự
+            logging.warning(f"Không đọc song song được, chuyển sang đọc tuần tự: {str(e)}")
 
-        # Lọc bỏ các dòng có ngày tháng không hợp lệ
-        ddh = ddh.dropna(subset=['Ngày đặt hàng'])
-        px = px.dropna(subset=['Ngày xuất hàng'])
-        pn = pn.dropna(subset=['Ngày nhập kho'])
-        ro = ro.dropna(subset=['Ngày đặt RO'])
+    if results is None:
+        workers = 1
+        results = {sheet: _read_sheet_file(file_path, sheet, hwms.get(sheet), chunk_rows) for sheet in SHEETS}
 
-        return dmvt, ddh, px, pn, ro
+    timing = []
+    for sheet, (result, seconds) in results.items():
+        so_dong = result[1]['rows'] if result is not None else 0
+        moi = so_dong - (hwms[sheet]['rows'] if sheet in hwms else 0)
+        timing.append([sheet, so_dong, moi, seconds, so_dong / max(seconds, 1e-9)])
+    timing = pd.DataFrame(timing, columns=['Sheet', 'So_dong', 'Dong_moi', 'Giay', 'Dong_giay'])
+    logging.info(
+        f"Đọc {len(SHEETS)} sheet trong {time.perf_counter() - start:.2f}s ({workers} tiến trình):\n"
+        f"{timing.to_string(index=False, float_format='{:,.2f}'.format)}"
+    )
+    return {sheet: result for sheet, (result, _) in results.items()}
+
+
+def _read_all(file_path, chunk_rows=CHUNK_ROWS, workers=None):
+    """
+    Đọc toàn bộ 5 sheet từ file Excel
+    """
+    if file_path.lower().endswith('.xls'):
+        # File .xls cũ không đọc được bằng openpyxl -> đọc qua xlrd, không hỗ trợ đọc tăng dần
+        raw, marks = {}, {}
+        for sheet, (usecols, _) in SHEETS.items():
+            rows = pd.read_excel(file_path, sheet_name=sheet, usecols=usecols, dtype=object)[usecols].itertuples(index=False)
+            raw[sheet] = _frame_from_rows(sheet, list(rows))
+            marks[sheet] = {'rows': 0, 'digest': None}
+        frames = apply_schema(raw)
+        return frames, marks
+
+    raw, marks = {}, {}
+    for sheet, (df, mark) in _read_sheets(file_path, chunk_rows=chunk_rows, workers=workers).items():
+        raw[sheet], marks[sheet] = df, mark
+
+    frames = apply_schema(raw)
+    before = {sheet: mark['raw_bytes'] for sheet, mark in marks.items()}
+    logging.info(f"Bộ nhớ theo bảng dữ liệu thô/sau schema:\n{memory_report(before, frames).to_string(index=False)}")
+    return frames, marks
+
+
+def _align_delta(old, new):
+    """
+    Ép các cột của phần dòng mới về kiểu đã lưu trong snapshot trước khi nối
+
+    Cột category đã được `apply_schema` gộp bộ category; cột số để pandas tự nâng kiểu khi
+    nối (vd. int8 + int16). Các cột khác (chuỗi, ngày) phải cùng kiểu với dữ liệu cũ, nếu
+    không pd.concat sẽ tạo cột object lẫn kiểu và không ghi được snapshot.
+    """
+    new = new.copy()
+    for col in old.columns:
+        if isinstance(old[col].dtype, pd.CategoricalDtype) or old[col].dtype == new[col].dtype:
+            continue
+        if pd.api.types.is_numeric_dtype(old[col]) and pd.api.types.is_numeric_dtype(new[col]):
+            continue
+        new[col] = new[col].astype(old[col].dtype)
+    return new
+
+
+def _read_appended(file_path, snap_dir, manifest, chunk_rows=CHUNK_ROWS, workers=None):
+    """
+    Chỉ đọc các dòng mới của các sheet chứng từ và nối vào dữ liệu đã lưu
+
+    Danh mục vật tư nhỏ và có thể bị sửa nên luôn đọc lại toàn bộ. Trả về None nếu
+    có sheet bị sửa/xóa dòng cũ (không còn là ghi thêm) để đọc lại từ đầu; báo
+    ValueError/TypeError nếu phần dòng mới không nối được vào dữ liệu đã lưu.
+    """
+    stored = _load_snapshot(snap_dir, manifest)
+    hwms = {sheet: manifest['sheets'][sheet] for sheet in APPEND_ONLY_SHEETS}
+    raw, marks = {}, {}
+    for sheet, result in _read_sheets(file_path, hwms, chunk_rows, workers).items():
+        if result is None:
+            logging.info(f"Sheet {sheet} có dòng cũ bị thay đổi, đọc lại toàn bộ file")
+            return None
+        raw[sheet], marks[sheet] = result
+
+    delta = apply_schema(raw, base=stored)
+    frames, appended = {}, {}
+    for sheet in SHEETS:
+        if sheet not in APPEND_ONLY_SHEETS:
+            frames[sheet] = delta[sheet]
+            continue
+
+        # Mở rộng bộ category của dữ liệu cũ (mã cũ giữ nguyên vị trí) rồi nối phần mới
+        old = stored[sheet].copy()
+        for col in old.columns:
+            if isinstance(delta[sheet][col].dtype, pd.CategoricalDtype):
+                old[col] = old[col].cat.set_categories(delta[sheet][col].cat.categories)
+        frames[sheet] = pd.concat([old, _align_delta(old, delta[sheet])], ignore_index=True)
+        lan_kieu = [col for col in frames[sheet].columns if frames[sheet][col].dtype == object]
+        if lan_kieu:
+            raise ValueError(f"Sheet {sheet}: không nối được dòng mới vào cột {', '.join(lan_kieu)}")
+        appended[sheet] = len(old)
+        logging.info(f"Sheet {sheet}: nối thêm {len(delta[sheet])} dòng mới")
+
+    return frames, marks, appended
+
+
+def snapshot_manifest(file_path, snapshot_dir=None):
+    """
+    Manifest của snapshot hiện tại (mốc đọc từng sheet, phiên bản cha nếu cập nhật tăng dần)
+    """
+    return _read_manifest(_snapshot_path(file_path, snapshot_dir))
+
+
+def source_version(file_path, snapshot_dir=None):
+    """
+    Phiên bản dữ liệu của file nguồn (hash nội dung), dùng làm khóa cache
+
+    Lấy từ manifest snapshot nếu mtime/kích thước còn khớp, tránh phải hash lại file.
+    """
+    manifest = snapshot_manifest(file_path, snapshot_dir)
+    stat = os.stat(file_path)
+    if manifest is not None and manifest['mtime'] == stat.st_mtime_ns and manifest['size'] == stat.st_size:
+        return manifest['sha256']
+    return _file_hash(file_path)
+
+
+def load_inventory_data(file_path, use_snapshot=True, snapshot_dir=None, incremental=True,
+                        chunk_rows=CHUNK_ROWS, workers=None):
+    """
+    Tải dữ liệu từ file Excel gồm 5 sheet
+
+    Lần đầu đọc file Excel sẽ lưu snapshot dạng cột (Feather) cạnh file nguồn,
+    các lần sau (từ bất kỳ trang/tiến trình nào) đọc lại snapshot bằng memory-map
+    và chỉ đọc lại Excel khi file nguồn thay đổi. Với `incremental=True`, khi file
+    chỉ được ghi thêm chứng từ mới thì chỉ các dòng sau mốc lần trước được chuyển
+    đổi và nối vào snapshot. Các sheet được đọc song song bằng `workers` tiến trình
+    (mặc định WORKERS), mỗi sheet đọc tuần tự theo khối `chunk_rows` dòng.
+    """
+    try:
+        snap_dir = _snapshot_path(file_path, snapshot_dir)
+        manifest = _read_manifest(snap_dir) if use_snapshot else None
+
+        if _snapshot_is_valid(file_path, snap_dir, manifest):
+            frames = _load_snapshot(snap_dir, manifest)
+        else:
+            result = None
+            # File .xls đọc qua xlrd, không đọc tăng dần được (xem _read_all)
+            incremental = incremental and not file_path.lower().endswith('.xls')
+            if incremental and manifest is not None and _snapshot_files_exist(snap_dir, manifest):
+                try:
+                    result = _read_appended(file_path, snap_dir, manifest, chunk_rows, workers)
+                except (ValueError, TypeError, pa.ArrowException) as e:
+                    # Phần dòng mới không khớp kiểu dữ liệu đã lưu -> đọc lại toàn bộ file
+                    logging.warning(f"Không nối được dòng mới vào snapshot, đọc lại toàn bộ: {str(e)}")
+
+            if result is not None:
+                frames, marks, appended = result
+                parent = manifest['sha256']
+            else:
+                frames, marks = _read_all(file_path, chunk_rows, workers)
+                appended, parent = None, None
+
+            if use_snapshot:
+                try:
+                    _write_snapshot(file_path, snap_dir, frames, marks, parent, appended)
+                except (OSError, pa.ArrowException) as e:
+                    # Không ghi được snapshot (vd. thư mục chỉ đọc) thì vẫn trả dữ liệu
+                    logging.warning(f"Không ghi được snapshot: {str(e)}")
+
+        return (
+            frames['Danh_muc_vat_tu'],
+            frames['Don_dat_hang_ban'],
+            frames['Phieu_xuat'],
+            frames['Phieu_nhap'],
+            frames['RO']
+        )
 
     except Exception as e:
         logging.error(f"Lỗi tải dữ liệu: {str(e)}")
-        raise
\ No newline at end of file
+        raise
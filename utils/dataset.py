@@ -0,0 +1,172 @@
+# utils/dataset.py
+import threading
+
+import streamlit as st
+
+from utils.aggregates import InventoryAggregates
+from utils.data_loader import APPEND_ONLY_SHEETS, load_inventory_data, snapshot_manifest, source_version
+from utils.diagnostics import count_rows, stage
+from utils.fulfilment import FulfilmentIndex
+
+DATA_FILE = "data/du_lieu_phu_tung_thuc_te.xlsx"
+
+# Tên cột chuẩn dùng chung cho app.py và các trang
+COLUMNS = {
+    'danh_muc': {
+        'Mã phụ tùng': 'ma_pt',
+        'Tên phụ tùng': 'ten_pt',
+        'Group No': 'group_no',
+        'Part Name Code': 'part_name_code',
+        'Các model áp dụng': 'model_ap_dung'
+    },
+    'don_dat_hang': {
+        'Ngày đặt hàng': 'ngay_dat',
+        'Mã đại lý': 'ma_dl',
+        'Mã đơn hàng': 'ma_dh',
+        'Mã phụ tùng': 'ma_pt',
+        'Số lượng': 'sl_dat',
+        'Hình thức đơn hàng': 'hinh_thuc'
+    },
+    'phieu_xuat': {
+        'Ngày xuất hàng': 'ngay_xuat',
+        'Mã đại lý': 'ma_dl',
+        'Mã đơn hàng': 'ma_dh',
+        'Số phiếu xuất': 'so_phieu_xuat',
+        'Mã phụ tùng': 'ma_pt',
+        'Số lượng xuất': 'sl_xuat',
+        'Kho xuất': 'kho_xuat'
+    },
+    'phieu_nhap': {
+        'Ngày nhập kho': 'ngay_nhap',
+        'Mã phụ tùng': 'ma_pt',
+        'Số lượng nhập': 'sl_nhap',
+        'Kho nhập': 'kho_nhap'
+    },
+    'ro': {
+        'Ngày đặt RO': 'ngay_ro',
+        'Mã đại lý': 'ma_dl',
+        'Mã phụ tùng': 'ma_pt',
+        'Số lượng': 'sl_ro'
+    }
+}
+
+
+# Tên sheet trong file Excel -> tên bảng trong bộ dữ liệu
+SHEET_TABLES = {
+    'Danh_muc_vat_tu': 'danh_muc',
+    'Don_dat_hang_ban': 'don_dat_hang',
+    'Phieu_xuat': 'phieu_xuat',
+    'Phieu_nhap': 'phieu_nhap',
+    'RO': 'ro'
+}
+
+
+class InventoryDataset:
+    """
+    Bộ dữ liệu 5 bảng dùng chung trong một tiến trình server
+
+    Mỗi thuộc tính trả về một bản sao nông (shallow copy) của bảng gốc: trang nào
+    thêm/sửa cột cũng không làm thay đổi dữ liệu dùng chung của các trang khác.
+    Nếu file nguồn chỉ được ghi thêm chứng từ so với bộ dữ liệu trước (`previous`),
+    các tổng hợp được cập nhật từ phần dòng mới thay vì tính lại toàn bộ lịch sử.
+    """
+
+    def __init__(self, file_path, previous=None):
+        self.file_path = file_path
+
+        with stage('load_inventory_data') as record:
+            frames = load_inventory_data(file_path)
+            record['rows'] = count_rows(frames)
+        dmvt, ddh, px, pn, ro = frames
+        manifest = snapshot_manifest(file_path)
+        self.version = manifest['sha256'] if manifest else source_version(file_path)
+
+        self._tables = {
+            'danh_muc': dmvt.rename(columns=COLUMNS['danh_muc']),
+            'don_dat_hang': ddh.rename(columns=COLUMNS['don_dat_hang']),
+            'phieu_xuat': px.rename(columns=COLUMNS['phieu_xuat']),
+            'phieu_nhap': pn.rename(columns=COLUMNS['phieu_nhap']),
+            'ro': ro.rename(columns=COLUMNS['ro'])
+        }
+
+        delta = self._delta(manifest, previous)
+        with stage('Tổng hợp kho (InventoryAggregates)'):
+            if delta is not None:
+                self.aggregates = previous.aggregates.updated(delta)
+            else:
+                self.aggregates = InventoryAggregates(self._tables)
+
+        self._lock = threading.Lock()
+        self._fulfilment = None
+
+    def _delta(self, manifest, previous):
+        """
+        Các dòng mới so với bộ dữ liệu trước, None nếu phải tính lại từ đầu
+        """
+        if previous is None or manifest is None or manifest.get('parent') != previous.version:
+            return None
+
+        delta = {}
+        for sheet in APPEND_ONLY_SHEETS:
+            name = SHEET_TABLES[sheet]
+            start = manifest['sheets'][sheet]['appended_from']
+            if start != len(previous._tables[name]):
+                return None
+            delta[name] = self._tables[name].iloc[start:]
+        return delta
+
+    @property
+    def fulfilment(self):
+        """
+        Chỉ số đáp ứng đơn hàng (đơn đặt hàng × phiếu xuất), dựng một lần khi dùng lần đầu
+        """
+        with self._lock:
+            if self._fulfilment is None:
+                with stage('Chỉ số đáp ứng đơn hàng (FulfilmentIndex)') as record:
+                    self._fulfilment = FulfilmentIndex(self._tables['don_dat_hang'], self._tables['phieu_xuat'])
+                    record['rows'] = len(self._fulfilment.lines)
+        return self._fulfilment
+
+    def table(self, name):
+        return self._tables[name].copy(deep=False)
+
+    @property
+    def danh_muc(self):
+        return self.table('danh_muc')
+
+    @property
+    def don_dat_hang(self):
+        return self.table('don_dat_hang')
+
+    @property
+    def phieu_xuat(self):
+        return self.table('phieu_xuat')
+
+    @property
+    def phieu_nhap(self):
+        return self.table('phieu_nhap')
+
+    @property
+    def ro(self):
+        return self.table('ro')
+
+
+@st.cache_resource(show_spinner=False)
+def _registry():
+    # Bộ dữ liệu hiện tại của từng file nguồn, dùng chung cho mọi phiên trong tiến trình
+    return {'lock': threading.Lock(), 'datasets': {}}
+
+
+def get_dataset(file_path=DATA_FILE):
+    """
+    Lấy bộ dữ liệu dùng chung, chỉ tải lại khi file nguồn thay đổi
+    """
+    registry = _registry()
+    with stage('get_dataset'):
+        version = source_version(file_path)
+        with registry['lock']:
+            dataset = registry['datasets'].get(file_path)
+            if dataset is None or dataset.version != version:
+                dataset = InventoryDataset(file_path, previous=dataset)
+                registry['datasets'][file_path] = dataset
+    return dataset
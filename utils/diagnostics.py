@@ -0,0 +1,211 @@
+# utils/diagnostics.py
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+# File nhật ký (JSON lines, mỗi giai đoạn một dòng) để theo dõi xu hướng giữa các lần chạy/phiên bản
+DIAGNOSTICS_LOG = "data/diagnostics.jsonl"
+
+# Số giai đoạn tối đa giữ lại cho mỗi lần chạy trang (tránh phình bộ nhớ khi vòng lặp gọi nhiều lần)
+MAX_STAGES = 500
+
+# Bản ghi của lần chạy trang hiện tại: mỗi phiên Streamlit chạy script trên luồng riêng
+_local = threading.local()
+
+# tracemalloc dùng chung cả tiến trình: bật khi có ít nhất một giai đoạn cần đo bộ nhớ
+_memory_lock = threading.Lock()
+_memory_users = 0
+
+
+def _state():
+    if not hasattr(_local, 'records'):
+        _local.page = None
+        _local.records = []
+        _local.stack = []
+        _local.track_memory = False
+    return _local
+
+
+def start_run(page, track_memory=False):
+    """
+    Bắt đầu ghi các giai đoạn cho một lần chạy trang (xóa bản ghi của lần chạy trước)
+    """
+    state = _state()
+    state.page = page
+    state.records = []
+    state.stack = []
+    state.track_memory = track_memory
+
+
+def records():
+    """
+    Các giai đoạn đã ghi trong lần chạy hiện tại (theo thứ tự kết thúc)
+    """
+    return list(_state().records)
+
+
+def count_rows(result):
+    """
+    Số dòng của kết quả: DataFrame/Series/mảng theo len, tuple/list cộng dồn các bảng bên trong
+    """
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    if isinstance(result, (tuple, list)):
+        counts = [count_rows(r) for r in result]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    if hasattr(result, 'shape') and len(getattr(result, 'shape', ())):
+        return int(result.shape[0])
+    return None
+
+
+def _memory_start():
+    global _memory_users
+    with _memory_lock:
+        if _memory_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _memory_users += 1
+
+
+def _memory_stop():
+    global _memory_users
+    with _memory_lock:
+        _memory_users -= 1
+        if _memory_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+@contextmanager
+def stage(name, rows=None):
+    """
+    Đo một giai đoạn: thời gian chạy, bộ nhớ đỉnh (MB, nếu bật đo bộ nhớ) và số dòng
+
+    Dùng `with stage('...') as record:` rồi gán `record['rows']` nếu biết số dòng kết quả.
+    Giai đoạn lồng nhau được ghi riêng; bộ nhớ đỉnh của giai đoạn ngoài gồm cả giai đoạn trong.
+    Bộ nhớ đo bằng tracemalloc (cấp phát Python/NumPy, không gồm Arrow/memory-map) và dùng
+    chung cả tiến trình, nên chỉ chính xác khi một phiên chạy tại một thời điểm.
+    """
+    state = _state()
+    record = {
+        'page': state.page,
+        'stage': name,
+        'depth': len(state.stack),
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seconds': None,
+        'peak_mb': None,
+        'rows': rows
+    }
+    track = state.track_memory
+    if track:
+        _memory_start()
+        current, peak = tracemalloc.get_traced_memory()
+        # Giữ đỉnh của các giai đoạn ngoài trước khi đặt lại đỉnh cho giai đoạn này
+        for outer in state.stack:
+            outer['_peak'] = max(outer.get('_peak', 0), peak)
+        tracemalloc.reset_peak()
+        record['_base'], record['_peak'] = current, current
+
+    state.stack.append(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        state.stack.pop()
+        if track:
+            peak = tracemalloc.get_traced_memory()[1]
+            for r in state.stack + [record]:
+                r['_peak'] = max(r.get('_peak', 0), peak)
+            record['peak_mb'] = (record.pop('_peak') - record.pop('_base')) / 1024 ** 2
+            _memory_stop()
+        if len(state.records) < MAX_STAGES:
+            state.records.append(record)
+
+
+def timed(name=None):
+    """
+    Decorator ghi giai đoạn cho mỗi lần gọi hàm, số dòng lấy từ kết quả trả về (count_rows)
+    """
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(label) as record:
+                result = func(*args, **kwargs)
+                record['rows'] = count_rows(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def to_jsonl(stages):
+    """
+    Các giai đoạn dưới dạng JSON lines (mỗi giai đoạn một dòng)
+    """
+    return ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in stages)
+
+
+def append_log(stages, path=DIAGNOSTICS_LOG):
+    """
+    Ghi nối các giai đoạn vào file nhật ký JSON lines
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(to_jsonl(stages))
+
+
+def begin_page(page):
+    """
+    Bắt đầu ghi cho trang `page` (gọi ở đầu trang); bật đo bộ nhớ theo lựa chọn trong bảng chẩn đoán
+    """
+    start_run(page, track_memory=st.session_state.get('chan_doan_bo_nho', False))
+
+
+def diagnostics_panel():
+    """
+    Bảng chẩn đoán hiệu năng (thu gọn) ở cuối trang: thời gian, bộ nhớ đỉnh và số dòng từng giai đoạn
+    """
+    stages = records()
+    with st.expander("Chẩn đoán hiệu năng", expanded=False):
+        st.checkbox(
+            "Đo bộ nhớ đỉnh (tracemalloc, áp dụng từ lần chạy sau; làm chậm trang)",
+            key='chan_doan_bo_nho'
+        )
+        if not stages:
+            st.caption("Chưa có giai đoạn nào được ghi trong lần chạy này")
+            return
+
+        bang = pd.DataFrame(stages)
+        bang['stage'] = ['· ' * d + s for d, s in zip(bang['depth'], bang['stage'])]
+        tong = bang.loc[bang['depth'] == 0, 'seconds'].sum()
+        st.caption(f"{len(bang)} giai đoạn, tổng {tong:.2f}s (các giai đoạn ngoài cùng)")
+        st.dataframe(
+            bang[['stage', 'seconds', 'peak_mb', 'rows']].rename(columns={
+                'stage': 'Giai đoạn', 'seconds': 'Thời gian (s)', 'peak_mb': 'Bộ nhớ đỉnh (MB)', 'rows': 'Số dòng'
+            }).style.format({'Thời gian (s)': '{:.3f}', 'Bộ nhớ đỉnh (MB)': '{:.1f}', 'Số dòng': '{:,.0f}'}, na_rep='-'),
+            hide_index=True,
+            use_container_width=True
+        )
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "Tải về (JSON lines)",
+                data=to_jsonl(stages),
+                file_name='chan_doan.jsonl',
+                mime='application/jsonl',
+                key='chan_doan_tai_ve',
+                on_click='ignore'
+            )
+        with col2:
+            if st.button(f"Ghi vào {DIAGNOSTICS_LOG}", key='chan_doan_ghi'):
+                append_log(stages)
+                st.success(f"Đã ghi {len(stages)} giai đoạn")
@@ -0,0 +1,189 @@
+# utils/export.py
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+# Định dạng xuất -> (tên hiển thị, đuôi file, MIME)
+FORMATS = {
+    'xlsx': ('Excel (.xlsx)', 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('CSV (.csv)', 'csv', 'text/csv'),
+    'parquet': ('Parquet (.parquet)', 'parquet', 'application/vnd.apache.parquet')
+}
+
+# Số dòng chuyển đổi mỗi lần khi ghi: giới hạn bộ nhớ đỉnh khi xuất bảng lớn
+CHUNK_ROWS = 50_000
+
+# Số dòng tối đa của một sheet Excel (trừ dòng tiêu đề); vượt quá thì xuất CSV
+EXCEL_MAX_ROWS = 1_048_575
+
+# Số luồng nền ghi file dùng chung cho mọi phiên, và chu kỳ (giây) kiểm tra tiến độ trên giao diện
+EXPORT_WORKERS = 2
+POLL_SECONDS = 1.0
+
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def python_rows(chunk):
+    """
+    Các dòng của một khối dưới dạng tuple giá trị Python (NaN/NaT -> ô trống)
+    """
+    columns = []
+    for _, col in chunk.items():
+        values = col.to_numpy(dtype=object, copy=True)
+        values[pd.isna(col).to_numpy()] = None
+        columns.append(values.tolist())
+    return zip(*columns)
+
+
+def _write_xlsx(df, buffer, chunk_rows, progress):
+    # Chế độ write-only của openpyxl: ghi tuần tự từng dòng, không giữ cả sheet trong bộ nhớ
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([str(c) for c in df.columns])
+    for chunk in _chunks(df, chunk_rows):
+        for row in python_rows(chunk):
+            sheet.append(row)
+        progress(len(chunk))
+    workbook.save(buffer)
+
+
+def _write_csv(df, buffer, chunk_rows, progress):
+    # utf-8-sig để Excel mở đúng tiếng Việt
+    for i, chunk in enumerate(_chunks(df, chunk_rows)):
+        buffer.write(chunk.to_csv(index=False, header=(i == 0)).encode('utf-8-sig' if i == 0 else 'utf-8'))
+        progress(len(chunk))
+    if df.empty:
+        buffer.write(df.to_csv(index=False).encode('utf-8-sig'))
+
+
+def _write_parquet(df, buffer, chunk_rows, progress):
+    # Mỗi khối là một row group; schema lấy từ khối đầu để các khối sau khớp kiểu
+    schema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    with pq.ParquetWriter(buffer, schema) as writer:
+        for chunk in _chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            progress(len(chunk))
+
+
+WRITERS = {'xlsx': _write_xlsx, 'csv': _write_csv, 'parquet': _write_parquet}
+
+
+class ExportJob:
+    """
+    Một lần xuất file chạy ở luồng nền, kết quả nằm trong bộ đệm bộ nhớ riêng
+
+    Mỗi yêu cầu xuất có bộ đệm riêng (không ghi file lên server) nên các phiên không
+    ghi đè lên nhau; `rows_written` cho biết tiến độ trong lúc đang ghi.
+    """
+
+    def __init__(self, df, file_stem, fmt='xlsx', chunk_rows=CHUNK_ROWS):
+        # Quá số dòng một sheet Excel cho phép thì chuyển sang CSV
+        self.too_large = fmt == 'xlsx' and len(df) > EXCEL_MAX_ROWS
+        self.fmt = 'csv' if self.too_large else fmt
+        self.file_name = f"{file_stem}.{FORMATS[self.fmt][1]}"
+        self.mime = FORMATS[self.fmt][2]
+        self.rows = len(df)
+        self.rows_written = 0
+        self.buffer = None
+        self.error = None
+        self.seconds = None
+        self._df = df.copy(deep=False)
+        self._chunk_rows = chunk_rows
+        self._future = None
+
+    def _progress(self, rows):
+        self.rows_written += rows
+
+    def run(self):
+        start = time.perf_counter()
+        buffer = io.BytesIO()
+        try:
+            WRITERS[self.fmt](self._df, buffer, self._chunk_rows, self._progress)
+            buffer.seek(0)
+            self.buffer = buffer
+        except Exception as e:
+            logging.exception(f"Lỗi khi xuất {self.file_name}")
+            self.error = str(e)
+        finally:
+            self._df = None
+            self.seconds = time.perf_counter() - start
+        return self
+
+    def submit(self, executor):
+        self._future = executor.submit(self.run)
+        return self
+
+    @property
+    def running(self):
+        return self._future is not None and not self._future.done()
+
+
+@st.cache_resource(show_spinner=False)
+def _executor():
+    # Luồng nền ghi file dùng chung cho mọi phiên trong tiến trình server
+    return ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix='export')
+
+
+def submit_export(df, file_stem, fmt='xlsx', chunk_rows=CHUNK_ROWS):
+    """
+    Bắt đầu xuất `df` ở luồng nền, trả về ExportJob ngay (không chờ ghi xong)
+    """
+    return ExportJob(df, file_stem, fmt, chunk_rows).submit(_executor())
+
+
+def _wait_for_export(key):
+    job = st.session_state[key]
+    if job.running:
+        st.info(f"Đang tạo {job.file_name}: {job.rows_written:,}/{job.rows:,} dòng...")
+    else:
+        # Xong thì chạy lại cả trang để hiện nút tải về (và dừng kiểm tra định kỳ)
+        st.rerun()
+
+
+def export_button(df, file_stem, key, label="Xuất file"):
+    """
+    Nút xuất dữ liệu không chặn phiên: chọn định dạng, tạo file ở luồng nền rồi hiện nút tải về
+
+    Kết quả giữ trong `st.session_state[key]` của từng phiên người dùng.
+    """
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        fmt = st.selectbox(
+            "Định dạng",
+            options=list(FORMATS),
+            format_func=lambda f: FORMATS[f][0],
+            key=f"{key}_dinh_dang"
+        )
+    with col2:
+        st.write("")
+        if st.button(label, key=f"{key}_nut"):
+            st.session_state[key] = submit_export(df, file_stem, fmt)
+
+    job = st.session_state.get(key)
+    if job is None:
+        return
+    if job.running:
+        st.fragment(_wait_for_export, run_every=POLL_SECONDS)(key)
+    elif job.error is not None:
+        st.error(f"Lỗi khi xuất file: {job.error}")
+    else:
+        if job.too_large:
+            st.caption(f"Bảng có {job.rows:,} dòng, vượt giới hạn một sheet Excel nên được xuất dạng CSV")
+        st.download_button(
+            f"Tải về {job.file_name} ({job.rows:,} dòng, {job.seconds:.1f}s)",
+            data=job.buffer,
+            file_name=job.file_name,
+            mime=job.mime,
+            key=f"{key}_tai_ve",
+            on_click='ignore'
+        )
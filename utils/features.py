@@ -0,0 +1,211 @@
+# utils/features.py
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from utils.time_cube import period_codes
+
+# Thứ tự cột của bảng đặc trưng phụ tùng
+PART_FEATURES = [
+    'ma_pt', 'tong_xuat', 'trung_binh_xuat', 'do_lech_chuan', 'so_lan_xuat',
+    'so_ngay_hoat_dong', 'tan_suat', 'khoang_cach_tb', 'do_bien_dong',
+    'so_thang_co_xuat', 'ti_le_thang_xuat'
+]
+
+# Ngưỡng phân loại nhu cầu của Syntetos–Boylan
+ADI_CUTOFF = 1.32
+CV2_CUTOFF = 0.49
+
+# Nhóm nhu cầu theo thứ tự (ADI thấp/cao) × (CV² thấp/cao)
+DEMAND_CLASSES = [
+    'Đều đặn (Smooth)',
+    'Biến động (Erratic)',
+    'Gián đoạn (Intermittent)',
+    'Thất thường (Lumpy)'
+]
+
+
+def part_codes(ma_pt):
+    """
+    Mã số nguyên của từng dòng (-1 nếu trống) và danh sách mã phụ tùng tương ứng
+    """
+    if isinstance(ma_pt.dtype, pd.CategoricalDtype):
+        return ma_pt.cat.codes.to_numpy().astype(np.int64), ma_pt.cat.categories
+    codes, parts = pd.factorize(ma_pt, sort=True)
+    return codes.astype(np.int64), parts
+
+
+def part_features(phieu_xuat):
+    """
+    Đặc trưng nhu cầu từng phụ tùng từ phiếu xuất
+
+    Tính trong một lượt trên mảng NumPy: tổng/trung bình/độ lệch chuẩn lượng xuất dùng
+    bincount theo mã phụ tùng; ngày đầu/cuối và số tháng có xuất lấy từ một lần sắp xếp
+    theo (phụ tùng, ngày). Kết quả giống cách tính groupby cũ nhưng không gọi hàm Python
+    cho từng phụ tùng và không thêm cột vào `phieu_xuat`.
+    """
+    ma_pt = phieu_xuat['ma_pt']
+    p, parts = part_codes(ma_pt)
+    qty = phieu_xuat['sl_xuat'].to_numpy(dtype='float64', na_value=np.nan)
+    days = pd.to_datetime(phieu_xuat['ngay_xuat']).to_numpy().astype('datetime64[D]')
+
+    keep = p >= 0
+    p, qty, days = p[keep], qty[keep], days[keep]
+    n = len(parts)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Tổng, trung bình, độ lệch chuẩn (ddof=1) bỏ qua số lượng trống
+        has_qty = ~np.isnan(qty)
+        so_dong = np.bincount(p, weights=has_qty, minlength=n)
+        tong = np.bincount(p, weights=np.where(has_qty, qty, 0), minlength=n)
+        trung_binh = tong / so_dong
+        lech = np.where(has_qty, qty - trung_binh[p], 0)
+        do_lech_chuan = np.sqrt(np.bincount(p, weights=lech ** 2, minlength=n) / (so_dong - 1))
+
+        # Sắp xếp theo (phụ tùng, ngày): ngày đầu/cuối và số tháng có xuất của từng phụ tùng
+        has_day = ~np.isnat(days)
+        dp, d = p[has_day], days[has_day].astype(np.int64)
+        d0 = d.min() if len(d) else 0
+        order = np.argsort(dp * (d.max() - d0 + 1 if len(d) else 1) + (d - d0))
+        dp, d = dp[order], d[order]
+        thang = d.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+        dau = np.r_[True, dp[1:] != dp[:-1]] if len(dp) else np.zeros(0, dtype=bool)
+        cuoi = np.r_[dp[1:] != dp[:-1], True] if len(dp) else np.zeros(0, dtype=bool)
+        thang_moi = dau | np.r_[False, thang[1:] != thang[:-1]][:len(dau)]
+
+        so_lan_xuat = np.bincount(dp, minlength=n)
+        so_thang = np.bincount(dp[thang_moi], minlength=n)
+        so_ngay = np.zeros(n, dtype=np.int64)
+        so_ngay[dp[cuoi]] = d[cuoi]
+        so_ngay[dp[dau]] -= d[dau]
+        # Khoảng cách TB giữa hai ngày có xuất liên tiếp = khoảng ngày / (số ngày có xuất - 1)
+        ngay_moi = dau | np.r_[False, d[1:] != d[:-1]][:len(dau)]
+        so_ngay_xuat = np.bincount(dp[ngay_moi], minlength=n)
+        khoang_cach = np.divide(so_ngay, so_ngay_xuat - 1, out=np.full(n, np.nan), where=so_ngay_xuat > 1)
+        so_ngay[so_ngay == 0] = 1
+        tong_so_thang = np.count_nonzero(np.bincount(thang - thang.min())) if len(thang) else 0
+
+        # Chỉ giữ phụ tùng có ít nhất một lần xuất có ngày
+        idx = np.flatnonzero(so_lan_xuat > 0)
+        features = pd.DataFrame({
+            'ma_pt': parts[idx] if not isinstance(ma_pt.dtype, pd.CategoricalDtype)
+                     else pd.Categorical.from_codes(idx, dtype=ma_pt.dtype),
+            'tong_xuat': tong[idx],
+            'trung_binh_xuat': trung_binh[idx],
+            'do_lech_chuan': do_lech_chuan[idx],
+            'so_lan_xuat': so_lan_xuat[idx],
+            'so_ngay_hoat_dong': so_ngay[idx],
+            'tan_suat': so_lan_xuat[idx] / (so_ngay[idx] / 30),  # Số lần xuất/tháng
+            'khoang_cach_tb': khoang_cach[idx],                  # Khoảng cách TB giữa các ngày có xuất (ngày)
+            'do_bien_dong': do_lech_chuan[idx] / trung_binh[idx],
+            'so_thang_co_xuat': so_thang[idx],
+            'ti_le_thang_xuat': so_thang[idx] / tong_so_thang
+        }, columns=PART_FEATURES)
+
+    # Xử lý giá trị vô cùng và NaN như cách tính cũ
+    return features.replace([np.inf, -np.inf], np.nan).fillna(0)
+
+
+def demand_matrix(phieu_xuat, level='M'):
+    """
+    Ma trận nhu cầu phụ tùng × kỳ (tháng 'M', quý 'Q' hoặc năm 'Y')
+
+    Trả về (mã phụ tùng, mã kỳ, ma trận) với mã kỳ là số nguyên liên tục từ kỳ đầu đến
+    kỳ cuối của dữ liệu; kỳ không xuất có giá trị 0.
+    """
+    p, parts = part_codes(phieu_xuat['ma_pt'])
+    qty = np.nan_to_num(phieu_xuat['sl_xuat'].to_numpy(dtype='float64', na_value=np.nan))
+    days = pd.to_datetime(phieu_xuat['ngay_xuat']).to_numpy().astype('datetime64[D]')
+
+    keep = (p >= 0) & ~np.isnat(days)
+    if not keep.any():
+        return parts, np.zeros(0, dtype=np.int64), np.zeros((len(parts), 0))
+
+    ky = period_codes(days[keep].astype(np.int64), level)
+    ky_dau = ky.min()
+    so_ky = int(ky.max() - ky_dau) + 1
+    flat = p[keep] * so_ky + (ky - ky_dau)
+    matrix = np.bincount(flat, weights=qty[keep], minlength=len(parts) * so_ky)
+    return parts, np.arange(ky_dau, ky_dau + so_ky), matrix.reshape(len(parts), so_ky)
+
+
+def demand_classes(phieu_xuat, level='M'):
+    """
+    ADI, CV² và nhóm nhu cầu Syntetos–Boylan của từng phụ tùng
+
+    Tính trên toàn bộ ma trận phụ tùng × kỳ cùng lúc. ADI là số kỳ (từ kỳ có xuất đầu tiên
+    của phụ tùng đến kỳ cuối của dữ liệu) chia cho số kỳ có xuất; CV² là bình phương hệ số
+    biến thiên của lượng xuất trong các kỳ có xuất. Phụ tùng chưa có kỳ nào xuất dương
+    bị bỏ qua.
+    """
+    parts, _, matrix = demand_matrix(phieu_xuat, level)
+    co_xuat = matrix > 0
+    so_ky_co_xuat = co_xuat.sum(axis=1)
+
+    idx = np.flatnonzero(so_ky_co_xuat > 0)
+    matrix, co_xuat, n = matrix[idx], co_xuat[idx], so_ky_co_xuat[idx]
+
+    so_ky = matrix.shape[1] - co_xuat.argmax(axis=1)
+    duong = np.where(co_xuat, matrix, 0)
+    trung_binh = duong.sum(axis=1) / n
+    phuong_sai = (duong ** 2).sum(axis=1) / n - trung_binh ** 2
+    adi = so_ky / n
+    cv2 = np.clip(phuong_sai, 0, None) / trung_binh ** 2
+
+    nhom = (adi >= ADI_CUTOFF).astype(np.int64) * 2 + (cv2 >= CV2_CUTOFF)
+    ma_pt = phieu_xuat['ma_pt']
+    return pd.DataFrame({
+        'ma_pt': pd.Categorical.from_codes(idx, dtype=ma_pt.dtype)
+                 if isinstance(ma_pt.dtype, pd.CategoricalDtype) else parts[idx],
+        'so_ky': so_ky,
+        'so_ky_co_xuat': n,
+        'adi': adi,
+        'cv2': cv2,
+        'nhom_nhu_cau': pd.Categorical.from_codes(nhom, categories=DEMAND_CLASSES, ordered=True)
+    })
+
+
+def dealer_part_matrix(pairs, dealers, values='tong_xuat'):
+    """
+    Ma trận thưa đại lý × phụ tùng (CSR) từ bảng tổng hợp cặp đại lý - phụ tùng
+
+    Dòng theo thứ tự `dealers`, cột theo mã phụ tùng; cặp có đại lý không nằm trong
+    `dealers` bị bỏ qua.
+    """
+    rows = pd.Index(dealers).get_indexer(pairs['ma_dl'].astype(object))
+    cols, parts = part_codes(pairs['ma_pt'])
+    ok = (rows >= 0) & (cols >= 0)
+    return sparse.csr_matrix(
+        (pairs[values].to_numpy(dtype='float64')[ok], (rows[ok], cols[ok])),
+        shape=(len(dealers), len(parts))
+    )
+
+
+def dealer_features(stats, pairs):
+    """
+    Đặc trưng phân cụm đại lý từ thống kê đại lý và bảng cặp đại lý × phụ tùng
+
+    Độ đa dạng SKU là số phụ tùng khác nhau (xuất hoặc đặt hàng), chỉ số tập trung là
+    chỉ số Herfindahl của cơ cấu lượng xuất theo phụ tùng (1 = chỉ lấy một mã, gần 0 =
+    dàn trải), đều tính trên ma trận thưa đại lý × phụ tùng. Cường độ nhập là lượng xuất
+    mỗi 30 ngày hoạt động, hệ số biến động là độ lệch chuẩn / trung bình lượng xuất mỗi
+    dòng, độ trễ là số ngày trung bình từ đặt hàng đến xuất hàng.
+    """
+    features = stats.copy()
+    dealers = features['ma_dl'].astype(object)
+
+    so_dong = dealer_part_matrix(pairs, dealers, 'so_dong')
+    luong = dealer_part_matrix(pairs, dealers, 'tong_xuat')
+    tong = np.asarray(luong.sum(axis=1)).ravel()
+    binh_phuong = np.asarray(luong.multiply(luong).sum(axis=1)).ravel()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features['sku_da_dang'] = np.diff(so_dong.indptr)
+        features['thoi_gian_hoat_dong'] = (features['ngay_cuoi'] - features['ngay_dau']).dt.days
+        features['cuong_do_nhap'] = features['tong_xuat'] / (features['thoi_gian_hoat_dong'] / 30)  # SP/tháng
+        features['he_so_bien_dong'] = features['do_lech_xuat'] / features['tb_xuat']
+        features['chi_so_tap_trung'] = binh_phuong / tong ** 2
+
+    # Xử lý giá trị vô cùng và NaN
+    return features.replace([np.inf, -np.inf], np.nan).fillna(0)
@@ -0,0 +1,262 @@
+# utils/forecasting.py
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy.stats import norm
+
+from utils.features import ADI_CUTOFF, part_codes
+from utils.time_cube import period_codes
+
+# Các mô hình dự báo (chạy đồng thời trên cả ma trận chuỗi)
+METHODS = ['MA', 'SES', 'SBA', 'SNAIVE']
+METHOD_NAMES = {
+    'MA': 'Trung bình trượt',
+    'SES': 'San bằng mũ đơn',
+    'SBA': 'Croston/SBA',
+    'SNAIVE': 'Naive theo mùa'
+}
+
+# Độ dài mùa vụ và số ngày của mỗi kỳ theo cấp thời gian
+SEASON = {'W': 52, 'M': 12, 'Q': 4}
+PERIOD_DAYS = {'W': 7, 'M': 365.25 / 12, 'Q': 365.25 / 4}
+
+# Số kỳ cuối dùng để chấm sai số dự báo một bước và chọn mô hình
+HOLDOUT = 12
+
+# Số chuỗi mỗi khối giao cho một tiến trình
+BLOCK_ROWS = 5000
+
+# Số tiến trình tính song song các khối chuỗi
+WORKERS = os.cpu_count() or 1
+
+
+def demand_series(phieu_xuat, level='M'):
+    """
+    Ma trận nhu cầu phụ tùng × kho theo kỳ (tuần 'W', tháng 'M' hoặc quý 'Q')
+
+    Trả về (bảng khóa ma_pt/kho_xuat, mã kỳ, ma trận); chỉ giữ các cặp có phát sinh xuất,
+    kỳ không xuất có giá trị 0.
+    """
+    p, parts = part_codes(phieu_xuat['ma_pt'])
+    w, warehouses = part_codes(phieu_xuat['kho_xuat'])
+    qty = np.nan_to_num(phieu_xuat['sl_xuat'].to_numpy(dtype='float64', na_value=np.nan))
+    days = pd.to_datetime(phieu_xuat['ngay_xuat']).to_numpy().astype('datetime64[D]')
+
+    keep = (p >= 0) & (w >= 0) & ~np.isnat(days)
+    if not keep.any():
+        keys = pd.DataFrame({'ma_pt': parts[:0], 'kho_xuat': warehouses[:0]})
+        return keys, np.zeros(0, dtype=np.int64), np.zeros((0, 0))
+
+    ky = period_codes(days[keep].astype(np.int64), level)
+    ky_dau = ky.min()
+    so_ky = int(ky.max() - ky_dau) + 1
+    cap, dong = np.unique(p[keep] * len(warehouses) + w[keep], return_inverse=True)
+    matrix = np.bincount(dong * so_ky + (ky - ky_dau), weights=qty[keep], minlength=len(cap) * so_ky)
+
+    keys = pd.DataFrame({
+        'ma_pt': parts[cap // len(warehouses)],
+        'kho_xuat': warehouses[cap % len(warehouses)]
+    })
+    return keys, np.arange(ky_dau, ky_dau + so_ky), matrix.reshape(len(cap), so_ky)
+
+
+# Mỗi mô hình trả về ma trận n × (T + 1): cột t là dự báo kỳ t từ dữ liệu trước kỳ t,
+# cột cuối là dự báo kỳ tiếp theo.
+
+def _moving_average(Y, window):
+    n, T = Y.shape
+    cum = np.concatenate([np.zeros((n, 1)), np.cumsum(Y, axis=1)], axis=1)
+    t = np.arange(T + 1)
+    lo = np.maximum(t - window, 0)
+    with np.errstate(invalid='ignore'):
+        return (cum[:, t] - cum[:, lo]) / (t - lo)
+
+
+def _ses(Y, alpha):
+    n, T = Y.shape
+    F = np.full((n, T + 1), np.nan)
+    level = Y[:, 0].copy()
+    F[:, 1] = level
+    for t in range(1, T):
+        level += alpha * (Y[:, t] - level)
+        F[:, t + 1] = level
+    return F
+
+
+def _croston(Y, alpha, sba=True):
+    """
+    Croston: san bằng riêng lượng xuất khác 0 và khoảng cách giữa các lần xuất;
+    SBA nhân thêm (1 - alpha / 2) để khử chệch
+    """
+    n, T = Y.shape
+    F = np.full((n, T + 1), np.nan)
+    z = np.full(n, np.nan)
+    p = np.full(n, np.nan)
+    q = np.ones(n)
+    for t in range(T):
+        F[:, t] = z / p
+        d = Y[:, t]
+        co = d > 0
+        dau = co & np.isnan(z)
+        z = np.where(dau, d, np.where(co, z + alpha * (d - z), z))
+        p = np.where(dau, q, np.where(co, p + alpha * (q - p), p))
+        q = np.where(co, 1, q + 1)
+    F[:, T] = z / p
+    return F * (1 - alpha / 2) if sba else F
+
+
+def _seasonal_naive(Y, season):
+    n, T = Y.shape
+    F = np.full((n, T + 1), np.nan)
+    if T >= season:
+        F[:, season:] = Y[:, :T + 1 - season]
+    return F
+
+
+def forecast_block(Y, season, window, alpha):
+    """
+    Chạy cả 4 mô hình trên một khối chuỗi, chấm sai số một bước trên HOLDOUT kỳ cuối
+
+    Chuỗi gián đoạn (ADI >= ADI_CUTOFF) dùng Croston/SBA; các chuỗi còn lại chọn mô hình
+    có MAE nhỏ nhất. Trả về (dự báo, MAE, RMSE của từng mô hình, ADI, mô hình được chọn).
+    """
+    n, T = Y.shape
+    fits = np.stack([
+        _moving_average(Y, window),
+        _ses(Y, alpha),
+        _croston(Y, alpha),
+        _seasonal_naive(Y, season)
+    ])
+
+    dau = max(T - HOLDOUT, 1)
+    err = fits[:, :, dau:T] - Y[None, :, dau:T]
+    valid = ~np.isnan(err)
+    dem = valid.sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mae = np.where(dem > 0, np.where(valid, np.abs(err), 0).sum(axis=2) / dem, np.nan)
+        rmse = np.sqrt(np.where(valid, err ** 2, 0).sum(axis=2) / dem)
+
+    co_xuat = Y > 0
+    so_ky_co_xuat = co_xuat.sum(axis=1)
+    with np.errstate(divide='ignore'):
+        adi = np.where(so_ky_co_xuat > 0, (T - co_xuat.argmax(axis=1)) / so_ky_co_xuat, np.inf)
+
+    lien_tuc = [METHODS.index(m) for m in ['MA', 'SES', 'SNAIVE']]
+    tot_nhat = np.array(lien_tuc)[np.nanargmin(np.where(np.isnan(mae[lien_tuc]), np.inf, mae[lien_tuc]), axis=0)]
+    chon = np.where(adi >= ADI_CUTOFF, METHODS.index('SBA'), tot_nhat)
+    return fits[:, :, T].T, mae.T, rmse.T, adi, chon
+
+
+def run_blocks(task, blocks, workers=None):
+    """
+    Chạy `task` trên từng khối song song trong tiến trình con ('spawn'), tuần tự nếu chỉ có
+    1 khối/1 CPU; trả về (kết quả theo thứ tự khối, số tiến trình đã dùng)
+    """
+    workers = min(WORKERS if workers is None else workers, len(blocks))
+    if workers > 1:
+        try:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                return list(pool.map(task, blocks)), workers
+        except (OSError, RuntimeError) as e:
+            logging.warning(f"Không tính song song được, chuyển sang tính tuần tự: {str(e)}")
+    return [task(block) for block in blocks], 1
+
+
+def forecast_demand(phieu_xuat, level='M', window=3, alpha=0.1, workers=None, block_rows=BLOCK_ROWS):
+    """
+    Dự báo nhu cầu kỳ tới cho mọi chuỗi phụ tùng × kho cùng lúc
+
+    Các mô hình chạy vector hóa trên ma trận chuỗi, chia khối `block_rows` chuỗi cho
+    `workers` tiến trình. Kết quả có mô hình được chọn (`mo_hinh`), dự báo mỗi kỳ (`du_bao`),
+    sai số một bước (`sai_so`, RMSE) và dự báo của từng mô hình (`du_bao_<mô hình>`).
+    """
+    start = time.perf_counter()
+    keys, _, Y = demand_series(phieu_xuat, level)
+    if Y.shape[1] == 0:
+        # Chưa có lịch sử xuất: bảng kết quả rỗng cùng cột
+        result = keys.assign(mo_hinh=np.array(METHODS)[:0], adi=[], du_bao=[], mae=[], sai_so=[])
+        for method in METHODS:
+            result[f'du_bao_{method}'] = np.zeros(0)
+        return result
+
+    blocks = [Y[i:i + block_rows] for i in range(0, len(Y), block_rows)]
+
+    task = partial(forecast_block, season=SEASON[level], window=window, alpha=alpha)
+    results, workers = run_blocks(task, blocks, workers)
+    forecasts, mae, rmse, adi, chon = (np.concatenate(part) for part in zip(*results))
+
+    dong = np.arange(len(chon))
+    result = keys.assign(
+        mo_hinh=np.array(METHODS)[chon],
+        adi=adi,
+        du_bao=np.nan_to_num(forecasts[dong, chon]),
+        mae=mae[dong, chon],
+        sai_so=np.nan_to_num(rmse[dong, chon])
+    )
+    for j, method in enumerate(METHODS):
+        result[f'du_bao_{method}'] = forecasts[:, j]
+
+    logging.info(
+        f"Dự báo {len(result):,} chuỗi × {Y.shape[1]} kỳ ({level}) trong "
+        f"{time.perf_counter() - start:.2f}s ({workers} tiến trình)"
+    )
+    return result
+
+
+def reorder_points(forecast, level='M', lead_time_days=30, service_level=0.95):
+    """
+    Tồn kho an toàn và điểm đặt hàng lại (ROP) từ kết quả dự báo
+
+    Nhu cầu trong thời gian bổ sung L (tính theo số kỳ) = dự báo × L; tồn an toàn =
+    z(mức phục vụ) × sai số dự báo × √L; ROP = nhu cầu trong L + tồn an toàn.
+    """
+    L = lead_time_days / PERIOD_DAYS[level]
+    z = norm.ppf(service_level)
+    forecast = forecast.assign(nhu_cau_bo_sung=forecast['du_bao'] * L)
+    forecast['ton_an_toan'] = z * forecast['sai_so'] * np.sqrt(L)
+    forecast['diem_dat_hang'] = forecast['nhu_cau_bo_sung'] + forecast['ton_an_toan']
+    return forecast
+
+
+@st.cache_resource(show_spinner=False)
+def _registry():
+    # Kết quả dự báo theo cấp thời gian của phiên bản dữ liệu hiện tại, dùng chung mọi phiên
+    return {'lock': threading.Lock(), 'version': None, 'forecasts': {}}
+
+
+def cached_demand_forecast(dataset, level='M'):
+    """
+    Kết quả dự báo (chưa có ROP) của bộ dữ liệu dùng chung, chỉ tính một lần cho mỗi
+    (phiên bản dữ liệu, cấp thời gian)
+    """
+    registry = _registry()
+    with registry['lock']:
+        if registry['version'] != dataset.version:
+            registry['version'] = dataset.version
+            registry['forecasts'] = {}
+        forecast = registry['forecasts'].get(level)
+    if forecast is None:
+        # Tính ngoài khóa để phiên khác (cấp thời gian khác, bản dữ liệu khác) không phải chờ;
+        # hai phiên cùng tính một cấp thì giữ kết quả ghi trước
+        forecast = forecast_demand(dataset.phieu_xuat, level)
+        with registry['lock']:
+            if registry['version'] == dataset.version:
+                forecast = registry['forecasts'].setdefault(level, forecast)
+    return forecast
+
+
+def cached_forecast(dataset, level='M', lead_time_days=30, service_level=0.95):
+    """
+    Dự báo + ROP cho bộ dữ liệu dùng chung; phần dự báo chỉ tính một lần cho mỗi
+    (phiên bản dữ liệu, cấp thời gian), đổi thời gian bổ sung/mức phục vụ không tính lại
+    """
+    return reorder_points(cached_demand_forecast(dataset, level), level, lead_time_days, service_level)
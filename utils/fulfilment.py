@@ -0,0 +1,157 @@
+# utils/fulfilment.py
+import numpy as np
+import pandas as pd
+
+# Trạng thái giao hàng của từng dòng đơn
+TRANG_THAI = ['Đã giao đủ', 'Giao một phần', 'Chưa giao']
+
+# Cột có thể dùng để tổng hợp -> tên hiển thị
+SUMMARY_KEYS = {
+    'ma_dl': 'Đại lý',
+    'kho_xuat': 'Kho xuất',
+    'ma_pt': 'Phụ tùng',
+    'hinh_thuc': 'Hình thức đơn hàng'
+}
+
+
+def _union_codes(left, right):
+    """
+    Mã số nguyên chung cho hai cột (cùng một giá trị -> cùng mã, trống -> -1)
+    """
+    codes, uniques = pd.factorize(pd.concat([left, right], ignore_index=True))
+    return codes[:len(left)].astype(np.int64), codes[len(left):].astype(np.int64), len(uniques)
+
+
+def _days(series):
+    return series.to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+class FulfilmentIndex:
+    """
+    Chỉ số đáp ứng đơn hàng: ghép dòng đơn đặt hàng với các dòng phiếu xuất
+
+    Khóa ghép là (mã đơn hàng, mã phụ tùng) mã hóa thành một số nguyên; các dòng đơn được
+    gom theo khóa đã sắp xếp, dòng phiếu xuất tìm dòng đơn bằng tìm kiếm nhị phân. Một
+    dòng đơn có thể được giao qua nhiều phiếu xuất (giao từng phần): lượng đã giao cộng
+    dồn theo ngày xuất, ngày giao đủ là ngày lượng cộng dồn đạt lượng đặt. Dựng một lần
+    cho mỗi phiên bản dữ liệu.
+    """
+
+    def __init__(self, don_dat_hang, phieu_xuat):
+        ddh, px = don_dat_hang, phieu_xuat
+        o_dh, s_dh, _ = _union_codes(ddh['ma_dh'], px['ma_dh'])
+        o_pt, s_pt, n_pt = _union_codes(ddh['ma_pt'], px['ma_pt'])
+
+        # Dòng đơn: gom các dòng trùng (mã đơn, phụ tùng), giữ đại lý/hình thức của dòng đầu
+        ok = (o_dh >= 0) & (o_pt >= 0)
+        o_key = o_dh * n_pt + o_pt
+        rows = np.flatnonzero(ok)[np.argsort(o_key[ok], kind='stable')]
+        keys, starts = np.unique(o_key[rows], return_index=True)
+        first = rows[starts]
+        sl_dat = np.add.reduceat(ddh['sl_dat'].to_numpy(dtype='float64', na_value=0)[rows], starts) if len(rows) else np.zeros(0)
+        ngay_dat = np.minimum.reduceat(_days(ddh['ngay_dat'])[rows], starts) if len(rows) else np.zeros(0, dtype=np.int64)
+
+        # Dòng phiếu xuất: tìm dòng đơn tương ứng, sắp xếp theo (dòng đơn, ngày xuất)
+        s_key = s_dh * n_pt + s_pt
+        pos = np.searchsorted(keys, s_key)
+        pos = np.minimum(pos, max(len(keys) - 1, 0))
+        matched = (s_dh >= 0) & (s_pt >= 0) & (len(keys) > 0)
+        if len(keys):
+            matched &= keys[pos] == s_key
+        self.unmatched = int((~matched).sum())
+
+        s_rows = np.flatnonzero(matched)
+        s_day = _days(px['ngay_xuat'])[s_rows]
+        order = np.lexsort((s_day, pos[s_rows]))
+        s_rows, s_day, line = s_rows[order], s_day[order], pos[s_rows][order]
+        s_qty = np.nan_to_num(px['sl_xuat'].to_numpy(dtype='float64', na_value=np.nan)[s_rows])
+
+        n = len(keys)
+        sl_xuat = np.bincount(line, weights=s_qty, minlength=n)
+        so_phieu = np.bincount(line, minlength=n)
+
+        # Ngày xuất đầu tiên, kho của phiếu đầu và ngày lượng cộng dồn đạt lượng đặt
+        group_start = np.r_[True, line[1:] != line[:-1]] if len(line) else np.zeros(0, dtype=bool)
+        lines_with_slip = line[group_start]
+        ngay_xuat_dau = np.full(n, np.nan)
+        ngay_xuat_dau[lines_with_slip] = s_day[group_start]
+        kho_dau = np.full(n, -1, dtype=np.int64)
+        kho_dau[lines_with_slip] = s_rows[group_start]
+
+        cum = np.cumsum(s_qty)
+        offset = np.concatenate([[0.0], cum])[np.flatnonzero(group_start)]
+        cum -= np.repeat(offset, np.diff(np.append(np.flatnonzero(group_start), len(cum))))
+        du = cum >= sl_dat[line]
+        ngay_giao_du = np.full(n, np.nan)
+        # Phiếu đầu tiên đạt đủ của mỗi dòng đơn (đã sắp xếp theo ngày nên lấy lần xuất hiện đầu)
+        first_du = np.flatnonzero(du)
+        first_du = first_du[np.r_[True, line[first_du][1:] != line[first_du][:-1]]] if len(first_du) else first_du
+        ngay_giao_du[line[first_du]] = s_day[first_du]
+
+        trang_thai = np.where(sl_xuat >= sl_dat, 0, np.where(sl_xuat > 0, 1, 2))
+        if len(px):
+            kho = pd.Series(px['kho_xuat'].iloc[np.maximum(kho_dau, 0)].to_numpy()).where(kho_dau >= 0).to_numpy()
+        else:
+            # Chưa có phiếu xuất: mọi dòng đơn đều chưa giao, chưa có kho xuất
+            kho = np.full(n, np.nan, dtype=object)
+
+        self.lines = pd.DataFrame({
+            'ma_dh': ddh['ma_dh'].iloc[first].to_numpy(),
+            'ma_pt': ddh['ma_pt'].iloc[first].to_numpy(),
+            'ma_dl': ddh['ma_dl'].iloc[first].to_numpy(),
+            'hinh_thuc': ddh['hinh_thuc'].iloc[first].to_numpy(),
+            'ngay_dat': ngay_dat.astype('datetime64[D]'),
+            'sl_dat': sl_dat,
+            'sl_xuat': sl_xuat,
+            'so_phieu': so_phieu,
+            'kho_xuat': kho,
+            'tg_xuat_dau': ngay_xuat_dau - ngay_dat,
+            'tg_giao_du': ngay_giao_du - ngay_dat,
+            'ti_le_dap_ung': np.clip(np.divide(sl_xuat, sl_dat, out=np.ones(n), where=sl_dat > 0), 0, 1),
+            'trang_thai': pd.Categorical.from_codes(trang_thai, categories=TRANG_THAI)
+        })
+        for col in ['ma_pt', 'ma_dl', 'hinh_thuc', 'kho_xuat']:
+            source = ddh[col] if col in ddh.columns else px[col]
+            if isinstance(source.dtype, pd.CategoricalDtype):
+                self.lines[col] = pd.Categorical(self.lines[col], dtype=source.dtype)
+        self._summaries = {}
+
+    def summary(self, by):
+        """
+        Tổng hợp đáp ứng đơn hàng theo `by` (ma_dl, kho_xuat, ma_pt hoặc hinh_thuc)
+
+        Tỷ lệ đáp ứng tính theo lượng (lượng đã giao, không vượt lượng đặt, / lượng đặt);
+        thời gian tính bằng ngày từ ngày đặt.
+        """
+        if by not in self._summaries:
+            lines = self.lines.assign(
+                sl_dap_ung=np.minimum(self.lines['sl_xuat'], self.lines['sl_dat']),
+                giao_du=self.lines['trang_thai'] == TRANG_THAI[0]
+            )
+            summary = lines.groupby(by, observed=True).agg(
+                So_dong_don=('sl_dat', 'size'),
+                Tong_dat=('sl_dat', 'sum'),
+                Tong_dap_ung=('sl_dap_ung', 'sum'),
+                Ti_le_giao_du=('giao_du', 'mean'),
+                So_phieu_TB=('so_phieu', 'mean'),
+                TG_xuat_dau_TB=('tg_xuat_dau', 'mean'),
+                TG_giao_du_TB=('tg_giao_du', 'mean'),
+                TG_giao_du_trung_vi=('tg_giao_du', 'median')
+            ).reset_index()
+            summary.insert(4, 'Ti_le_dap_ung', summary['Tong_dap_ung'] / summary['Tong_dat'])
+            self._summaries[by] = summary
+        return self._summaries[by].copy()
+
+    def overview(self):
+        """
+        Chỉ số chung: số dòng đơn, tỷ lệ đáp ứng theo lượng, tỷ lệ dòng giao đủ, thời gian giao
+        """
+        lines = self.lines
+        return {
+            'so_dong_don': len(lines),
+            'ti_le_dap_ung': np.minimum(lines['sl_xuat'], lines['sl_dat']).sum() / max(lines['sl_dat'].sum(), 1e-9),
+            'ti_le_giao_du': (lines['trang_thai'] == TRANG_THAI[0]).mean() if len(lines) else np.nan,
+            'tg_giao_du_trung_vi': lines['tg_giao_du'].median(),
+            'tg_xuat_dau_trung_vi': lines['tg_xuat_dau'].median(),
+            'phieu_khong_khop': self.unmatched
+        }
@@ -0,0 +1,276 @@
+# utils/stock_ledger.py
+import numpy as np
+import pandas as pd
+
+
+def index_codes(series, index):
+    """
+    Vị trí của từng giá trị trong `index` (-1 nếu không có), dùng thẳng mã category nếu khớp
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype) and series.cat.categories.equals(index):
+        return series.cat.codes.to_numpy()
+    return index.get_indexer(series.astype(object))
+
+
+class StockLedger:
+    """
+    Sổ tồn kho dạng ma trận kho × phụ tùng
+
+    Mỗi ô (kho, phụ tùng) giữ tổng nhập, tổng xuất và số lần nhập/xuất trong các mảng
+    NumPy dày, chỉ số nguyên theo thứ tự category của cột kho và mã phụ tùng. Dựng một
+    lần cho mỗi phiên bản dữ liệu; phiếu mới được cộng thêm qua `updated`, còn truy vấn
+    ngưỡng chỉ là một phép so sánh trên mảng.
+    """
+
+    def __init__(self, warehouses, parts):
+        self.warehouses = pd.Index(warehouses)
+        self.parts = pd.Index(parts)
+        shape = (len(self.warehouses), len(self.parts))
+        self.nhap = np.zeros(shape)
+        self.xuat = np.zeros(shape)
+        self.so_lan_nhap = np.zeros(shape, dtype=np.int64)
+        self.so_lan_xuat = np.zeros(shape, dtype=np.int64)
+
+    @classmethod
+    def build(cls, phieu_nhap, phieu_xuat):
+        """
+        Dựng sổ tồn kho từ toàn bộ phiếu nhập/xuất
+        """
+        ledger = cls(*cls._axes(phieu_nhap, phieu_xuat))
+        ledger._post(phieu_nhap, phieu_xuat)
+        return ledger
+
+    @staticmethod
+    def _axes(phieu_nhap, phieu_xuat):
+        kho = phieu_nhap['kho_nhap']
+        if isinstance(kho.dtype, pd.CategoricalDtype):
+            return kho.cat.categories, phieu_nhap['ma_pt'].cat.categories
+
+        warehouses = pd.concat([phieu_nhap['kho_nhap'], phieu_xuat['kho_xuat']]).dropna().unique()
+        parts = pd.concat([phieu_nhap['ma_pt'], phieu_xuat['ma_pt']]).dropna().unique()
+        return sorted(warehouses), sorted(parts)
+
+    def updated(self, phieu_nhap, phieu_xuat):
+        """
+        Sổ tồn kho mới sau khi cộng thêm các phiếu mới (sổ cũ giữ nguyên)
+        """
+        warehouses, parts = self._axes(phieu_nhap, phieu_xuat)
+        ledger = StockLedger(self.warehouses.union(warehouses, sort=False), self.parts.union(parts, sort=False))
+
+        # Chép số liệu cũ sang đúng vị trí trên trục mới (mã mới được nối ở cuối)
+        rows = ledger.warehouses.get_indexer(self.warehouses)
+        cols = ledger.parts.get_indexer(self.parts)
+        for name in ['nhap', 'xuat', 'so_lan_nhap', 'so_lan_xuat']:
+            getattr(ledger, name)[np.ix_(rows, cols)] = getattr(self, name)
+
+        ledger._post(phieu_nhap, phieu_xuat)
+        return ledger
+
+    def _accumulate(self, kho, ma_pt, so_luong):
+        """
+        Cộng dồn số lượng và số lần theo ô (kho, phụ tùng) bằng bincount
+        """
+        w = index_codes(kho, self.warehouses)
+        p = index_codes(ma_pt, self.parts)
+        qty = so_luong.to_numpy(dtype='float64', na_value=np.nan)
+        ok = (w >= 0) & (p >= 0) & ~np.isnan(qty)
+
+        size = len(self.warehouses) * len(self.parts)
+        flat = w[ok].astype(np.int64) * len(self.parts) + p[ok]
+        tong = np.bincount(flat, weights=qty[ok], minlength=size)
+        dem = np.bincount(flat, minlength=size)
+        return tong.reshape(self.nhap.shape), dem.reshape(self.nhap.shape)
+
+    def _post(self, phieu_nhap, phieu_xuat):
+        tong, dem = self._accumulate(phieu_nhap['kho_nhap'], phieu_nhap['ma_pt'], phieu_nhap['sl_nhap'])
+        self.nhap += tong
+        self.so_lan_nhap += dem
+
+        tong, dem = self._accumulate(phieu_xuat['kho_xuat'], phieu_xuat['ma_pt'], phieu_xuat['sl_xuat'])
+        self.xuat += tong
+        self.so_lan_xuat += dem
+
+    @property
+    def on_hand(self):
+        return self.nhap - self.xuat
+
+    def stock_frame(self, mask=None):
+        """
+        Bảng tồn kho các ô kho × phụ tùng có phát sinh (lọc thêm theo `mask` nếu có)
+        """
+        active = (self.so_lan_nhap + self.so_lan_xuat) > 0
+        if mask is not None:
+            active &= mask
+        w, p = np.nonzero(active)
+        return pd.DataFrame({
+            'Kho': self.warehouses[w],
+            'ma_pt': self.parts[p],
+            'Tong_nhap': self.nhap[w, p],
+            'Tong_xuat': self.xuat[w, p],
+            'Ton_kho': self.nhap[w, p] - self.xuat[w, p]
+        })
+
+    def below(self, threshold):
+        """
+        Các mặt hàng có tồn kho nhỏ hơn hoặc bằng ngưỡng
+        """
+        return self.stock_frame(self.on_hand <= threshold)
+
+    def warehouse_totals(self):
+        """
+        Tổng nhập/xuất và số lần nhập/xuất theo kho
+        """
+        return pd.DataFrame({
+            'Kho': self.warehouses,
+            'Tong_nhap': self.nhap.sum(axis=1),
+            'So_lan_nhap': self.so_lan_nhap.sum(axis=1),
+            'Tong_xuat': self.xuat.sum(axis=1),
+            'So_lan_xuat': self.so_lan_xuat.sum(axis=1)
+        })
+
+
+class StockHistory:
+    """
+    Lịch sử tồn kho theo thời gian cho từng ô kho × phụ tùng
+
+    Phiếu nhập (+) và phiếu xuất (-) được gom thành một mảng sự kiện sắp xếp theo
+    (khóa kho × phụ tùng, ngày) kèm tổng cộng dồn trong từng khóa. Tồn kho tại ngày d
+    của một khóa hoặc của tất cả các khóa chỉ cần tìm kiếm nhị phân (searchsorted),
+    không phải quét lại dữ liệu gốc.
+    """
+
+    def __init__(self, warehouses, parts, w, p, ngay, so_luong, presorted=False):
+        self.warehouses = pd.Index(warehouses)
+        self.parts = pd.Index(parts)
+
+        # `presorted`: các sự kiện đã sắp theo (khóa, ngày), bỏ qua bước sắp xếp
+        key = w.astype(np.int64) * len(self.parts) + p
+        if not presorted:
+            order = np.lexsort((ngay, key))
+            w, p, ngay, so_luong, key = w[order], p[order], ngay[order], so_luong[order], key[order]
+        self.w, self.p = w, p
+        self.ngay, self.so_luong = ngay, so_luong
+        self.key = key
+
+        # Tổng cộng dồn trong từng khóa: cộng dồn toàn mảng rồi trừ phần của các khóa trước
+        self.keys, self.starts = np.unique(self.key, return_index=True)
+        cum = np.cumsum(self.so_luong)
+        offset = np.concatenate([[0.0], cum])[self.starts]
+        self.cum = cum - np.repeat(offset, np.diff(np.append(self.starts, len(cum))))
+
+        # Khóa tổng hợp (khóa, ngày) tăng dần để tìm kiếm nhị phân một lần cho mọi khóa
+        self.ngay_dau = int(self.ngay.min()) if len(self.ngay) else 0
+        self.span = int(self.ngay.max()) - self.ngay_dau + 2 if len(self.ngay) else 2
+        self.composite = self.key * self.span + (self.ngay - self.ngay_dau)
+
+    @staticmethod
+    def _events(phieu_nhap, phieu_xuat, warehouses, parts):
+        """
+        Mảng sự kiện (kho, phụ tùng, ngày, số lượng có dấu) từ phiếu nhập/xuất
+        """
+        columns = [
+            (phieu_nhap, 'kho_nhap', 'ngay_nhap', 'sl_nhap', 1),
+            (phieu_xuat, 'kho_xuat', 'ngay_xuat', 'sl_xuat', -1)
+        ]
+        w, p, ngay, so_luong = [], [], [], []
+        for df, kho, ngay_col, sl, sign in columns:
+            wi = index_codes(df[kho], warehouses)
+            pi = index_codes(df['ma_pt'], parts)
+            qty = df[sl].to_numpy(dtype='float64', na_value=np.nan)
+            ok = (wi >= 0) & (pi >= 0) & ~np.isnan(qty)
+            w.append(wi[ok])
+            p.append(pi[ok])
+            ngay.append(df[ngay_col].to_numpy().astype('datetime64[D]').astype(np.int64)[ok])
+            so_luong.append(sign * qty[ok])
+        return [np.concatenate(a) for a in (w, p, ngay, so_luong)]
+
+    @classmethod
+    def build(cls, phieu_nhap, phieu_xuat, warehouses, parts):
+        """
+        Dựng lịch sử tồn kho trên trục kho/phụ tùng cho trước (thường lấy từ StockLedger)
+        """
+        return cls(warehouses, parts, *cls._events(phieu_nhap, phieu_xuat, pd.Index(warehouses), pd.Index(parts)))
+
+    def updated(self, phieu_nhap, phieu_xuat, warehouses, parts):
+        """
+        Lịch sử mới sau khi thêm các phiếu mới (trục kho/phụ tùng có thể được nối dài)
+
+        Chỉ sắp xếp các sự kiện mới rồi chèn vào mảng cũ đã sắp (searchsorted + insert);
+        tổng cộng dồn vẫn tính lại trên toàn mảng. Nếu trục mới đổi thứ tự các mã cũ thì
+        sắp xếp lại từ đầu.
+        """
+        warehouses, parts = pd.Index(warehouses), pd.Index(parts)
+        w_old = warehouses.get_indexer(self.warehouses)[self.w]
+        p_old = parts.get_indexer(self.parts)[self.p]
+        delta = StockHistory(warehouses, parts, *self._events(phieu_nhap, phieu_xuat, warehouses, parts))
+
+        key_old = w_old.astype(np.int64) * len(parts) + p_old
+        if np.any(np.diff(key_old) < 0):
+            return StockHistory(
+                warehouses, parts,
+                np.concatenate([w_old, delta.w]), np.concatenate([p_old, delta.p]),
+                np.concatenate([self.ngay, delta.ngay]), np.concatenate([self.so_luong, delta.so_luong])
+            )
+
+        # Vị trí chèn theo khóa tổng hợp (khóa, ngày) trên khoảng ngày chung của cả hai mảng
+        ngay_dau = min(self.ngay_dau, delta.ngay_dau) if len(delta.ngay) else self.ngay_dau
+        span = max(self.ngay_dau + self.span, delta.ngay_dau + delta.span) - ngay_dau
+        pos = np.searchsorted(
+            key_old * span + (self.ngay - ngay_dau), delta.key * span + (delta.ngay - ngay_dau), side='right'
+        )
+        return StockHistory(
+            warehouses, parts,
+            np.insert(w_old, pos, delta.w), np.insert(p_old, pos, delta.p),
+            np.insert(self.ngay, pos, delta.ngay), np.insert(self.so_luong, pos, delta.so_luong),
+            presorted=True
+        )
+
+    def date_range(self):
+        """
+        Ngày phát sinh đầu tiên và cuối cùng trong lịch sử
+        """
+        first = np.datetime64(self.ngay_dau, 'D')
+        return pd.Timestamp(first), pd.Timestamp(first + (self.span - 2))
+
+    def _offset(self, date):
+        day = np.datetime64(pd.Timestamp(date).date(), 'D').astype(np.int64)
+        return int(np.clip(day - self.ngay_dau, -1, self.span - 1))
+
+    def on_hand_at(self, date, kho=None, ma_pt=None):
+        """
+        Tồn kho tại hết ngày `date`
+
+        Có cả `kho` và `ma_pt` thì trả về một số; ngược lại trả về bảng Kho, ma_pt, Ton_kho
+        của các ô đã phát sinh đến ngày đó (lọc theo kho/phụ tùng nếu có).
+        """
+        offset = self._offset(date)
+
+        if kho is not None and ma_pt is not None:
+            w, p = self.warehouses.get_loc(kho), self.parts.get_loc(ma_pt)
+            i = np.searchsorted(self.keys, w * len(self.parts) + p)
+            if i == len(self.keys) or self.keys[i] != w * len(self.parts) + p:
+                return 0.0
+            pos = np.searchsorted(self.composite, self.keys[i] * self.span + offset, side='right') - 1
+            return float(self.cum[pos]) if pos >= self.starts[i] else 0.0
+
+        pos = np.searchsorted(self.composite, self.keys * self.span + offset, side='right') - 1
+        active = pos >= self.starts
+        if kho is not None:
+            active &= self.w[self.starts] == self.warehouses.get_loc(kho)
+        if ma_pt is not None:
+            active &= self.p[self.starts] == self.parts.get_loc(ma_pt)
+
+        starts, pos = self.starts[active], pos[active]
+        return pd.DataFrame({
+            'Kho': self.warehouses[self.w[starts]],
+            'ma_pt': self.parts[self.p[starts]],
+            'Ton_kho': self.cum[pos]
+        })
+
+    def warehouse_on_hand_at(self, date):
+        """
+        Tổng tồn kho từng kho tại hết ngày `date`
+        """
+        stock = self.on_hand_at(date)
+        totals = stock.groupby('Kho', sort=False)['Ton_kho'].sum().reindex(self.warehouses).fillna(0)
+        return totals.rename_axis('Kho').reset_index()
@@ -0,0 +1,101 @@
+# utils/tables.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Số dòng mỗi trang có thể chọn (mặc định là giá trị đầu)
+PAGE_SIZES = [50, 100, 500]
+
+
+def filter_frame(df, search=None, columns=None):
+    """
+    Các dòng có ít nhất một cột (trong `columns`, mặc định các cột chữ/category) chứa `search`
+    (không phân biệt hoa thường)
+    """
+    if not search:
+        return df
+    if columns is None:
+        columns = [c for c in df.columns
+                   if isinstance(df[c].dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(df[c])]
+    mask = np.zeros(len(df), dtype=bool)
+    for col in columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # So khớp trên danh sách category rồi tra lại theo mã (ít phép so sánh chuỗi hơn)
+            hit = values.cat.categories.astype(str).str.contains(search, case=False, regex=False)
+            codes = values.cat.codes.to_numpy()
+            mask |= (codes >= 0) & np.append(hit, False)[codes]
+        else:
+            mask |= values.astype(str).str.contains(search, case=False, regex=False).to_numpy()
+    return df[mask]
+
+
+def page_slice(df, page, page_size, sort_column=None, ascending=True):
+    """
+    Trang thứ `page` (tính từ 1) sau khi sắp xếp; chỉ sắp xếp chỉ số dòng, không chép cả bảng
+    """
+    if sort_column is not None:
+        order = df[sort_column].reset_index(drop=True).sort_values(
+            ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        rows = order[(page - 1) * page_size:page * page_size]
+    else:
+        rows = np.arange((page - 1) * page_size, min(page * page_size, len(df)))
+    return df.iloc[rows]
+
+
+def paged_table(df, key, format=None, style=None, sort_column=None, ascending=True,
+                search_columns=None, hide_index=True):
+    """
+    Bảng phân trang phía server: lọc, sắp xếp và cắt trang trên bảng đã tính sẵn, chỉ định
+    dạng (pandas Styler) và gửi xuống trình duyệt các dòng của trang đang xem
+
+    `format` là dict cột -> chuỗi định dạng; `style(styler, data)` thêm kiểu cho trang
+    đang xem (`data` là toàn bộ bảng sau lọc, dùng để lấy vmin/vmax chung cho mọi trang).
+    """
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        search = st.text_input("Tìm kiếm", key=f"{key}_tim")
+    with col2:
+        columns = list(df.columns)
+        sort_column = st.selectbox(
+            "Sắp xếp theo",
+            options=columns,
+            index=columns.index(sort_column) if sort_column in columns else 0,
+            key=f"{key}_sap_xep"
+        )
+    with col3:
+        ascending = st.selectbox(
+            "Thứ tự", options=[True, False], index=0 if ascending else 1,
+            format_func=lambda x: "Tăng dần" if x else "Giảm dần", key=f"{key}_thu_tu"
+        )
+    with col4:
+        page_size = st.selectbox("Số dòng/trang", options=PAGE_SIZES, key=f"{key}_so_dong")
+
+    data = filter_frame(df, search, search_columns)
+    so_trang = max(1, -(-len(data) // page_size))
+
+    # Đổi bộ lọc/sắp xếp/số dòng thì quay về trang 1
+    dieu_kien = (search, sort_column, ascending, page_size)
+    if st.session_state.get(f"{key}_dieu_kien") != dieu_kien:
+        st.session_state[f"{key}_dieu_kien"] = dieu_kien
+        st.session_state[f"{key}_trang"] = 1
+    st.session_state[f"{key}_trang"] = min(st.session_state.get(f"{key}_trang", 1), so_trang)
+
+    view = page_slice(data, st.session_state[f"{key}_trang"], page_size, sort_column, ascending)
+    styler = view.style
+    if format:
+        styler = styler.format({c: f for c, f in format.items() if c in view.columns})
+    if style is not None:
+        styler = style(styler, data)
+    st.dataframe(styler, hide_index=hide_index, use_container_width=True)
+
+    col1, col2 = st.columns([1, 4])
+    with col1:
+        trang = st.number_input("Trang", min_value=1, max_value=so_trang, key=f"{key}_trang")
+    with col2:
+        st.caption(
+            f"Trang {trang}/{so_trang} · dòng {(trang - 1) * page_size + min(len(view), 1):,}–"
+            f"{(trang - 1) * page_size + len(view):,} trên {len(data):,} dòng"
+            + (f" (lọc từ {len(df):,})" if len(data) != len(df) else "")
+        )
+    return data
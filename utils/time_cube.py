@@ -0,0 +1,137 @@
+# utils/time_cube.py
+import numpy as np
+import pandas as pd
+
+from utils.stock_ledger import index_codes
+
+# Cấp thời gian của khối tổng hợp: mã kỳ là số nguyên tính từ 1970
+LEVELS = ['D', 'M', 'Q', 'Y']
+
+# Luồng hàng -> (cột kho, cột ngày, cột số lượng)
+FLOWS = {
+    'nhap': ('kho_nhap', 'ngay_nhap', 'sl_nhap'),
+    'xuat': ('kho_xuat', 'ngay_xuat', 'sl_xuat')
+}
+
+
+def period_codes(days, level):
+    """
+    Đổi mã ngày (số ngày từ 1970-01-01) sang mã kỳ của cấp `level`
+    """
+    if level == 'D':
+        return days
+    if level == 'W':
+        # Tuần bắt đầu từ thứ Hai (1970-01-01 là thứ Năm)
+        return (days + 3) // 7
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    if level == 'M':
+        return months
+    if level == 'Q':
+        return months // 3
+    return months // 12
+
+
+def period_labels(codes, level):
+    """
+    Nhãn kỳ giống `Period.astype(str)` của pandas: 2023-01-05, 2023-01, 2023Q1, 2023
+    (riêng tuần 'W' dùng ngày thứ Hai đầu tuần)
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    if level == 'D':
+        return pd.Index(codes.astype('datetime64[D]').astype(str))
+    if level == 'W':
+        return pd.Index((codes * 7 - 3).astype('datetime64[D]').astype(str))
+    if level == 'M':
+        return pd.Index(codes.astype('datetime64[M]').astype(str))
+    if level == 'Q':
+        return pd.Index([f"{1970 + q // 4}Q{q % 4 + 1}" for q in codes])
+    return pd.Index((1970 + codes).astype(str))
+
+
+def _rollup(periods, w, tong, so_dong, n_warehouses):
+    """
+    Gộp các ô (kỳ, kho) trùng nhau, kết quả sắp xếp theo kỳ rồi theo kho
+    """
+    keys, inverse = np.unique(periods.astype(np.int64) * n_warehouses + w, return_inverse=True)
+    return {
+        'ky': keys // n_warehouses,
+        'kho': (keys % n_warehouses).astype(np.int32),
+        'tong': np.bincount(inverse, weights=tong, minlength=len(keys)),
+        'so_dong': np.bincount(inverse, weights=so_dong, minlength=len(keys)).astype(np.int64)
+    }
+
+
+class TimeCube:
+    """
+    Khối tổng hợp lượng nhập/xuất theo kỳ × kho
+
+    Dựng một lần cho mỗi phiên bản dữ liệu: cấp ngày được gom từ phiếu gốc, các cấp
+    tháng/quý/năm được cuộn lên từ cấp ngày. Mỗi cấp chỉ giữ vài mảng số nguyên/số thực
+    (mã kỳ, mã kho, tổng, số dòng), nên đổi cấp thời gian trên giao diện chỉ là tra cứu,
+    không chạm vào bảng phiếu gốc.
+    """
+
+    def __init__(self, warehouses):
+        self.warehouses = pd.Index(warehouses)
+        self.cells = {}  # (luồng, cấp) -> mảng ky, kho, tong, so_dong
+
+    @classmethod
+    def build(cls, phieu_nhap, phieu_xuat, warehouses):
+        """
+        Dựng khối tổng hợp trên trục kho cho trước (thường lấy từ StockLedger)
+        """
+        cube = cls(warehouses)
+        for flow, df in (('nhap', phieu_nhap), ('xuat', phieu_xuat)):
+            cube._roll(flow, cube._days(flow, df))
+        return cube
+
+    def updated(self, phieu_nhap, phieu_xuat, warehouses):
+        """
+        Khối tổng hợp mới sau khi cộng thêm các phiếu mới (khối cũ giữ nguyên)
+        """
+        cube = TimeCube(warehouses)
+        remap = cube.warehouses.get_indexer(self.warehouses)
+        for flow, df in (('nhap', phieu_nhap), ('xuat', phieu_xuat)):
+            old = self.cells[(flow, 'D')]
+            new = cube._days(flow, df)
+            cube._roll(flow, _rollup(
+                np.concatenate([old['ky'], new['ky']]),
+                np.concatenate([remap[old['kho']], new['kho']]),
+                np.concatenate([old['tong'], new['tong']]),
+                np.concatenate([old['so_dong'], new['so_dong']]),
+                len(cube.warehouses)
+            ))
+        return cube
+
+    def _days(self, flow, df):
+        """
+        Tổng và số dòng theo (ngày, kho) của một luồng hàng
+        """
+        kho, ngay, sl = FLOWS[flow]
+        w = index_codes(df[kho], self.warehouses)
+        days = df[ngay].to_numpy().astype('datetime64[D]')
+        ok = (w >= 0) & ~np.isnat(days)
+        qty = np.nan_to_num(df[sl].to_numpy(dtype='float64', na_value=np.nan)[ok])
+        return _rollup(days[ok].astype(np.int64), w[ok], qty, np.ones(ok.sum()), len(self.warehouses))
+
+    def _roll(self, flow, days):
+        self.cells[(flow, 'D')] = days
+        for level in LEVELS[1:]:
+            self.cells[(flow, level)] = _rollup(
+                period_codes(days['ky'], level), days['kho'], days['tong'], days['so_dong'],
+                len(self.warehouses)
+            )
+
+    def series(self, flow, level):
+        """
+        Bảng Thoi_gian, kho, số lượng của một luồng hàng ở cấp thời gian `level`
+
+        Tên cột giống bảng phiếu gốc (kho_nhap/sl_nhap hoặc kho_xuat/sl_xuat).
+        """
+        kho, _, sl = FLOWS[flow]
+        cells = self.cells[(flow, level)]
+        return pd.DataFrame({
+            'Thoi_gian': period_labels(cells['ky'], level),
+            kho: self.warehouses[cells['kho']],
+            sl: cells['tong']
+        })